@@ -0,0 +1,86 @@
+import logging
+import time
+import warnings
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils
+from utils.filters import FilterUtils
+from utils.bitmap import BitmapIndexUtils
+
+# Bitmap index benchmark: the multiselect filters resolved by isin scans
+# (FilterUtils.get_isin_mask) vs OR/AND of the bitmaps (BitmapIndexUtils),
+# over the fact table at 1x and 10x (the fact table repeated 10 times).
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/bitmap.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def best_time(func, repeat: int) -> float:
+    elapsed = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+def get_index_size(fact_index: dict) -> float:
+    size = 0
+    for column_index in fact_index.values():
+        for kind, bitmap in column_index['bitmaps'].values():
+            size += bitmap.nbytes
+    return size / 1024 / 1024
+
+def get_selections(df: pd.DataFrame) -> dict:
+    # (column, selection, ignore_case) per case, picked from the data
+    cities = df['geolocation_city'].value_counts()
+    return {
+        'status (1 value)': [('order_status', ['delivered'], False)],
+        'category (3 values)': [('product_category_name_english', df['product_category_name_english'].value_counts().index[:3].tolist(), False)],
+        'city (5 small cities)': [('geolocation_city', cities.index[-5:].tolist(), True)],
+        'city (50 top cities)': [('geolocation_city', cities.index[:50].tolist(), True)],
+        'state (3 values)': [('geolocation_state', df['geolocation_state'].value_counts().index[:3].tolist(), True)],
+        'status + category + state': [
+            ('order_status', ['delivered', 'shipped'], False),
+            ('product_category_name_english', df['product_category_name_english'].value_counts().index[:3].tolist(), False),
+            ('geolocation_state', df['geolocation_state'].value_counts().index[:3].tolist(), True)
+        ]
+    }
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    f = FilterUtils()
+    b = BitmapIndexUtils()
+    data = u.get_clean_data()
+    fact_df = u.get_fact_data(data)
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    for volume in [1, 10]:
+        df = pd.concat([fact_df] * volume, ignore_index=True)
+        start = time.perf_counter()
+        fact_index = b.build_index(df)
+        print(f"{volume}x ({len(df)} rows): index built in {time.perf_counter() - start:.3f}s, {get_index_size(fact_index):.1f} MB")
+
+        print(f"{'selection':<28}{'isin (s)':>12}{'bitmap (s)':>12}{'speed-up':>10}")
+        for name, filters in get_selections(df).items():
+            isin_time = best_time(
+                lambda: f.combine_masks([f.get_isin_mask(df[_col], selection, ignore_case) for _col, selection, ignore_case in filters]),
+                repeat
+            )
+            bitmap_time = best_time(
+                lambda: f.combine_masks([b.get_mask(fact_index[_col], selection, ignore_case) for _col, selection, ignore_case in filters]),
+                repeat
+            )
+            print(f"{name:<28}{isin_time:>12.5f}{bitmap_time:>12.5f}{isin_time/bitmap_time:>9.1f}x")
+        print()
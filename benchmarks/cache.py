@@ -0,0 +1,136 @@
+import logging
+import time
+import warnings
+import pandas as pd
+import streamlit as st
+import streamlit.runtime.caching.cache_utils as cache_utils
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils, cache
+
+# Cache benchmark: time of a rerun of streamlit_app.py (the cached calls of the
+# dashboard) and the part of it spent on the cache keys, st.cache_data (hashing
+# the DataFrame arguments) vs the fingerprint cache of CacheUtils, for a cold
+# start, a warm rerun (same filters) and a filter change, at 1x and 10x (the
+# fact table repeated 10 times).
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/cache.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+METHODS = [
+    'get_clean_data', 'get_fact_data', 'get_fact_index', 'get_fact_cube',
+    'get_filtered_data', 'get_cube_selection', 'get_order_funnel_from_cube',
+    'get_order_success_rate', 'calculate_flowing_count',
+    'get_metrics_by_month_from_cube', 'get_metrics_by_quarter_from_cube',
+    'get_main_metrics', 'get_product_data_from_cube', 'get_top_product_by_revenue',
+    'get_product_data_by_month_from_cube', 'get_monthly_top_product',
+    'get_review_by_month_from_cube', 'get_metrics_by_locations',
+    'get_top_states_by_revenue', 'get_rfm_analysis'
+]
+
+# Time spent by st.cache_data on the keys of the calls
+st_key_time = [0.0]
+make_value_key = cache_utils._make_value_key
+def timed_make_value_key(*args, **kwargs):
+    start = time.perf_counter()
+    try:
+        return make_value_key(*args, **kwargs)
+    finally:
+        st_key_time[0] += time.perf_counter() - start
+cache_utils._make_value_key = timed_make_value_key
+
+def rerun(call, u: StDataUtils, fact_df: pd.DataFrame, filters: tuple) -> None:
+    # The cached calls of streamlit_app.py, in order (fact_df is given to use
+    # the same table at every volume)
+    fact_index = call('get_fact_index', fact_df)
+    fact_cube = call('get_fact_cube', fact_df)
+    filtered_df = call('get_filtered_data', fact_df, *filters, fact_index)
+    start_date_proper = filtered_df['order_purchase_timestamp'].min().date()
+    end_date_proper = filtered_df['order_purchase_timestamp'].max().date()
+    filtered_df_2 = call('get_filtered_data', fact_df, start_date_proper, end_date_proper, [], *filters[3:], fact_index)
+    cube_selection = call('get_cube_selection', fact_df, *filters, fact_cube)
+    cube_selection_2 = call('get_cube_selection', fact_df, start_date_proper, end_date_proper, [], *filters[3:], fact_cube)
+    funnel_df = call('get_order_funnel_from_cube', cube_selection_2)
+    call('get_order_success_rate', funnel_df)
+    call('calculate_flowing_count', filtered_df_2)
+    monthly_metrics_df = call('get_metrics_by_month_from_cube', cube_selection)
+    call('get_metrics_by_quarter_from_cube', cube_selection)
+    call('get_main_metrics', monthly_metrics_df)
+    product_df = call('get_product_data_from_cube', cube_selection)
+    call('get_top_product_by_revenue', product_df)
+    call('get_top_product_by_revenue', product_df, use_mask=True)
+    monthly_product_df = call('get_product_data_by_month_from_cube', cube_selection)
+    call('get_monthly_top_product', monthly_product_df, end_date_proper.strftime('%Y-%m'))
+    call('get_review_by_month_from_cube', cube_selection)
+    metrics_by_locations_df = call('get_metrics_by_locations', filtered_df)
+    call('get_top_states_by_revenue', metrics_by_locations_df)
+    call('get_rfm_analysis', filtered_df)
+
+def timed_rerun(call, u: StDataUtils, fact_df: pd.DataFrame, filters: tuple, key_time) -> tuple:
+    # (rerun time, key time) of a rerun
+    key_start = key_time()
+    start = time.perf_counter()
+    rerun(call, u, fact_df, filters)
+    return time.perf_counter() - start, key_time() - key_start
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    data = u.get_clean_data()
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    ## Before: the same methods cached by st.cache_data
+    st_methods = {
+        name: st.cache_data(getattr(StDataUtils, name).__wrapped__)
+        for name in METHODS
+    }
+    variants = {
+        'st.cache_data': (
+            lambda name, *args, **kwargs: st_methods[name](u, *args, **kwargs),
+            lambda: st_key_time[0],
+            st.cache_data.clear
+        ),
+        'fingerprint': (
+            lambda name, *args, **kwargs: getattr(u, name)(*args, **kwargs),
+            lambda: cache.get_stats()['key_time'],
+            cache.clear
+        )
+    }
+
+    base_fact_df = u.get_fact_data(data)
+    last_date = base_fact_df['order_purchase_timestamp'].max().date()
+    first_date = base_fact_df['order_purchase_timestamp'].min().date()
+    filters = (first_date, last_date, ['delivered'], [], [], [])
+    other_filters = (last_date - pd.Timedelta(days=180), last_date, ['delivered'], [], [], [])
+
+    print(f"{'cache':<15}{'volume':>8}{'rerun':>15}{'time (s)':>10}{'keys (s)':>10}{'keys (%)':>10}{'hits':>7}{'misses':>8}")
+    for volume in [1, 10]:
+        fact_df = (
+            pd.concat([base_fact_df] * volume, ignore_index=True)
+            .sort_values(by='order_purchase_timestamp', kind='stable', ignore_index=True)
+        )
+        for name, (call, key_time, clear) in variants.items():
+            results = {'cold': [], 'warm': [], 'filter change': []}
+            for i in range(repeat):
+                clear()
+                results['cold'].append(timed_rerun(call, u, fact_df, filters, key_time))
+                results['warm'].append(min(
+                    (timed_rerun(call, u, fact_df, filters, key_time) for j in range(3)),
+                    key=lambda result: result[0]
+                ))
+                results['filter change'].append(timed_rerun(call, u, fact_df, other_filters, key_time))
+            stats = cache.get_stats() if name == 'fingerprint' else {}
+            for rerun_name, times in results.items():
+                elapsed, key_elapsed = min(times, key=lambda result: result[0])
+                print(f"{name:<15}{str(volume) + 'x':>8}{rerun_name:>15}{elapsed:>10.3f}{key_elapsed:>10.3f}{100 * key_elapsed / elapsed:>9.1f}%{stats.get('hits', ''):>7}{stats.get('misses', ''):>8}")
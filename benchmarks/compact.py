@@ -0,0 +1,75 @@
+import gc
+import time
+import tracemalloc
+import pyarrow as pa
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.snapshot import SnapshotUtils
+from utils.st_utils import StDataUtils
+
+# Compact mode benchmark: memory of the cleaned dataset, merges and nunique,
+# with plain object keys vs dictionary-encoded keys.
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/compact.py
+
+def measure_memory(s: SnapshotUtils, compact: bool) -> tuple:
+    # tracemalloc follows the numpy & Python allocations, the Arrow memory pool
+    # (which holds the compact dictionaries) is counted separately
+    gc.collect()
+    arrow_start = pa.total_allocated_bytes()
+    tracemalloc.start()
+    data = s.load_snapshot(compact)
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0] + pa.total_allocated_bytes() - arrow_start
+    tracemalloc.stop()
+    return data, memory / 1024 / 1024
+
+def best_time(func, repeat: int=5) -> float:
+    elapsed = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+if __name__ == '__main__':
+    s = SnapshotUtils()
+    if not s.is_snapshot_valid():
+        # Write the snapshot first (CSV path)
+        StDataUtils().get_clean_data()
+
+    results = {}
+    for compact in [False, True]:
+        data, memory = measure_memory(s, compact)
+        results[compact] = {
+            'memory (MB)': memory,
+            'merge orders x order_items (s)': best_time(
+                lambda: data['orders'].merge(data['order_items'], how='left', on='order_id')
+            ),
+            'merge customers x geolocations (s)': best_time(
+                lambda: data['customers'].merge(
+                    data['geolocations'],
+                    how='left',
+                    left_on='customer_zip_code_prefix',
+                    right_on='geolocation_zip_code_prefix'
+                )
+            ),
+            'nunique order_id (s)': best_time(lambda: data['order_items']['order_id'].nunique()),
+            'nunique customer_unique_id (s)': best_time(lambda: data['customers']['customer_unique_id'].nunique())
+        }
+        del data
+
+    print(f"{'metric':<38}{'plain':>10}{'compact':>10}{'ratio':>8}")
+    for metric in results[False].keys():
+        plain, compact = results[False][metric], results[True][metric]
+        print(f"{metric:<38}{plain:>10.3f}{compact:>10.3f}{plain/compact:>7.1f}x")
@@ -0,0 +1,101 @@
+import logging
+import time
+import warnings
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils, cache
+
+# Cube benchmark: latency of the Overview & Product Portfolio aggregations on a
+# filter change (cache miss), from the filtered fact rows vs rolled up from the
+# monthly cube, with the exact distinct members or the HyperLogLog registers
+# of its cells (approximate mode), at 1x and 10x (the fact table repeated 10
+# times, as other orders & customers).
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/cube.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def run_rows(u: StDataUtils, fact_df: pd.DataFrame, fact_index: dict, filters: tuple) -> None:
+    # The aggregations of streamlit_app.py, from filtered_df & filtered_df_2
+    filtered_df = u.get_filtered_data(fact_df, *filters, fact_index)
+    start_date = filtered_df['order_purchase_timestamp'].min().date()
+    end_date = filtered_df['order_purchase_timestamp'].max().date()
+    filtered_df_2 = u.get_filtered_data(fact_df, start_date, end_date, [], *filters[3:], fact_index)
+    u.get_order_funnel(filtered_df_2)
+    u.get_metrics_by_month(filtered_df)
+    u.get_metrics_by_quarter(filtered_df)
+    u.get_review_by_month(filtered_df)
+    u.get_product_data(filtered_df)
+    u.get_product_data_by_month(filtered_df)
+
+def run_cube(u: StDataUtils, fact_df: pd.DataFrame, fact_cube: dict, filters: tuple, approximate: bool=False) -> None:
+    # The same aggregations, from the cube selections
+    cube_selection = u.get_cube_selection(fact_df, *filters, fact_cube)
+    months = cube_selection['cells']['month']
+    cube_selection_2 = u.get_cube_selection(fact_df, months.min(), months.max() + pd.offsets.MonthEnd(0), [], *filters[3:], fact_cube)
+    u.get_order_funnel_from_cube(cube_selection_2, approximate)
+    u.get_metrics_by_month_from_cube(cube_selection, approximate)
+    u.get_metrics_by_quarter_from_cube(cube_selection, approximate)
+    u.get_review_by_month_from_cube(cube_selection)
+    u.get_product_data_from_cube(cube_selection)
+    u.get_product_data_by_month_from_cube(cube_selection)
+
+def best_time(func, repeat: int) -> float:
+    # Every run is a cache miss, as for a new sidebar value
+    elapsed = []
+    for i in range(repeat):
+        cache.clear()
+        start = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    data = u.get_clean_data()
+    fact_df = u.get_fact_data(data)
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    last_date = fact_df['order_purchase_timestamp'].max().date()
+    first_date = fact_df['order_purchase_timestamp'].min().date()
+    scenarios = {
+        'all dates, delivered': (first_date, last_date, ['delivered'], [], [], []),
+        'last 180 days, delivered': (last_date - pd.Timedelta(days=180), last_date, ['delivered'], [], [], []),
+        'all dates, 3 categories': (
+            first_date, last_date, [],
+            fact_df['product_category_name_english'].value_counts().index[:3].tolist(), [], []
+        )
+    }
+
+    print(f"{'scenario':<28}{'volume':>8}{'rows':>10}{'cells':>8}{'rows (s)':>10}{'cube (s)':>10}{'speed-up':>10}{'HLL cube (s)':>14}{'speed-up':>10}")
+    for volume in [1, 10]:
+        df = (
+            pd.concat([
+                fact_df.assign(
+                    order_id=fact_df['order_id'].astype('str') + f'-{i}',
+                    customer_unique_id=fact_df['customer_unique_id'].astype('str') + f'-{i}'
+                )
+                for i in range(volume)
+            ], ignore_index=True)
+            .sort_values(by='order_purchase_timestamp', kind='stable', ignore_index=True)
+        )
+        fact_index = u.get_fact_index(df)
+        fact_cube = u.get_fact_cube(df)
+        approximate_cube = u.get_fact_cube(df, exact=False)
+        for name, filters in scenarios.items():
+            rows_time = best_time(lambda: run_rows(u, df, fact_index, filters), repeat)
+            cube_time = best_time(lambda: run_cube(u, df, fact_cube, filters), repeat)
+            approximate_time = best_time(lambda: run_cube(u, df, approximate_cube, filters, True), repeat)
+            print(f"{name:<28}{str(volume) + 'x':>8}{len(df):>10}{len(fact_cube['cells']):>8}{rows_time:>10.3f}{cube_time:>10.3f}{rows_time/cube_time:>9.1f}x{approximate_time:>14.3f}{rows_time/approximate_time:>9.1f}x")
@@ -0,0 +1,87 @@
+import logging
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils
+from utils.spatial import SpatialIndexUtils
+from utils.delivery import DeliveryUtils
+
+# Delivery cost benchmark: the distance from the seller to the customer of every
+# order line, merging the sellers and their geolocations (before) vs gathering
+# the sellers' locations from the zip lookup (after, like get_fact_data), both
+# with the vectorized haversine distance, then the freight & delivery time by
+# distance band and by state pair (the rerun path of the dashboard), at 1x and
+# 10x (the fact table repeated 10 times).
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/delivery.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def best_time(func, repeat: int) -> float:
+    elapsed = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+def merge_distances(df: pd.DataFrame, data: dict) -> np.ndarray:
+    # The distances with merges: the seller of every line, then its geolocation
+    sellers_df = (
+        df[['seller_id']]
+        .merge(
+            data['sellers'][['seller_id', 'seller_zip_code_prefix', 'seller_state']],
+            how="left",
+            on="seller_id"
+        )
+        .merge(
+            data['geolocations'][['geolocation_zip_code_prefix', 'geolocation_lat', 'geolocation_lng']],
+            how="left",
+            left_on="seller_zip_code_prefix",
+            right_on="geolocation_zip_code_prefix"
+        )
+    )
+    return SpatialIndexUtils().get_haversine_distance(
+        sellers_df['geolocation_lat'], sellers_df['geolocation_lng'],
+        df['geolocation_lat'], df['geolocation_lng']
+    )
+
+def lookup_distances(df: pd.DataFrame, data: dict, zip_lookup: dict) -> np.ndarray:
+    # The distances with the zip lookup, as get_fact_data computes them
+    sellers_df = DeliveryUtils().get_seller_locations(zip_lookup, data['sellers'], df['seller_id'])
+    return SpatialIndexUtils().get_haversine_distance(
+        sellers_df['seller_lat'], sellers_df['seller_lng'],
+        df['geolocation_lat'], df['geolocation_lng']
+    )
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    d = DeliveryUtils()
+    data = u.get_clean_data()
+    fact_df = u.get_fact_data(data)
+    zip_lookup = u.get_zip_lookup(data)
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    print(f"{'volume':<22}{'merge (s)':>11}{'lookup (s)':>12}{'speed-up':>10}{'by band (s)':>13}{'by states (s)':>15}")
+    for volume in [1, 10]:
+        df = pd.concat([fact_df] * volume, ignore_index=True)
+        np.testing.assert_allclose(merge_distances(df, data), lookup_distances(df, data, zip_lookup), equal_nan=True)
+        merge_time = best_time(lambda: merge_distances(df, data), repeat)
+        lookup_time = best_time(lambda: lookup_distances(df, data, zip_lookup), repeat)
+        band_time = best_time(lambda: d.get_costs_by_distance(df), repeat)
+        states_time = best_time(lambda: d.get_costs_by_state_pair(df), repeat)
+        print(f"{f'{volume}x ({len(df)} rows)':<22}{merge_time:>11.3f}{lookup_time:>12.3f}{merge_time/lookup_time:>9.1f}x{band_time:>13.3f}{states_time:>15.3f}")
@@ -0,0 +1,98 @@
+import logging
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils
+from utils.sketch import SketchUtils
+from utils.timeindex import TimeIndexUtils
+
+# Distinct count benchmark: accuracy vs speed of the HyperLogLog estimates
+# (approximate mode of SketchUtils.agg) against the exact nunique, for the
+# groupings of the dashboard and a few error bounds,
+# on the dataset (1x) and on a synthetic 50x set (the fact table repeated 50
+# times with new order & customer ids, so the distinct counts grow 50x).
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/distinct.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def scale_fact_data(fact_df: pd.DataFrame, volume: int) -> pd.DataFrame:
+    # Repeat the fact table with new ids (kept sorted on the purchase timestamp),
+    # the compact mode keys are shifted by the dictionary size instead
+    copies = []
+    for i in range(volume):
+        copy = fact_df.copy()
+        for _col in ['order_id', 'customer_unique_id']:
+            if i == 0:
+                continue
+            if copy[_col].dtype.kind in 'iu':
+                copy[_col] = copy[_col].where(copy[_col] < 0, copy[_col] + i * (int(fact_df[_col].max()) + 1))
+            else:
+                copy[_col] = copy[_col].astype(str) + f'-{i}'
+        copies.append(copy)
+    return (
+        pd.concat(copies, ignore_index=True)
+        .sort_values(by='order_purchase_timestamp', kind='stable', ignore_index=True)
+    )
+
+def get_groupings(df: pd.DataFrame) -> dict:
+    # The distinct counts of the dashboard: (groupby keys, distinct columns)
+    t = TimeIndexUtils()
+    month_codes = t.get_period_codes(df['order_purchase_timestamp'], 'ME')[1]
+    quarter_codes = t.get_period_codes(df['order_purchase_timestamp'], 'QE')[1]
+    return {
+        'by month (metrics)': (month_codes, ['order_id', 'customer_unique_id']),
+        'by quarter (metrics)': (quarter_codes, ['order_id', 'customer_unique_id']),
+        'by zip code (locations)': ('customer_zip_code_prefix', ['order_id', 'customer_unique_id']),
+        'by month & status (funnel)': ([month_codes, 'order_status'], ['order_id']),
+        'by status (order flow)': ('order_status', ['order_id']),
+        'by state (demographic)': ('geolocation_state', ['customer_unique_id'])
+    }
+
+def best_time(func, repeat: int) -> tuple:
+    elapsed = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed), result
+
+def get_errors(exact: pd.DataFrame, approximate: pd.DataFrame) -> tuple:
+    # Max & mean relative error over the groups and the distinct columns
+    expected = exact.to_numpy().astype('float64').ravel()
+    actual = approximate.to_numpy().astype('float64').ravel()
+    errors = np.abs(actual - expected) / expected
+    return errors.max(), errors.mean()
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    s = SketchUtils()
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    error_bounds = [0.05, 0.01, 0.005]
+
+    print(f"{'distinct count':<30}{'keys':>9}{'volume':>8}{'bound':>8}{'exact (s)':>11}{'approx (s)':>12}{'speed-up':>10}{'max err':>9}{'mean err':>10}")
+    for compact, volume in [(False, 1), (False, 50), (True, 1), (True, 50)]:
+        ## Plain string ids, or the int32 codes of the compact mode
+        keys = 'compact' if compact else 'plain'
+        df = scale_fact_data(u.get_fact_data(u.get_clean_data(compact=compact)), volume)
+        for name, (by, columns) in get_groupings(df).items():
+            agg = {_col: 'nunique' for _col in columns}
+            exact_time, exact = best_time(lambda: s.agg(df, by, agg), repeat)
+            for error in error_bounds:
+                approx_time, approximate = best_time(lambda: s.agg(df, by, agg, True, error), repeat)
+                max_error, mean_error = get_errors(exact, approximate)
+                print(f"{name:<30}{keys:>9}{str(volume) + 'x':>8}{error:>8.3f}{exact_time:>11.3f}{approx_time:>12.3f}{exact_time/approx_time:>9.1f}x{max_error:>9.4f}{mean_error:>10.4f}")
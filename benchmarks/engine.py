@@ -0,0 +1,81 @@
+import shutil
+import subprocess
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+# Engine benchmark: import time of the engine (batch path) vs the engine with
+# Streamlit, and the time for a new dashboard worker to get the data of every
+# section for the default filters, with the cache of the process only (before)
+# vs with the disk backend precomputed by a batch job (after, see
+# EngineUtils.precompute). Every run happens in a fresh interpreter, the
+# snapshot of the cleaned data is warm.
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/engine.py [repeat]
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+IMPORT_SCRIPT = '''
+import sys, time
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+if sys.argv[2] == 'streamlit':
+    import streamlit
+import utils.engine
+print(time.perf_counter() - start)
+'''
+
+WORKER_SCRIPT = '''
+import logging, sys, time, warnings
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+from utils.engine import EngineUtils, cache
+from utils.cache import DiskCacheUtils
+if sys.argv[2] == 'disk':
+    cache.set_backend(DiskCacheUtils())
+EngineUtils().precompute()
+print(time.perf_counter() - start)
+'''
+
+def run(script: str, *args) -> float:
+    result = subprocess.run(
+        [sys.executable, '-c', script, ROOT_DIR, *args],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+if __name__ == '__main__':
+    c = Constants()
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    ## Warm snapshot, empty disk cache
+    run(WORKER_SCRIPT, 'memory')
+    shutil.rmtree(c.cache_dir, ignore_errors=True)
+
+    engine_import = min(run(IMPORT_SCRIPT, 'engine') for i in range(repeat))
+    streamlit_import = min(run(IMPORT_SCRIPT, 'streamlit') for i in range(repeat))
+    memory_worker = min(run(WORKER_SCRIPT, 'memory') for i in range(repeat))
+    precompute = run(WORKER_SCRIPT, 'disk')
+    disk_worker = min(run(WORKER_SCRIPT, 'disk') for i in range(repeat))
+    shutil.rmtree(c.cache_dir, ignore_errors=True)
+
+    print(f"Engine ({repeat} runs, best):")
+    print(f" > Import, engine              : {engine_import:.3f}s")
+    print(f" > Import, engine + Streamlit  : {streamlit_import:.3f}s")
+    print(f" > New worker, process cache   : {memory_worker:.3f}s")
+    print(f" > Batch precompute (disk)     : {precompute:.3f}s")
+    print(f" > New worker, disk cache      : {disk_worker:.3f}s ({memory_worker/disk_worker:.1f}x)")
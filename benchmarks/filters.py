@@ -0,0 +1,102 @@
+import logging
+import time
+import warnings
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils
+from utils.filters import FilterUtils
+from utils.timeindex import TimeIndexUtils
+
+# Filter micro-benchmarks: every filter type of get_filtered_data, the previous
+# pandas filters (all-True iterrows init, .dt.date, str.lower) vs FilterUtils
+# and the binary-search date slice of TimeIndexUtils, over the fact table at
+# 1x and 10x (the fact table repeated 10 times).
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/filters.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def best_time(func, repeat: int) -> float:
+    elapsed = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+def get_cases(df: pd.DataFrame, f: FilterUtils) -> dict:
+    # Pick selections that exist in the data
+    last_date = df['order_purchase_timestamp'].max().date()
+    start_date = last_date - pd.Timedelta(days=180)
+    categories = df['product_category_name_english'].dropna().unique()[:3].tolist()
+    cities = [str(x).upper() for x in df['customer_city'].value_counts().index[:5]]
+    states = [str(x).lower() for x in df['customer_state'].value_counts().index[:3]]
+    return {
+        'no filter (all-True init)': (
+            lambda: pd.Series([True for i, rows in df.iterrows()]),
+            lambda: f.get_filter_mask(df)
+        ),
+        'date range': (
+            lambda: (
+                (df['order_purchase_timestamp'].dt.date >= start_date)
+                & (df['order_purchase_timestamp'].dt.date <= last_date)
+            ),
+            lambda: f.get_date_mask(df['order_purchase_timestamp'], start_date, last_date)
+        ),
+        'date range (sorted slice)': (
+            lambda: (
+                (df['order_purchase_timestamp'].dt.date >= start_date)
+                & (df['order_purchase_timestamp'].dt.date <= last_date)
+            ),
+            lambda: df.iloc[TimeIndexUtils().get_date_slice(df['order_purchase_timestamp'], start_date, last_date)]
+        ),
+        'order status': (
+            lambda: df['order_status'].isin(['delivered']),
+            lambda: f.get_isin_mask(df['order_status'], ['delivered'])
+        ),
+        'product category': (
+            lambda: df['product_category_name_english'].isin(categories),
+            lambda: f.get_isin_mask(df['product_category_name_english'], categories)
+        ),
+        'city (case-insensitive)': (
+            lambda: df['customer_city'].str.lower().isin([x.lower() for x in cities]),
+            lambda: f.get_isin_mask(df['customer_city'], cities, ignore_case=True)
+        ),
+        'state (case-insensitive)': (
+            lambda: df['customer_state'].str.lower().isin([x.lower() for x in states]),
+            lambda: f.get_isin_mask(df['customer_state'], states, ignore_case=True)
+        )
+    }
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    f = FilterUtils()
+    data = u.get_clean_data()
+    fact_df = u.get_fact_data(data)
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print(f"{'filter':<28}{'volume':>8}{'rows':>10}{'before (s)':>12}{'after (s)':>12}{'speed-up':>10}")
+    for volume in [1, 10]:
+        ## Kept sorted on the purchase timestamp, like the fact table
+        df = (
+            pd.concat([fact_df] * volume, ignore_index=True)
+            .sort_values(by='order_purchase_timestamp', kind='stable', ignore_index=True)
+        )
+        for name, (before, after) in get_cases(df, f).items():
+            ## The iterrows init is far too slow to repeat at 10x
+            _repeat = 1 if name.startswith('no filter') else repeat
+            before_time = best_time(before, _repeat)
+            after_time = best_time(after, _repeat)
+            print(f"{name:<28}{str(volume) + 'x':>8}{len(df):>10}{before_time:>12.4f}{after_time:>12.4f}{before_time/after_time:>9.1f}x")
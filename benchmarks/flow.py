@@ -0,0 +1,113 @@
+import logging
+import time
+import warnings
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils
+from utils.flow import FlowUtils
+
+# Order flow benchmark: time of the status flow of calculate_flowing_count, the
+# loop over the levels with concat/merge/groupby (before) vs the propagation
+# through the adjacency matrices of FlowUtils (after), for order_status_level
+# and for synthetic status graphs with many more levels, from the counts per
+# status. The flow tables of both are compared.
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/flow.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def get_flows_by_loop(df: pd.DataFrame, order_status_level: list) -> pd.DataFrame:
+    # The flow before the adjacency matrices, df has the columns order_status & count
+    flow_ref_df = pd.DataFrame(order_status_level).explode('to', ignore_index=True)
+    final_df = pd.DataFrame(columns=['level', 'from', 'to'])
+    temp_df = pd.DataFrame(columns=['order_status', 'count'])
+    for i in sorted(flow_ref_df['level'].unique(), reverse=True):
+        ref_df = flow_ref_df[flow_ref_df['level'] == i]
+        if temp_df.shape[0] == 0:
+            temp_df = df
+        else:
+            temp_df = (
+                pd.concat([temp_df, df[df['order_status'].isin(ref_df['from'])]], axis=0)
+                .groupby('order_status')
+                .agg({'count': 'sum'})
+                .reset_index()
+            )
+        temp_df = (
+            ref_df
+            .merge(temp_df, how='left', left_on='to', right_on='order_status')
+            .groupby(['level', 'from', 'to'])
+            .agg({'count': 'sum'})
+            .reset_index()
+        )
+        if final_df.shape[0] > 0:
+            final_df = pd.concat([final_df, temp_df], axis=0)
+        else:
+            final_df = temp_df
+        temp_df = (
+            temp_df[['from', 'count']]
+            .groupby(['from'])
+            .agg({'count': 'sum'})
+            .reset_index()
+            .rename(columns={'from': 'order_status'})
+        )
+    final_df = final_df.fillna(0)
+    final_df['count'] = final_df['count'].astype('int64')
+    return final_df.reset_index(drop=True)
+
+def get_flows_by_matrix(df: pd.DataFrame, order_status_level: list) -> pd.DataFrame:
+    f = FlowUtils()
+    return f.get_flows(df.set_index('order_status')['count'], f.get_transition_graph(order_status_level))
+
+def get_chain_levels(n_levels: int) -> list:
+    # A synthetic status graph: every level goes on to the next status, or
+    # stays, or leaves to a terminal status of its own
+    order_status_level = []
+    for i in range(n_levels):
+        order_status_level.append({'level': i, 'from': f'step_{i}', 'to': [f'step_{i}', f'step_{i + 1}', f'exit_{i}']})
+        order_status_level.append({'level': i + 1, 'from': f'exit_{i}', 'to': [f'exit_{i}']})
+    return order_status_level
+
+def best_time(func, repeat: int) -> tuple:
+    elapsed = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed), result
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    fact_df = u.get_fact_data(u.get_clean_data())
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    counts = (
+        fact_df.groupby('order_status')['order_id'].nunique()
+        .rename('count').reset_index()
+    )
+    graphs = {'order_status_level': (u.order_status_level, counts)}
+    for n_levels in [50, 500]:
+        order_status_level = get_chain_levels(n_levels)
+        statuses = pd.unique(pd.DataFrame(order_status_level).explode('to')[['from', 'to']].to_numpy().ravel())
+        graphs[f'chain of {n_levels} levels'] = (
+            order_status_level,
+            pd.DataFrame({'order_status': statuses, 'count': range(1, len(statuses) + 1)})
+        )
+
+    print(f"{'status graph':<24}{'edges':>7}{'loop (s)':>10}{'matrix (s)':>12}{'speed-up':>10}{'same':>6}")
+    for name, (order_status_level, df) in graphs.items():
+        loop_time, loop_df = best_time(lambda: get_flows_by_loop(df, order_status_level), repeat)
+        matrix_time, matrix_df = best_time(lambda: get_flows_by_matrix(df, order_status_level), repeat)
+        same = loop_df[['from', 'to', 'count']].equals(matrix_df[['from', 'to', 'count']].reset_index(drop=True))
+        print(f"{name:<24}{len(matrix_df):>7}{loop_time:>10.4f}{matrix_time:>12.4f}{loop_time/matrix_time:>9.1f}x{str(same):>6}")
@@ -0,0 +1,109 @@
+import ast
+import re
+import subprocess
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+# Import-time benchmark: what a new dashboard worker imports before the first
+# render, the top-level imports of streamlit_app.py before (every plotting &
+# stats library up front) vs after (deferred to the sections), then what each
+# section imports when it renders. Every case runs in a fresh interpreter with
+# python -X importtime: wall time of the imports (best of repeat) and the
+# heaviest top-level modules (cumulative import time).
+# It doesn't need the dataset, run it from the project root:
+#   python benchmarks/imports.py [repeat]
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+APP_PATH = os.path.join(ROOT_DIR, 'streamlit_app.py')
+
+# The top-level imports of the app before the plotting libraries were deferred
+# (utils.utils imported matplotlib, trendline='ols' imported statsmodels)
+EAGER_IMPORTS = '''
+import streamlit as st
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+from datetime import datetime, timedelta
+from utils.st_utils import StDataUtils
+from utils.sketch import SketchUtils
+import plotly.graph_objects as go
+import plotly.express as px
+import random
+'''
+
+def get_imports(nodes: list) -> str:
+    # Source of the import statements of the nodes (not of their bodies)
+    return '\n'.join(ast.unparse(_node) for _node in nodes if isinstance(_node, (ast.Import, ast.ImportFrom)))
+
+def get_app_imports() -> dict:
+    # Top-level imports of the app, and the imports of every section (the
+    # statements of the "if '<section>' in containers" blocks)
+    with open(APP_PATH) as f:
+        tree = ast.parse(f.read())
+    imports = {'top level': get_imports(tree.body)}
+    for _node in tree.body:
+        if isinstance(_node, ast.If) and isinstance(_node.test, ast.Compare) and isinstance(_node.test.left, ast.Constant):
+            imports[_node.test.left.value] = get_imports([_child for _child in ast.walk(_node)])
+    return imports
+
+def profile(code: str, setup: str='') -> tuple:
+    # (wall time of the code, {top-level module: cumulative import time}),
+    # after the setup (e.g. the imports done before a section renders)
+    script = (
+        f'import sys, time\nsys.path.insert(0, {ROOT_DIR!r})\n{setup}\n'
+        f'start = time.perf_counter()\n{code}\nprint(time.perf_counter() - start)'
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT_DIR
+    )
+    ## The setup's modules are not part of the profile
+    setup_modules = len(subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import sys\nsys.path.insert(0, {ROOT_DIR!r})\n{setup}'],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT_DIR
+    ).stderr.splitlines())
+    modules = {}
+    for _line in result.stderr.splitlines()[setup_modules:]:
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)', _line)
+        ## Only the top level (no indentation) modules
+        if match and len(match.group(3)) == 1:
+            modules[match.group(4)] = int(match.group(2)) / 1e6
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+def best_profile(code: str, setup: str, repeat: int) -> tuple:
+    runs = [profile(code, setup) for i in range(repeat)]
+    return min(runs, key=lambda _run: _run[0])
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    imports = get_app_imports()
+
+    cases = {
+        'top level, before': (EAGER_IMPORTS, ''),
+        'top level, after': (imports.pop('top level'), ''),
+        'utils.engine only': ('import utils.engine', '')
+    }
+    for _section, _code in imports.items():
+        cases[f'{_section} (when rendered)'] = (_code or 'pass', cases['top level, after'][0])
+    cases["trendline='ols', before"] = ('import statsmodels.api', EAGER_IMPORTS)
+
+    print(f"{'imports':<38}{'time (s)':>10}  heaviest top-level modules (cumulative s)")
+    for name, (code, setup) in cases.items():
+        elapsed, modules = best_profile(code, setup, repeat)
+        heaviest = sorted(modules.items(), key=lambda _item: -_item[1])[:4]
+        print(f"{name:<38}{elapsed:>10.3f}  " + ', '.join(f'{_module} {_time:.2f}' for _module, _time in heaviest))
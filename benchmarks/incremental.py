@@ -0,0 +1,104 @@
+import logging
+import shutil
+import tempfile
+import time
+import warnings
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+from utils.st_utils import StDataUtils, cache
+
+# Incremental ingestion benchmark: the last 1%, 5% and 15% of the rows of the
+# append-only sources are held back from a copy of data_sources/, the snapshot
+# is written, then the rows are appended back: time of get_clean_data with a
+# full rebuild (before) vs the incremental update of the snapshot (after). The
+# tables of both are compared, the review scores imputed with the frozen mean
+# of the last full cleaning excepted.
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/incremental.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def split_source(path: str, share: float) -> tuple:
+    # (first lines with the header, last lines) of the CSV, by whole lines
+    with open(path, 'rb') as f:
+        lines = f.readlines()
+    n_kept = len(lines) - int((len(lines) - 1) * share)
+    return b''.join(lines[:n_kept]), b''.join(lines[n_kept:])
+
+def get_clean_data() -> tuple:
+    # (time, data) of get_clean_data on the sources of the working directory
+    cache.clear()
+    u = StDataUtils()
+    start = time.perf_counter()
+    data = u.get_clean_data()
+    return time.perf_counter() - start, data
+
+def compare(data: dict, rebuilt_data: dict) -> bool:
+    # Same tables, the imputed review scores (the two means) excepted
+    for table_, df in data.items():
+        rebuilt_df = rebuilt_data[table_]
+        if table_ == 'order_reviews':
+            imputed = df['review_score'] != rebuilt_df['review_score']
+            df = df[~imputed]
+            rebuilt_df = rebuilt_df[~imputed]
+        if not df.reset_index(drop=True).equals(rebuilt_df.reset_index(drop=True)):
+            return False
+    return True
+
+if __name__ == '__main__':
+    c = Constants()
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    root = os.getcwd()
+
+    print(f"{'appended':>9}{'rows':>9}{'rebuild (s)':>13}{'incremental (s)':>17}{'speed-up':>10}{'same':>6}")
+    for share in [0.01, 0.05, 0.15]:
+        work_dir = tempfile.mkdtemp()
+        try:
+            os.chdir(work_dir)
+            splits = {}
+            for source_, path in c.source.items():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if source_ in c.append_only_sources:
+                    head, tail = split_source(os.path.join(root, path), share)
+                    splits[path] = (head, tail)
+                else:
+                    shutil.copy(os.path.join(root, path), path)
+
+            rebuild_times, incremental_times = [], []
+            for i in range(repeat):
+                ## Snapshot of the first rows, then append the last ones
+                shutil.rmtree(c.snapshot_dir, ignore_errors=True)
+                for path, (head, tail) in splits.items():
+                    with open(path, 'wb') as f:
+                        f.write(head)
+                get_clean_data()
+                for path, (head, tail) in splits.items():
+                    with open(path, 'ab') as f:
+                        f.write(tail)
+                ## The incremental update first (it updates the snapshot), then
+                ## a full rebuild without the snapshot
+                incremental_time, data = get_clean_data()
+                incremental_times.append(incremental_time)
+                shutil.rmtree(c.snapshot_dir)
+                rebuild_time, rebuilt_data = get_clean_data()
+                rebuild_times.append(rebuild_time)
+
+            n_rows = sum(_tail.count(b'\n') for _head, _tail in splits.values())
+            rebuild_time, incremental_time = min(rebuild_times), min(incremental_times)
+            same = compare(data, rebuilt_data)
+            print(f"{share:>9.0%}{n_rows:>9}{rebuild_time:>13.3f}{incremental_time:>17.3f}{rebuild_time/incremental_time:>9.1f}x{str(same):>6}")
+        finally:
+            os.chdir(root)
+            shutil.rmtree(work_dir)
@@ -0,0 +1,60 @@
+import subprocess
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+# Ingestion benchmark: default inference + astype vs typed read_csv, per table.
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/ingestion.py [repeat]
+
+# Every table is loaded in a fresh interpreter, so that ru_maxrss (peak RSS)
+# only accounts for that table
+LOAD_SCRIPT = '''
+import resource, sys, time
+import pandas as pd
+from utils.ingestion import IngestionUtils
+table_, mode = sys.argv[1], sys.argv[2]
+i = IngestionUtils()
+base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if mode == 'default':
+    df = pd.read_csv(i.source[table_]).rename(columns=i.column_replacement.get(table_, {}))
+    df = df[list(i.requirements[table_].keys())].astype(i.requirements[table_], errors='ignore')
+else:
+    df = i.read_source(table_, engine=mode)
+elapsed = time.perf_counter() - start
+peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, (peak_rss - base_rss) / 1024)
+'''
+
+def run_load(table_name: str, mode: str) -> tuple:
+    result = subprocess.run(
+        [sys.executable, '-c', LOAD_SCRIPT, table_name, mode],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    elapsed, peak_rss = result.stdout.strip().splitlines()[-1].split()
+    return float(elapsed), float(peak_rss)
+
+if __name__ == '__main__':
+    c = Constants()
+    modes = ['default', 'c', 'pyarrow']
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    print(f"{'table':<36}{'mode':<10}{'wall (s)':>10}{'peak RSS (MB)':>15}")
+    for table_ in c.source.keys():
+        for mode in modes:
+            runs = [run_load(table_, mode) for i in range(repeat)]
+            elapsed = min(run[0] for run in runs)
+            peak_rss = min(run[1] for run in runs)
+            print(f"{table_:<36}{mode:<10}{elapsed:>10.3f}{peak_rss:>15.1f}")
@@ -0,0 +1,80 @@
+import logging
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils
+from utils.delivery import DeliveryUtils
+
+# Lead time benchmark: the percentiles of the lead times of the orders by month,
+# state and category, with timedeltas, drop_duplicates and groupby quantile
+# (before) vs int64 timestamps and sorted partitions (after,
+# DeliveryUtils.get_lead_time_summary), with the same results, at 1x and 10x
+# (the fact table repeated 10 times, as other orders).
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/leadtime.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def best_time(func, repeat: int) -> float:
+    elapsed = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+def pandas_summary(d: DeliveryUtils, df: pd.DataFrame, by: str) -> pd.DataFrame:
+    # The same percentiles & late rate with pandas
+    if by is None:
+        keys = pd.Series(0, index=df.index)
+    elif by == 'month':
+        keys = df['order_purchase_timestamp'].dt.strftime('%Y-%m')
+    else:
+        keys = df[d.lead_time_groups[by]]
+    orders_df = df.assign(key=keys).drop_duplicates(subset=['order_id', 'key']).dropna(subset=['key'])
+    lead_times_df = pd.DataFrame({
+        _stage: (orders_df[_end] - orders_df[_start]).dt.total_seconds() / 86400
+        for _stage, (_start, _end) in d.lead_time_stages.items()
+    }).assign(key=orders_df['key'])
+    summary_df = lead_times_df.groupby('key').quantile([_percentile / 100 for _percentile in d.lead_time_percentiles]).unstack()
+    summary_df.columns = [f'{_stage}_p{round(_quantile * 100)}' for _stage, _quantile in summary_df.columns]
+    ## Late: delivered on a later day than the estimated delivery date
+    late = orders_df['order_delivered_customer_date'].dt.normalize() > orders_df['order_estimated_delivery_date'].dt.normalize()
+    summary_df['late_rate'] = late.groupby(orders_df['key']).sum() / lead_times_df.groupby('key')['delay'].count()
+    return summary_df.reset_index(drop=True)
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    d = DeliveryUtils()
+    data = u.get_clean_data()
+    fact_df = u.get_fact_data(data)
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    print(f"{'lead times':<30}{'groups':>8}{'pandas (s)':>12}{'sorted (s)':>12}{'speed-up':>10}")
+    for volume in [1, 10]:
+        df = pd.concat([
+            fact_df.assign(order_id=fact_df['order_id'].astype('str') + f'-{i}')
+            for i in range(volume)
+        ], ignore_index=True)
+        for by in [None, 'month', 'state', 'category']:
+            summary_df = d.get_lead_time_summary(df, by)
+            expected_df = pandas_summary(d, df, by)
+            np.testing.assert_allclose(summary_df[expected_df.columns].to_numpy(dtype='float64'), expected_df.to_numpy(dtype='float64'), equal_nan=True)
+            pandas_time = best_time(lambda: pandas_summary(d, df, by), repeat)
+            sorted_time = best_time(lambda: d.get_lead_time_summary(df, by), repeat)
+            label = f"{volume}x ({len(df)} rows), {by or 'all'}"
+            print(f"{label:<30}{len(summary_df):>8}{pandas_time:>12.3f}{sorted_time:>12.3f}{pandas_time/sorted_time:>9.1f}x")
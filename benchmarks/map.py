@@ -0,0 +1,78 @@
+import logging
+import random
+import time
+import warnings
+from streamlit.elements.map import to_deckgl_json
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils
+
+# Map benchmark: the points of the map of the Demographic Analysis, every zip
+# code prefix with a random color per location (before) vs the zips binned into
+# grid cells (after, EngineUtils.get_map_points), and the largest zips only:
+# number of points, time to compute them and to serialize the deck.gl chart
+# (what st.map does on the server), and size of its JSON payload (what the
+# browser downloads & draws, its render time grows with the number of points).
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/map.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def best_time(func, repeat: int) -> float:
+    elapsed = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+def get_random_points(u: StDataUtils, metrics_by_locations_df, location_column: str):
+    # The map of the dashboard before: a random color per location
+    color_map = {_location: random.choice(u.css_colors) for _location in metrics_by_locations_df[location_column].unique()}
+    return metrics_by_locations_df.assign(color=metrics_by_locations_df[location_column].map(color_map))
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    data = u.get_clean_data()
+    fact_df = u.get_fact_data(data)
+    metrics_by_locations_df = u.get_metrics_by_locations(fact_df)
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print(f"{len(metrics_by_locations_df)} zip code prefixes, at most {u.map_max_points} points")
+    print(f"{'map':<52}{'points':>8}{'compute (s)':>13}{'serialize (s)':>15}{'payload (KB)':>14}")
+    for location_column in ['geolocation_state', 'geolocation_city']:
+        for size_column in ['revenue_w_o_freight', 'order_count', 'customer_count']:
+            cases = {
+                'every zip, random colors': (
+                    lambda: get_random_points(u, metrics_by_locations_df, location_column),
+                    size_column
+                ),
+                'grid cells': (
+                    lambda: u.get_map_points.__wrapped__(u, metrics_by_locations_df, location_column, size_column, True),
+                    'size'
+                ),
+                'largest zips': (
+                    lambda: u.get_map_points.__wrapped__(u, metrics_by_locations_df, location_column, size_column, False),
+                    'size'
+                )
+            }
+            for name, (get_points, size) in cases.items():
+                points_df = get_points()
+                serialize = lambda: to_deckgl_json(points_df, 'geolocation_lat', 'geolocation_lng', size, 'color', None, None)
+                payload = len(serialize().encode())
+                compute_time = best_time(get_points, repeat)
+                serialize_time = best_time(serialize, repeat)
+                label = f"{location_column[12:]}, {size_column}, {name}"
+                print(f"{label:<52}{len(points_df):>8}{compute_time:>13.4f}{serialize_time:>15.4f}{payload/1024:>14.1f}")
+
@@ -0,0 +1,63 @@
+import logging
+import tempfile
+import time
+import warnings
+from unidecode import unidecode
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.ingestion import IngestionUtils
+from utils.normalization import NormalizationUtils
+
+# City name normalization benchmark: unidecode of every row with .apply (before)
+# vs once per distinct name with NormalizationUtils (after), with an empty
+# dictionary (first cold start) and with the dictionary saved by a previous run
+# (the next ones, loading it included), per city column: all the geolocation
+# rows, the geolocations deduplicated by zip code prefix (what get_clean_data
+# normalizes), the customers and the sellers.
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/normalization.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def best_time(func, repeat: int) -> float:
+    elapsed = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+if __name__ == '__main__':
+    i = IngestionUtils()
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    geolocations_df = i.read_source('geolocations')
+    columns = {
+        'geolocations (all rows)': geolocations_df['geolocation_city'],
+        'geolocations (by zip)': geolocations_df.drop_duplicates(subset='geolocation_zip_code_prefix')['geolocation_city'],
+        'customers': i.read_source('customers')['customer_city'],
+        'sellers': i.read_source('sellers')['seller_city']
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        n = NormalizationUtils(os.path.join(work_dir, 'city_names.json'))
+        print(f"{'column':<26}{'rows':>10}{'distinct':>10}{'apply (s)':>11}{'cold (s)':>10}{'warm (s)':>10}{'speed-up':>10}")
+        for name, values in columns.items():
+            apply_time = best_time(lambda: values.apply(unidecode), repeat)
+            cold_time = best_time(lambda: n.normalize(values, {}), repeat)
+            names = {}
+            n.normalize(values, names)
+            n.save_names(names)
+            warm_time = best_time(lambda: n.normalize(values, n.load_names()), repeat)
+            assert n.normalize(values, {}).equals(values.apply(unidecode))
+            print(f"{name:<26}{len(values):>10}{values.nunique():>10}{apply_time:>11.3f}{cold_time:>10.3f}{warm_time:>10.3f}{apply_time/warm_time:>9.1f}x")
@@ -0,0 +1,72 @@
+import logging
+import time
+import warnings
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils, cache
+
+# Parallel benchmark: time to compute the derived data of all sections after a
+# filter change (cache misses) with 1, 2, 4 and 8 worker threads, at 1x and 10x
+# (the fact table repeated 10 times), with the critical path of the graph (the
+# longest chain of dependent nodes, the best time with enough cores).
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/parallel.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def best_time(u: StDataUtils, fact_df: pd.DataFrame, filters: tuple, names: list, workers: int, repeat: int) -> tuple:
+    # (time, graph) of the names on a new graph
+    elapsed = []
+    for i in range(repeat):
+        cache.clear()
+        fact_index = u.get_fact_index(fact_df)
+        fact_cube = u.get_fact_cube(fact_df)
+        graph = u.get_data_graph(fact_df, fact_index, fact_cube, *filters)
+        start = time.perf_counter()
+        graph.compute(names, workers)
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed), graph
+
+def get_critical_path(graph) -> float:
+    # Longest sum of the node times along the dependencies
+    finish = {}
+    for _name in graph.get_order(list(graph.timings.keys())):
+        dependencies = graph.nodes[_name][1]
+        finish[_name] = graph.timings[_name] + max([finish[_dependency] for _dependency in dependencies], default=0)
+    return max(finish.values())
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    data = u.get_clean_data()
+    base_fact_df = u.get_fact_data(data)
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    last_date = base_fact_df['order_purchase_timestamp'].max().date()
+    first_date = base_fact_df['order_purchase_timestamp'].min().date()
+    filters = (first_date, last_date, ['delivered'], [], [], [])
+    names = [_name for _names in u.section_dependencies.values() for _name in _names]
+
+    print(f"cores: {os.cpu_count()}")
+    print(f"{'volume':>8}{'workers':>9}{'time (s)':>10}{'speed-up':>10}{'critical path (s)':>19}")
+    for volume in [1, 10]:
+        fact_df = (
+            pd.concat([base_fact_df] * volume, ignore_index=True)
+            .sort_values(by='order_purchase_timestamp', kind='stable', ignore_index=True)
+        )
+        sequential_time, graph = best_time(u, fact_df, filters, names, 1, repeat)
+        critical_path = get_critical_path(graph)
+        for workers in [1, 2, 4, 8]:
+            elapsed = sequential_time if workers == 1 else best_time(u, fact_df, filters, names, workers, repeat)[0]
+            print(f"{str(volume) + 'x':>8}{workers:>9}{elapsed:>10.3f}{sequential_time/elapsed:>9.1f}x{critical_path:>19.3f}")
@@ -0,0 +1,107 @@
+import logging
+import time
+import warnings
+import pandas as pd
+import streamlit as st
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils
+
+# Rerun benchmark: latency of the filtering done on a sidebar change, i.e. the
+# two get_filtered_data calls of streamlit_app.py (filtered_df & filtered_df_2),
+# re-merging all tables (before) vs masking the prebuilt fact table (after).
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/rerun.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+@st.cache_data
+def get_merged_data(data: dict, start_date, end_date, order_status: list) -> pd.DataFrame:
+    # The filtering before the fact table: build the all-True filters row by
+    # row, filter the orders, then merge every table again on each call
+    start_filter = pd.Series([True for i, rows in data['orders'].iterrows()])
+    if start_date:
+        start_filter = (data['orders']['order_purchase_timestamp'].dt.date >= start_date)
+    end_filter = (data['orders']['order_purchase_timestamp'].dt.date <= end_date)
+    order_status_filter = start_filter
+    if order_status:
+        order_status_filter = (data['orders']['order_status'].isin(order_status))
+    orders_df = data['orders'][(start_filter & end_filter & order_status_filter)]
+
+    order_items_df = (
+        data['order_items'][['order_id', 'price', 'freight_value', 'product_id']]
+        .merge(data['products'][['product_id', 'product_category_name']], how="left", on="product_id")
+        .merge(data['product_category_name_translations'], how="left", on="product_category_name")
+        .drop(columns=['product_category_name'])
+    )
+    order_items_df = order_items_df[pd.Series([True for i, rows in order_items_df.iterrows()])]
+    customers_df = data['customers'][pd.Series([True for i, rows in data['customers'].iterrows()])]
+
+    return (
+        orders_df
+        .merge(order_items_df, how="left", on="order_id")
+        .merge(data['order_reviews'][['review_id', 'order_id', 'review_score']], how="left", on="order_id")
+        .merge(customers_df, how="left", on="customer_id")
+        .merge(
+            data['geolocations'],
+            how="left",
+            left_on="customer_zip_code_prefix",
+            right_on="geolocation_zip_code_prefix"
+        )
+        .drop(columns=['geolocation_zip_code_prefix'])
+    )
+
+def time_rerun(func, cached_func, scenarios: list, repeat: int) -> float:
+    # Every call is a cache miss, as for a new sidebar value
+    elapsed = []
+    for i in range(repeat):
+        for start_date, end_date, order_status in scenarios:
+            cached_func.clear()
+            start = time.perf_counter()
+            func(start_date, end_date, order_status)
+            func(start_date, end_date, [])
+            elapsed.append(time.perf_counter() - start)
+    return sum(elapsed) / len(elapsed)
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    data = u.get_clean_data()
+    fact_df = u.get_fact_data(data)
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    first_date = data['orders']['order_purchase_timestamp'].min().date()
+    last_date = data['orders']['order_purchase_timestamp'].max().date()
+    scenarios = [
+        (first_date, last_date, ['delivered']),
+        (first_date, last_date, ['delivered', 'shipped']),
+        (last_date - pd.Timedelta(days=90), last_date, ['delivered'])
+    ]
+
+    before = time_rerun(
+        lambda *args: get_merged_data(data, *args),
+        get_merged_data,
+        scenarios,
+        repeat
+    )
+    after = time_rerun(
+        lambda *args: u.get_filtered_data(fact_df, *args, [], [], []),
+        u.get_filtered_data,
+        scenarios,
+        repeat
+    )
+
+    print("Filtering latency per rerun (2 x get_filtered_data, cache miss):")
+    print(f" > Before (merge all tables) : {before:.3f}s")
+    print(f" > After (mask fact table)   : {after:.3f}s")
+    print(f" > Speed-up                  : {before/after:.1f}x")
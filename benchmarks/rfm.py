@@ -0,0 +1,112 @@
+import logging
+import time
+import warnings
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils
+from utils.rfm import RfmUtils
+
+# RFM benchmark: time of the RFM table of get_rfm_analysis, groupby & apply on
+# the recency dates (before) vs RfmUtils (after, with the quintile scores & the
+# segments), and of the three top 5 customer charts, sort_values vs
+# argpartition, on the dataset and on synthetic sets of 1M and 3M customers
+# (order lines drawn from the dataset's dates & prices) with string ids or the
+# int32 codes of the compact mode.
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/rfm.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def get_rfm_by_apply(filtered_df: pd.DataFrame) -> pd.DataFrame:
+    # The RFM table before RfmUtils
+    rfm_df = (
+        filtered_df
+        .groupby(by="customer_unique_id", as_index=False, observed=True)
+        .agg({
+            "order_purchase_timestamp": "max",
+            "order_id": "nunique",
+            "price": "sum"
+        })
+    )
+    rfm_df.columns = ["customer_id", "max_order_timestamp", "frequency", "monetary"]
+    rfm_df["max_order_timestamp"] = rfm_df["max_order_timestamp"].dt.date
+    recent_date = filtered_df["order_purchase_timestamp"].dt.date.max() + timedelta(days=1)
+    rfm_df["recency"] = rfm_df["max_order_timestamp"].apply(lambda x: (recent_date - x).days)
+    rfm_df = rfm_df.drop(columns=['max_order_timestamp'])
+    return rfm_df.reset_index()
+
+def get_synthetic_data(fact_df: pd.DataFrame, n_customers: int, compact: bool=False, seed: int=0) -> pd.DataFrame:
+    # 1.5 order lines per customer on average, with the dates & prices of the
+    # dataset, string ids (or int32 codes like the compact mode)
+    rng = np.random.default_rng(seed)
+    n_rows = int(n_customers * 1.5)
+    rows = rng.integers(0, len(fact_df), n_rows)
+    customers = rng.integers(0, n_customers, n_rows)
+    orders = customers * 4 + rng.integers(0, 4, n_rows)
+    return pd.DataFrame({
+        'customer_unique_id': customers.astype('int32') if compact else pd.Series(customers).map('customer-{:08d}'.format),
+        'order_id': orders.astype('int32') if compact else pd.Series(orders).map('order-{:010d}'.format),
+        'order_purchase_timestamp': fact_df['order_purchase_timestamp'].to_numpy()[rows],
+        'price': fact_df['price'].to_numpy()[rows]
+    })
+
+def best_time(func, repeat: int) -> tuple:
+    elapsed = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed), result
+
+def top_by_sort(rfm_df: pd.DataFrame) -> list:
+    return [
+        rfm_df.sort_values(by='recency', ascending=True).head(5),
+        rfm_df.sort_values(by='frequency', ascending=False).head(5),
+        rfm_df.sort_values(by='monetary', ascending=False).head(5)
+    ]
+
+def top_by_partition(rfm_df: pd.DataFrame) -> list:
+    r = RfmUtils()
+    return [
+        r.get_top(rfm_df, 'recency', 5, ascending=True),
+        r.get_top(rfm_df, 'frequency', 5),
+        r.get_top(rfm_df, 'monetary', 5)
+    ]
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    fact_df = u.get_fact_data(u.get_clean_data())
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    datasets = {'dataset': fact_df}
+    for n_customers in [1_000_000, 3_000_000]:
+        for compact in [False, True]:
+            keys = 'codes' if compact else 'strings'
+            datasets[f'{n_customers // 1_000_000}M, {keys}'] = get_synthetic_data(fact_df, n_customers, compact)
+
+    print(f"{'data':<14}{'customers':>11}{'apply (s)':>11}{'rfm (s)':>9}{'speed-up':>10}{'sort (s)':>10}{'top-k (s)':>11}{'speed-up':>10}{'same':>6}")
+    for name, df in datasets.items():
+        apply_time, before = best_time(lambda: get_rfm_by_apply(df), repeat)
+        rfm_time, after = best_time(lambda: RfmUtils().get_rfm(df).reset_index(), repeat)
+        sort_time = best_time(lambda: top_by_sort(after), repeat)[0]
+        top_time = best_time(lambda: top_by_partition(after), repeat)[0]
+        ## (the monetary sums are equal up to the float rounding)
+        same = (
+            before.drop(columns='monetary').equals(after[before.columns].drop(columns='monetary'))
+            and np.allclose(before['monetary'], after['monetary'])
+        )
+        print(f"{name:<14}{len(after):>11}{apply_time:>11.3f}{rfm_time:>9.3f}{apply_time/rfm_time:>9.1f}x{sort_time:>10.4f}{top_time:>11.4f}{sort_time/top_time:>9.1f}x{str(same):>6}")
@@ -0,0 +1,65 @@
+import logging
+import time
+import warnings
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils, cache
+
+# Sections benchmark: cost of a rerun after a filter change (the derived data
+# of the dashboard are cache misses), computing the data of every section up
+# front (before) vs only the data of the selected section (lazy_sections), at
+# 1x and 10x (the fact table repeated 10 times). The rendering is not timed.
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/sections.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+def best_time(u: StDataUtils, fact_df: pd.DataFrame, filters: tuple, names: list, repeat: int) -> tuple:
+    # (time, computed nodes) of the names on a new graph, the fact table, its
+    # index and its cube stay cached like in the app
+    elapsed = []
+    for i in range(repeat):
+        cache.clear()
+        fact_index = u.get_fact_index(fact_df)
+        fact_cube = u.get_fact_cube(fact_df)
+        graph = u.get_data_graph(fact_df, fact_index, fact_cube, *filters)
+        start = time.perf_counter()
+        graph.compute(names)
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed), len(graph.values)
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    data = u.get_clean_data()
+    base_fact_df = u.get_fact_data(data)
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    last_date = base_fact_df['order_purchase_timestamp'].max().date()
+    first_date = base_fact_df['order_purchase_timestamp'].min().date()
+    filters = (first_date, last_date, ['delivered'], [], [], [])
+    all_sections = [
+        _name for _names in u.section_dependencies.values() for _name in _names
+    ]
+
+    print(f"{'section':<24}{'volume':>8}{'nodes':>7}{'all (s)':>10}{'lazy (s)':>10}{'speed-up':>10}")
+    for volume in [1, 10]:
+        fact_df = (
+            pd.concat([base_fact_df] * volume, ignore_index=True)
+            .sort_values(by='order_purchase_timestamp', kind='stable', ignore_index=True)
+        )
+        all_time, all_nodes = best_time(u, fact_df, filters, all_sections, repeat)
+        for section, names in u.section_dependencies.items():
+            lazy_time, nodes = best_time(u, fact_df, filters, names, repeat)
+            print(f"{section:<24}{str(volume) + 'x':>8}{str(nodes) + '/' + str(all_nodes):>7}{all_time:>10.3f}{lazy_time:>10.3f}{all_time/lazy_time:>9.1f}x")
@@ -0,0 +1,121 @@
+import logging
+import time
+import warnings
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.st_utils import StDataUtils
+from utils.spatial import SpatialIndexUtils
+
+# Spatial index benchmark: the geolocation of the fact rows by a merge on the zip
+# code prefix (before) vs a gather from the dense lookup (after), at 1x and 10x
+# (the customers of the fact table repeated 10 times); the orders within a
+# radius by the distance of every fact row (before) vs of the rows in its
+# bounding box (after, EngineUtils.get_orders_within_radius); the zips within a
+# radius and the nearest sellers & zips by the distance of every point (before)
+# vs the cells of the grid around the point (after), with the same results.
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/spatial.py [repeat]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+# (name, latitude, longitude) of the query points
+POINTS = [
+    ('Sao Paulo', -23.5505, -46.6333),
+    ('Rio de Janeiro', -22.9068, -43.1729),
+    ('Manaus', -3.1190, -60.0217)
+]
+
+def best_time(func, repeat: int) -> float:
+    elapsed = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+if __name__ == '__main__':
+    u = StDataUtils()
+    sp = SpatialIndexUtils()
+    data = u.get_clean_data()
+    fact_df = u.get_fact_data(data)
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    geolocations_df = data['geolocations'][['geolocation_zip_code_prefix', 'geolocation_lat', 'geolocation_lng', 'geolocation_city', 'geolocation_state']]
+
+    print(f"{'geolocation of the rows':<32}{'merge (s)':>12}{'lookup (s)':>12}{'speed-up':>10}")
+    for volume in [1, 10]:
+        customers_df = pd.concat([fact_df[['customer_id', 'customer_zip_code_prefix']]] * volume, ignore_index=True)
+        merge = lambda: customers_df.merge(
+            geolocations_df,
+            how="left",
+            left_on="customer_zip_code_prefix",
+            right_on="geolocation_zip_code_prefix"
+        ).drop(columns=['geolocation_zip_code_prefix'])
+        gather = lambda: customers_df.join(sp.get_zip_locations(sp.build_zip_lookup(data['geolocations']), customers_df['customer_zip_code_prefix']))
+        pd.testing.assert_frame_equal(merge(), gather())
+        merge_time = best_time(merge, repeat)
+        gather_time = best_time(gather, repeat)
+        print(f"{f'{volume}x ({len(customers_df)} rows)':<32}{merge_time:>12.3f}{gather_time:>12.3f}{merge_time/gather_time:>9.1f}x")
+
+    zip_lookup = u.get_zip_lookup(data)
+    zip_grid = sp.build_grid(zip_lookup['lat'], zip_lookup['lng'])
+    seller_grid = u.get_seller_grid(data, zip_lookup)
+    seller_locations = sp.get_zip_locations(zip_lookup, data['sellers']['seller_zip_code_prefix'])
+    print(f"\nGrids ({zip_grid['cell_size']} degree cells): {len(zip_grid['ids'])} zips in {len(zip_grid['cells'])} cells, {len(seller_grid['ids'])} sellers in {len(seller_grid['cells'])} cells")
+
+    def scan_radius(lat: float, lng: float, radius: float) -> pd.DataFrame:
+        distances = sp.get_haversine_distance(lat, lng, fact_df['geolocation_lat'], fact_df['geolocation_lng'])
+        within = distances <= radius
+        return fact_df[within].assign(distance_km=distances[within])
+
+    def scan_zips(lat: float, lng: float, radius: float) -> np.ndarray:
+        distances = sp.get_haversine_distance(lat, lng, zip_lookup['lat'], zip_lookup['lng'])
+        return np.flatnonzero(distances <= radius)
+
+    print(f"{'within radius':<32}{'found':>8}{'scan (s)':>12}{'index (s)':>12}{'speed-up':>10}")
+    for name, lat, lng in POINTS:
+        for radius in [10.0, 50.0, 200.0]:
+            ## The orders (rows of the fact table): prefiltered by the bounding box
+            index_radius = lambda: u.get_orders_within_radius.__wrapped__(u, fact_df, lat, lng, radius)
+            found = index_radius()
+            assert found.index.equals(scan_radius(lat, lng, radius).index)
+            scan_time = best_time(lambda: scan_radius(lat, lng, radius), repeat)
+            index_time = best_time(index_radius, repeat)
+            print(f"{f'orders, {name}, {radius:.0f} km':<32}{len(found):>8}{scan_time:>12.4f}{index_time:>12.4f}{scan_time/index_time:>9.1f}x")
+
+            ## The zip code prefixes: the cells of the grid around the point
+            found = sp.get_within_radius(zip_grid, lat, lng, radius)[0]
+            assert np.array_equal(np.sort(found), scan_zips(lat, lng, radius))
+            scan_time = best_time(lambda: scan_zips(lat, lng, radius), repeat)
+            index_time = best_time(lambda: sp.get_within_radius(zip_grid, lat, lng, radius), repeat)
+            print(f"{f'zips, {name}, {radius:.0f} km':<32}{len(found):>8}{scan_time:>12.4f}{index_time:>12.4f}{scan_time/index_time:>9.1f}x")
+
+    def scan_nearest(lat: float, lng: float, points_lat: np.ndarray, points_lng: np.ndarray, k: int) -> np.ndarray:
+        distances = sp.get_haversine_distance(lat, lng, points_lat, points_lng)
+        return np.sort(distances[~np.isnan(distances)])[:k]
+
+    ## Query points spread over Brazil: the customers of random fact rows
+    queries = fact_df[['geolocation_lat', 'geolocation_lng']].dropna().sample(200, random_state=0).to_numpy()
+    print(f"{'nearest (200 points)':<32}{'':>8}{'scan (s)':>12}{'grid (s)':>12}{'speed-up':>10}")
+    for name, grid, points_lat, points_lng in [
+        ('sellers', seller_grid, seller_locations['geolocation_lat'].to_numpy(), seller_locations['geolocation_lng'].to_numpy()),
+        ('zips', zip_grid, zip_lookup['lat'], zip_lookup['lng'])
+    ]:
+        for k in [1, 5, 20]:
+            for lat, lng in queries:
+                assert np.allclose(sp.get_nearest(grid, lat, lng, k)[1], scan_nearest(lat, lng, points_lat, points_lng, k))
+            scan_time = best_time(lambda: [scan_nearest(lat, lng, points_lat, points_lng, k) for lat, lng in queries], repeat)
+            grid_time = best_time(lambda: [sp.get_nearest(grid, lat, lng, k) for lat, lng in queries], repeat)
+            print(f"{f'{name}, k = {k}':<32}{'':>8}{scan_time:>12.4f}{grid_time:>12.4f}{scan_time/grid_time:>9.1f}x")
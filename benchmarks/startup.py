@@ -0,0 +1,55 @@
+import shutil
+import subprocess
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+# Startup benchmark: cold CSV load vs warm snapshot load of get_clean_data.
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/startup.py [repeat]
+
+# Every run happens in a fresh interpreter, like a new Streamlit worker
+LOAD_SCRIPT = '''
+import logging, time, warnings
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+from utils.st_utils import StDataUtils
+start = time.perf_counter()
+StDataUtils().get_clean_data()
+print(time.perf_counter() - start)
+'''
+
+def run_load() -> float:
+    result = subprocess.run(
+        [sys.executable, '-c', LOAD_SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+if __name__ == '__main__':
+    c = Constants()
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    cold, warm = [], []
+    for i in range(repeat):
+        # Cold start: no snapshot, parse & clean the CSVs (and write the snapshot)
+        shutil.rmtree(c.snapshot_dir, ignore_errors=True)
+        cold.append(run_load())
+        # Warm start: memory-map the snapshot written by the cold start
+        warm.append(run_load())
+
+    print(f"get_clean_data startup ({repeat} runs):")
+    print(f" > Cold (CSV)      : best {min(cold):.3f}s, mean {sum(cold)/repeat:.3f}s")
+    print(f" > Warm (snapshot) : best {min(warm):.3f}s, mean {sum(warm)/repeat:.3f}s")
+    print(f" > Speed-up        : {min(cold)/min(warm):.1f}x")
@@ -0,0 +1,150 @@
+import logging
+import math
+import pickle
+import shutil
+import subprocess
+import tempfile
+import warnings
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+# Streaming benchmark: the order sources are scaled up (copies of the dataset
+# with their own order, customer & review ids) until the CSVs are bigger than
+# the memory cap, then the monthly & quarterly metrics, the metrics by location
+# and the RFM table of all rows are computed in memory (get_clean_data,
+# get_fact_data & the aggregations, before) vs by StreamingUtils with a few
+# chunk sizes (after): wall time of the first run (the partitions are built)
+# and of a rerun (from the snapshot / the partitions), peak RSS above the imports, and the results are compared.
+# Run it from the project root with the full Olist set in data_sources/:
+#   python benchmarks/streaming.py [memory cap in MB]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Every pipeline runs in a fresh interpreter, so that ru_maxrss (peak RSS)
+# only accounts for that pipeline
+RUN_SCRIPT = '''
+import pickle, resource, sys, time, warnings
+warnings.filterwarnings('ignore')
+sys.path.insert(0, sys.argv[4])
+from utils.st_utils import StDataUtils, cache
+from utils.streaming import StreamingUtils
+mode, chunk_rows, output = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+elapsed = []
+for i in range(2):
+    cache.clear()
+    start = time.perf_counter()
+    if mode == 'streaming':
+        s = StreamingUtils()
+        s.streaming_chunk_rows = chunk_rows
+        result = s.aggregate()
+    else:
+        u = StDataUtils()
+        filtered_df = u.get_filtered_data(u.get_fact_data(u.get_clean_data()), None, None, [], [], [], [])
+        result = {
+            'monthly_metrics_df': u.get_metrics_by_month(filtered_df),
+            'quarterly_metrics_df': u.get_metrics_by_quarter(filtered_df),
+            'metrics_by_locations_df': u.get_metrics_by_locations(filtered_df),
+            'rfm_df': u.get_rfm_analysis(filtered_df)
+        }
+        del filtered_df
+    elapsed.append(time.perf_counter() - start)
+peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+with open(output, 'wb') as f:
+    pickle.dump(result, f)
+print(elapsed[0], elapsed[1], (peak_rss - base_rss) / 1024)
+'''
+
+# Key columns given their own values in every copy of the dataset
+SCALED_KEYS = {
+    'customers': ['customer_id', 'customer_unique_id'],
+    'orders': ['order_id', 'customer_id'],
+    'order_items': ['order_id'],
+    'order_payments': ['order_id'],
+    'order_reviews': ['review_id', 'order_id']
+}
+
+def write_scaled_sources(root: str, scale: int):
+    # Write scale copies of the order sources (by chunks) in the working
+    # directory, the other sources are copied as is
+    c = Constants()
+    for source_, path in c.source.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if source_ not in SCALED_KEYS:
+            shutil.copy(os.path.join(root, path), path)
+            continue
+        with open(path, 'w', newline='') as f:
+            for k in range(scale):
+                for chunk in pd.read_csv(os.path.join(root, path), dtype=str, keep_default_na=False, chunksize=200_000):
+                    for _col in SCALED_KEYS[source_]:
+                        chunk[_col] = chunk[_col] + f'{k:03d}'
+                    chunk.to_csv(f, header=f.tell() == 0, index=False)
+
+def run(mode: str, chunk_rows: int, output: str) -> tuple:
+    result = subprocess.run(
+        [sys.executable, '-c', RUN_SCRIPT, mode, str(chunk_rows), output, ROOT_DIR],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    first_time, rerun_time, peak_rss = result.stdout.strip().splitlines()[-1].split()
+    with open(output, 'rb') as f:
+        return float(first_time), float(rerun_time), float(peak_rss), pickle.load(f)
+
+def compare(result: dict, expected: dict) -> bool:
+    # Same tables, the float sums up to their rounding (other summation order)
+    for _name, expected_df in expected.items():
+        df = result[_name]
+        if list(df.columns) != list(expected_df.columns) or len(df) != len(expected_df):
+            return False
+        for _col in df.columns:
+            if df[_col].dtype.kind == 'f':
+                if not np.allclose(df[_col], expected_df[_col], equal_nan=True):
+                    return False
+            elif not df[_col].reset_index(drop=True).equals(expected_df[_col].reset_index(drop=True)):
+                return False
+    return True
+
+if __name__ == '__main__':
+    c = Constants()
+    memory_cap = float(sys.argv[1]) if len(sys.argv) > 1 else 256
+    root = os.getcwd()
+
+    ## Enough copies for the order sources to be twice as big as the cap
+    source_size = sum(os.path.getsize(os.path.join(root, c.source[_source])) for _source in SCALED_KEYS) / 2 ** 20
+    scale = max(1, math.ceil(2 * memory_cap / source_size))
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        os.chdir(work_dir)
+        write_scaled_sources(root, scale)
+        size = sum(os.path.getsize(_path) for _path in c.source.values()) / 2 ** 20
+        print(f"{scale} copies of the orders, {size:.0f} MB of CSV, memory cap {memory_cap:.0f} MB")
+
+        print(f"{'pipeline':<22}{'first (s)':>11}{'rerun (s)':>11}{'peak RSS (MB)':>15}{'< cap':>7}{'same':>6}")
+        first_time, rerun_time, peak_rss, expected = run('in-memory', 0, os.path.join(work_dir, 'in-memory.pkl'))
+        print(f"{'in memory':<22}{first_time:>11.2f}{rerun_time:>11.2f}{peak_rss:>15.0f}{str(peak_rss < memory_cap):>7}{'':>6}")
+        for chunk_rows in [25_000, 100_000]:
+            shutil.rmtree(c.streaming_dir, ignore_errors=True)
+            first_time, rerun_time, peak_rss, result = run('streaming', chunk_rows, os.path.join(work_dir, 'streaming.pkl'))
+            name = f'streaming, {chunk_rows // 1000}k rows'
+            print(f"{name:<22}{first_time:>11.2f}{rerun_time:>11.2f}{peak_rss:>15.0f}{str(peak_rss < memory_cap):>7}{str(compare(result, expected)):>6}")
+    finally:
+        os.chdir(root)
+        shutil.rmtree(work_dir)
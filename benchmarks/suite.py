@@ -0,0 +1,329 @@
+import argparse
+import ast
+import json
+import logging
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timedelta
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+# Benchmark suite of the EngineUtils pipeline, to check any performance change
+# against a stored baseline: the imports of a new worker (the top level of
+# streamlit_app.py, and the engine alone, peak RSS instead of traced memory),
+# then every stage (get_clean_data cold & warm, the fact table, its index &
+# cube, get_filtered_data and the aggregations of the sections) is timed (best
+# of repeat, cache cleared before every call) with its peak traced memory
+# (tracemalloc, one extra call), per scale factor of the synthetic set
+# (utils/synthetic.py, same seed: same data on every machine) and per filter
+# scenario. Every scale runs in a fresh interpreter, without Streamlit running.
+# The results are written to a JSON report, compared with the baseline (a
+# report saved with --save-baseline, benchmarks/baseline.json is the one of the
+# reference machine), and the exit code is 1 when a stage got slower or bigger
+# than the tolerance, 2 when there's no baseline to compare with.
+# It doesn't need the dataset, run it from the project root:
+#   python benchmarks/suite.py [--scales 1 10] [--repeat 3] [--save-baseline]
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BASELINE_PATH = os.path.join(ROOT_DIR, 'benchmarks', 'baseline.json')
+REPORT_PATH = os.path.join(ROOT_DIR, 'benchmark_report.json')
+
+# Filter scenarios: the arguments of get_filtered_data after fact_df, from the
+# fact table (start_date, end_date, order_status, product_categories, cities,
+# states)
+SCENARIOS = {
+    'no filter': lambda fact_df: (None, None, [], [], [], []),
+    'narrow date range': lambda fact_df: (
+        fact_df['order_purchase_timestamp'].max().date() - timedelta(days=90),
+        fact_df['order_purchase_timestamp'].max().date(),
+        [], [], [], []
+    ),
+    'many cities': lambda fact_df: (
+        None, None, [], [],
+        fact_df['geolocation_city'].value_counts().index[:100].tolist(),
+        []
+    ),
+    'single category': lambda fact_df: (
+        None, None, [],
+        fact_df['product_category_name_english'].value_counts().index[:1].tolist(),
+        [], []
+    )
+}
+
+def measure(func, repeat: int) -> tuple:
+    # (best time, peak traced memory in MB, result) of func, the cache is
+    # cleared before every call so that every call computes
+    from utils.engine import cache
+    elapsed = []
+    for i in range(repeat):
+        cache.clear()
+        start = time.perf_counter()
+        result = func()
+        elapsed.append(time.perf_counter() - start)
+    cache.clear()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(elapsed), peak / 2 ** 20, result
+
+def run_worker(scale: float, repeat: int) -> list:
+    # The stages of the pipeline on the sources of the working directory
+    import resource
+    from utils.engine import EngineUtils
+    warnings.filterwarnings('ignore')
+    logging.disable(logging.WARNING)
+    c = Constants()
+    u = EngineUtils()
+    results = []
+
+    def add(stage: str, scenario: str, func, _repeat: int=repeat):
+        elapsed, peak, result = measure(func, _repeat)
+        results.append({
+            'scale': scale,
+            'scenario': scenario,
+            'stage': stage,
+            'rows': len(result) if hasattr(result, '__len__') else None,
+            'time': elapsed,
+            'peak_mb': peak
+        })
+        return result
+
+    ## The cold load parses the CSVs and writes the snapshot (once), the warm
+    ## load maps the snapshot
+    shutil.rmtree(c.snapshot_dir, ignore_errors=True)
+    add('get_clean_data (cold)', '', lambda: shutil.rmtree(c.snapshot_dir, ignore_errors=True) or u.get_clean_data(), 1)
+    data = add('get_clean_data (warm)', '', u.get_clean_data)
+    fact_df = add('get_fact_data', '', lambda: u.get_fact_data(data))
+    fact_index = add('get_fact_index', '', lambda: u.get_fact_index(fact_df))
+    add('get_fact_cube', '', lambda: u.get_fact_cube(fact_df))
+
+    for scenario, get_filters in SCENARIOS.items():
+        filters = get_filters(fact_df)
+        filtered_df = add('get_filtered_data', scenario, lambda: u.get_filtered_data(fact_df, *filters, _fact_index=fact_index))
+        funnel_df = add('get_order_funnel', scenario, lambda: u.get_order_funnel(filtered_df))
+        add('get_order_success_rate', scenario, lambda: u.get_order_success_rate(funnel_df))
+        add('get_metrics_by_month', scenario, lambda: u.get_metrics_by_month(filtered_df))
+        add('get_metrics_by_quarter', scenario, lambda: u.get_metrics_by_quarter(filtered_df))
+        add('calculate_flowing_count', scenario, lambda: u.calculate_flowing_count(filtered_df))
+        product_df = add('get_product_data', scenario, lambda: u.get_product_data(filtered_df))
+        add('get_top_product_by_revenue', scenario, lambda: u.get_top_product_by_revenue(product_df))
+        add('get_product_data_by_month', scenario, lambda: u.get_product_data_by_month(filtered_df))
+        add('get_review_by_month', scenario, lambda: u.get_review_by_month(filtered_df))
+        add('get_metrics_by_locations', scenario, lambda: u.get_metrics_by_locations(filtered_df))
+        add('get_rfm_analysis', scenario, lambda: u.get_rfm_analysis(filtered_df))
+        add('get_delivery_costs_by_distance', scenario, lambda: u.get_delivery_costs_by_distance(filtered_df))
+        add('get_delivery_costs_by_state_pair', scenario, lambda: u.get_delivery_costs_by_state_pair(filtered_df))
+        add('get_lead_time_summary (month)', scenario, lambda: u.get_lead_time_summary(filtered_df, 'month'))
+        add('get_lead_time_summary (category)', scenario, lambda: u.get_lead_time_summary(filtered_df, 'category'))
+
+    results.append({
+        'scale': scale,
+        'scenario': '',
+        'stage': 'process (peak RSS)',
+        'rows': None,
+        'time': None,
+        'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    })
+    return results
+
+def run_scale(scale: float, repeat: int, seed: int) -> list:
+    # Generate the synthetic set of the scale in a temporary directory, then
+    # run the stages on it in a fresh interpreter
+    from utils.synthetic import SyntheticDataUtils
+    c = Constants()
+    work_dir = tempfile.mkdtemp()
+    try:
+        SyntheticDataUtils().generate(os.path.join(work_dir, os.path.dirname(c.source['orders'])), scale, seed)
+        output = os.path.join(work_dir, 'results.json')
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', str(scale), '--repeat', str(repeat), '--output', output],
+            cwd=work_dir,
+            check=True
+        )
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(work_dir)
+
+IMPORT_SCRIPT = '''
+import resource, sys, time
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+exec(sys.argv[2])
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+'''
+
+def run_imports(repeat: int) -> list:
+    # Import time (best of repeat, fresh interpreters) and peak RSS of the
+    # top-level imports of the app and of the engine alone (scale 0)
+    with open(os.path.join(ROOT_DIR, 'streamlit_app.py')) as f:
+        tree = ast.parse(f.read())
+    app_imports = '\n'.join(ast.unparse(_node) for _node in tree.body if isinstance(_node, (ast.Import, ast.ImportFrom)))
+
+    results = []
+    for stage, code in [('import streamlit_app', app_imports), ('import utils.engine', 'import utils.engine')]:
+        runs = []
+        for i in range(repeat):
+            result = subprocess.run(
+                [sys.executable, '-c', IMPORT_SCRIPT, ROOT_DIR, code],
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=ROOT_DIR
+            )
+            runs.append([float(_value) for _value in result.stdout.split()])
+        results.append({
+            'scale': 0,
+            'scenario': '',
+            'stage': stage,
+            'rows': None,
+            'time': min(_run[0] for _run in runs),
+            'peak_mb': min(_run[1] for _run in runs)
+        })
+    return results
+
+def get_key(result: dict) -> tuple:
+    return (result['scale'], result['scenario'], result['stage'])
+
+def compare(results: list, baseline: dict, tolerance: float, min_time: float, min_memory: float) -> list:
+    # Add the baseline values and the ratios to the results, and flag the
+    # stages slower or bigger than the baseline by more than the tolerance
+    ## (and by more than min_time seconds or min_memory MB, the noise)
+    baseline_results = {get_key(_result): _result for _result in baseline.get('results', [])}
+    for _result in results:
+        base = baseline_results.get(get_key(_result))
+        _result['baseline_time'] = base['time'] if base else None
+        _result['baseline_peak_mb'] = base['peak_mb'] if base else None
+        _result['regressions'] = []
+        if base is None:
+            continue
+        if _result['time'] is not None and base['time'] is not None:
+            _result['time_ratio'] = _result['time'] / base['time'] if base['time'] else None
+            if _result['time'] > base['time'] * (1 + tolerance) and _result['time'] - base['time'] > min_time:
+                _result['regressions'].append('time')
+        _result['peak_ratio'] = _result['peak_mb'] / base['peak_mb'] if base['peak_mb'] else None
+        if _result['peak_mb'] > base['peak_mb'] * (1 + tolerance) and _result['peak_mb'] - base['peak_mb'] > min_memory:
+            _result['regressions'].append('memory')
+    return results
+
+def get_metadata() -> dict:
+    import numpy as np
+    import pandas as pd
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+def check_baseline(baseline: dict, metadata: dict, scales: list) -> list:
+    # Warnings about a baseline that the results can't be compared with: taken
+    # on another machine or software, or without some of the scales
+    warnings_ = [
+        f"the baseline was taken with {_name} {baseline['metadata'].get(_name)}, not {metadata[_name]}"
+        for _name in ['platform', 'cpus', 'python', 'pandas', 'numpy']
+        if baseline['metadata'].get(_name) != metadata[_name]
+    ]
+    missing_scales = [_scale for _scale in scales if _scale not in baseline.get('settings', {}).get('scales', [])]
+    if missing_scales:
+        warnings_.append(f"the baseline has no results at the scales {missing_scales}")
+    return warnings_
+
+def print_results(results: list):
+    print(f"{'scale':>6} {'scenario':<19}{'stage':<36}{'time (s)':>10}{'base (s)':>10}{'peak (MB)':>11}{'base (MB)':>11}  flags")
+    for _result in results:
+        values = [
+            f"{_result[_name]:>10.3f}" if _result.get(_name) is not None else f"{'':>10}"
+            for _name in ['time', 'baseline_time']
+        ] + [
+            f"{_result[_name]:>11.1f}" if _result.get(_name) is not None else f"{'':>11}"
+            for _name in ['peak_mb', 'baseline_peak_mb']
+        ]
+        flags = ', '.join(_result.get('regressions', [])).upper()
+        scale = f"{_result['scale']:>5g}x" if _result['scale'] else f"{'':>6}"
+        print(f"{scale} {_result['scenario']:<19}{_result['stage']:<36}{''.join(values)}  {flags}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark suite of the EngineUtils pipeline')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 10.0], help='scale factors of the synthetic set')
+    parser.add_argument('--repeat', type=int, default=3, help='timed calls per stage (the best one is kept)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic set')
+    parser.add_argument('--report', default=REPORT_PATH, help='path of the JSON report')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='path of the JSON baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='save the report as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='allowed relative increase of a time or a peak')
+    parser.add_argument('--min-time', type=float, default=0.02, help='ignored time increase (s)')
+    parser.add_argument('--min-memory', type=float, default=1.0, help='ignored peak increase (MB)')
+    parser.add_argument('--worker', type=float, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    ## In the fresh interpreter of a scale
+    if args.worker is not None:
+        with open(args.output, 'w') as f:
+            json.dump(run_worker(args.worker, args.repeat), f)
+        sys.exit(0)
+
+    results = run_imports(args.repeat)
+    for scale in args.scales:
+        results += run_scale(scale, args.repeat, args.seed)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    results = compare(results, baseline, args.tolerance, args.min_time, args.min_memory)
+    metadata = get_metadata()
+    report = {
+        'metadata': metadata,
+        'settings': {_name: getattr(args, _name) for _name in ['scales', 'repeat', 'seed', 'tolerance', 'min_time', 'min_memory']},
+        'baseline': baseline.get('metadata'),
+        'results': results,
+        'regressions': sum(bool(_result['regressions']) for _result in results)
+    }
+    print_results(results)
+
+    for path in [args.report] + ([args.baseline] if args.save_baseline else []):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"Report: {args.report}" + (f", saved as the baseline: {args.baseline}" if args.save_baseline else ''))
+    if args.save_baseline:
+        sys.exit(0)
+    ## Without a baseline nothing was compared: fail rather than pass silently
+    if not baseline:
+        print(
+            f"WARNING: no baseline at {args.baseline}, nothing was compared. Save one with --save-baseline "
+            f"(on the reference commit, on this machine) or pass --baseline",
+            file=sys.stderr
+        )
+        sys.exit(2)
+    for _warning in check_baseline(baseline, metadata, args.scales):
+        print(f"WARNING: {_warning}, the comparison is not reliable", file=sys.stderr)
+    print(f"{report['regressions']} regression(s) against the baseline of {baseline['metadata']['date']} ({baseline['metadata']['commit']})")
+    sys.exit(1 if report['regressions'] else 0)
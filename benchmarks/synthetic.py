@@ -0,0 +1,101 @@
+import hashlib
+import logging
+import shutil
+import subprocess
+import tempfile
+import time
+import warnings
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+from utils.synthetic import SyntheticDataUtils, ORDER_STATUS_SHARES
+
+# Synthetic data benchmark: time, throughput and size of the nine tables written
+# by SyntheticDataUtils per scale factor, the cold get_clean_data of the
+# generated set (in a fresh interpreter, up to 10x: the larger sets don't fit in
+# memory, see the streaming mode), the largest gap between the order
+# status shares and ORDER_STATUS_SHARES, and whether two runs with the same
+# seed write the same files.
+# It doesn't need the dataset, run it from the project root:
+#   python benchmarks/synthetic.py [scale factors, e.g. 1 10 100]
+
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+LOAD_SCRIPT = '''
+import logging, sys, time, warnings
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+sys.path.insert(0, sys.argv[1])
+from utils.st_utils import StDataUtils
+start = time.perf_counter()
+StDataUtils().get_clean_data()
+print(time.perf_counter() - start)
+'''
+
+def get_digest(output_dir: str) -> str:
+    digest = hashlib.md5()
+    for _name in sorted(os.listdir(output_dir)):
+        with open(os.path.join(output_dir, _name), 'rb') as f:
+            for block in iter(lambda: f.read(1 << 24), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def get_status_gap(path: str) -> float:
+    shares = pd.Series(0.0, index=list(ORDER_STATUS_SHARES.keys()))
+    for chunk in pd.read_csv(path, usecols=['order_status'], chunksize=1_000_000):
+        shares = shares.add(chunk['order_status'].value_counts(), fill_value=0)
+    shares = shares / shares.sum()
+    return max(abs(shares[_status] - _share) for _status, _share in ORDER_STATUS_SHARES.items())
+
+if __name__ == '__main__':
+    c = Constants()
+    scales = [float(_scale) for _scale in sys.argv[1:]] or [1.0, 10.0]
+    source_dir = os.path.dirname(c.source['orders'])
+
+    print(f"{'scale':>7}{'orders':>12}{'time (s)':>10}{'rows/s':>12}{'size (MB)':>11}{'load (s)':>10}{'status gap':>12}{'same':>6}")
+    for scale in scales:
+        work_dir = tempfile.mkdtemp()
+        try:
+            output_dir = os.path.join(work_dir, source_dir)
+            start = time.perf_counter()
+            counts = SyntheticDataUtils().generate(output_dir, scale)
+            elapsed = time.perf_counter() - start
+            size = sum(os.path.getsize(os.path.join(output_dir, _name)) for _name in os.listdir(output_dir)) / 2 ** 20
+            rows = sum(counts.values())
+
+            ## Same seed, same files (the second run is only checked at 1x)
+            same = ''
+            if scale <= 1:
+                copy_dir = os.path.join(work_dir, 'copy')
+                SyntheticDataUtils().generate(copy_dir, scale)
+                same = str(get_digest(copy_dir) == get_digest(output_dir))
+                shutil.rmtree(copy_dir)
+
+            load_time = float('nan')
+            if scale <= 10:
+                result = subprocess.run(
+                    [sys.executable, '-c', LOAD_SCRIPT, ROOT_DIR],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    cwd=work_dir
+                )
+                load_time = float(result.stdout.strip().splitlines()[-1])
+            status_gap = get_status_gap(os.path.join(work_dir, c.source['orders']))
+            print(f"{scale:>6g}x{counts['orders']:>12,}{elapsed:>10.1f}{rows / elapsed:>12,.0f}{size:>11,.0f}{load_time:>10.1f}{status_gap:>12.4f}{same:>6}")
+        finally:
+            shutil.rmtree(work_dir)
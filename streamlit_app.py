@@ -1,13 +1,9 @@
 # Import packages
+## The plotting libraries are imported by the sections that render their
+## charts, so a new worker doesn't pay for them before (see benchmarks/imports.py)
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from datetime import datetime, timedelta
 from utils.st_utils import StDataUtils
-import plotly.graph_objects as go
-import plotly.express as px
-import random
+from utils.sketch import SketchUtils
 
 # Setting the lay out
 st.set_page_config(layout='wide', initial_sidebar_state='expanded')
@@ -19,17 +15,15 @@ st.title("Dashboard Sales")
 u = StDataUtils()
 
 # Get clean_data
-data = u.get_clean_data()
+data = u.get_clean_data(compact=u.compact_keys)
+
+# Get the order-line fact table (built once, then only filtered)
+fact_df = u.get_fact_data(data)
+fact_index = u.get_fact_index(fact_df)
+fact_cube = u.get_fact_cube(fact_df, exact=not u.approximate_distinct)
 
 # Get default values
-default_ = {
-    'start_date': data['orders']['order_purchase_timestamp'].min(),
-    'end_date': data['orders']['order_purchase_timestamp'].max(),
-    'order_status': data['orders']['order_status'].unique(),
-    'product_categories': data['product_category_name_translations']['product_category_name_english'].unique(),
-    'cities': data['geolocations']['geolocation_city'].unique(),
-    'states': data['geolocations']['geolocation_state'].unique()
-}
+default_ = u.get_filter_options(data)
 
 # Add sidebar for filters
 with st.sidebar:
@@ -39,7 +33,7 @@ with st.sidebar:
     order_status = st.multiselect(
         'Order status',
         options=default_['order_status'],
-        default=['delivered']
+        default=u.default_order_status
     )
     product_categories = st.multiselect(
         'Product category',
@@ -54,381 +48,563 @@ with st.sidebar:
         options=default_['states']
     )
 
-# Get filtered_data
-filtered_df = u.get_filtered_data(data, start_date, end_date, order_status, product_categories, cities, states)
-
-# Get start_date & end_date proper
-start_date_proper = filtered_df['order_purchase_timestamp'].min().date()
-end_date_proper = filtered_df['order_purchase_timestamp'].max().date()
-
-# Get filtered data for counting success rate
-filtered_df_2 = u.get_filtered_data(data, start_date_proper, end_date_proper, [], product_categories, cities, states)
-
-# Get funnel_df and success rate
-funnel_df = u.get_order_funnel(filtered_df_2)
-latest_success_rate, mom_success_rate = u.get_order_success_rate(funnel_df)
-
-# Get order flow data
-flow_status, order_flow_df = u.calculate_flowing_count(filtered_df_2)
-
-# Get main and other metrics
-monthly_metrics_df = u.get_metrics_by_month(filtered_df)
-quarterly_metrics_df = u.get_metrics_by_quarter(filtered_df)
-main_metrics = u.get_main_metrics(monthly_metrics_df)
-
-product_df = u.get_product_data(filtered_df)
-top_product_revenue_df = u.get_top_product_by_revenue(product_df)
-top_product_revenue_no_mask_df = u.get_top_product_by_revenue(product_df, use_mask=True)
-
-
-monthly_product_df = u.get_product_data_by_month(filtered_df)
-monthly_top_product_df = u.get_monthly_top_product(monthly_product_df, end_date_proper.strftime('%Y-%m'))
-
-monthly_review_df = u.get_review_by_month(filtered_df)
-
-metrics_by_locations_df = u.get_metrics_by_locations(filtered_df)
-top_states_revenue_df = u.get_top_states_by_revenue(metrics_by_locations_df)
-
-rfm_df = u.get_rfm_analysis(filtered_df)
-
+# Declare the derived data of the filters, each section only computes the
+# data it needs (the intermediates shared by the sections are computed once)
+graph = u.get_data_graph(fact_df, fact_index, fact_cube, start_date, end_date, order_status, product_categories, cities, states)
 
 sections = [
     "Overview",
     "Product Portofolio",
-    "Demographic Analysis"
+    "Demographic Analysis",
+    "Delivery Performance"
 ]
-tabs = st.tabs(sections) 
-
-with tabs[0]:
-    # Add first rows as overview
-    st.header('Overview')
-
-    st.subheader(f'''Main Metrics of {end_date_proper.strftime("%b '%y")}''')
-    main_col_1, main_col_2, main_col_3, main_col_4 = st.columns(4)
-    with main_col_1:
-        with st.container(border=True):
-            st.metric(
-                label="Total Revenue*",
-                value=f"{main_metrics['revenue_w_o_freight'][0]:,.0f}",
-                delta=f"{main_metrics['revenue_w_o_freight_mom'][0]:0.1%}"
-            )
-        st.markdown("""<small>* Revenue w/o freight</small>""", unsafe_allow_html=True)
-    with main_col_2:
-        with st.container(border=True):
-            st.metric(
-                label="Order Count",
-                value=f"{main_metrics['order_count'][0]:,.0f}",
-                delta=f"{main_metrics['order_count_mom'][0]:0.1%}"
+if u.lazy_sections:
+    ## Only the selected section is computed & rendered on a rerun
+    section = st.radio('Section', sections, horizontal=True, label_visibility='collapsed')
+    containers = {section: st.container()}
+else:
+    containers = dict(zip(sections, st.tabs(sections)))
+
+if 'Overview' in containers:
+    with containers['Overview']:
+        import plotly.graph_objects as go
+        import plotly.express as px
+
+        # Get the data of the section
+        data_ = graph.compute(u.section_dependencies['Overview'])
+        start_date_proper, end_date_proper = data_['date_range_proper']
+        main_metrics = data_['main_metrics']
+        latest_success_rate, mom_success_rate = data_['success_rate']
+        quarterly_metrics_df = data_['quarterly_metrics_df']
+        monthly_metrics_df = data_['monthly_metrics_df']
+        top_states_revenue_df = data_['top_states_revenue_df']
+        top_product_revenue_df = data_['top_product_revenue_df']
+        flow_status, order_flow_df = data_['order_flow']
+
+        # Add first rows as overview
+        st.header('Overview')
+
+        st.subheader(f'''Main Metrics of {end_date_proper.strftime("%b '%y")}''')
+        main_col_1, main_col_2, main_col_3, main_col_4 = st.columns(4)
+        with main_col_1:
+            with st.container(border=True):
+                st.metric(
+                    label="Total Revenue*",
+                    value=f"{main_metrics['revenue_w_o_freight'][0]:,.0f}",
+                    delta=f"{main_metrics['revenue_w_o_freight_mom'][0]:0.1%}"
+                )
+            st.markdown("""<small>* Revenue w/o freight</small>""", unsafe_allow_html=True)
+        with main_col_2:
+            with st.container(border=True):
+                st.metric(
+                    label="Order Count",
+                    value=f"{main_metrics['order_count'][0]:,.0f}",
+                    delta=f"{main_metrics['order_count_mom'][0]:0.1%}"
+                )
+        with main_col_3:
+            with st.container(border=True):
+                st.metric(
+                    label="Active Customer",
+                    value=f"{main_metrics['customer_count'][0]:,.0f}",
+                    delta=f"{main_metrics['customer_count_mom'][0]:0.1%}"
+                )
+        with main_col_4:
+            with st.container(border=True):
+                st.metric(
+                    label="Order Success Rate",
+                    value=f"{latest_success_rate:0.0%}",
+                    delta=f"{mom_success_rate:0.1%}"
+                )
+
+        sub_col_1_1, sub_col_1_2 = st.columns([1,2])
+        with sub_col_1_1:
+            st.subheader('Main metrics per quarter')
+            st.dataframe(quarterly_metrics_df)
+
+        with sub_col_1_2:
+            st.subheader('Revenue and order count per month')
+            # Create a bar chart for Sales
+            bar = go.Bar(
+                x=monthly_metrics_df['month'],
+                y=monthly_metrics_df['revenue_w_o_freight'],
+                name='Revenue',
+                yaxis='y1'
             )
-    with main_col_3:
-        with st.container(border=True):
-            st.metric(
-                label="Active Customer",
-                value=f"{main_metrics['customer_count'][0]:,.0f}",
-                delta=f"{main_metrics['customer_count_mom'][0]:0.1%}"
+
+            # Create a line chart for Profit
+            line = go.Scatter(
+                x=monthly_metrics_df['month'],
+                y=monthly_metrics_df['order_count'],
+                mode='lines+markers',
+                name='Order count',
+                yaxis='y2'
             )
-    with main_col_4:
-        with st.container(border=True):
-            st.metric(
-                label="Order Success Rate",
-                value=f"{latest_success_rate:0.0%}",
-                delta=f"{mom_success_rate:0.1%}"
+
+            # Create layout with secondary y-axis
+            layout = go.Layout(
+                yaxis=dict(
+                    title='Revenue',
+                    side='left',
+                    range=[0, max(monthly_metrics_df['revenue_w_o_freight']) * 1.1]  # Adjust the range to start at zero
+                ),
+                yaxis2=dict(
+                    title='Order count',
+                    overlaying='y',
+                    side='right',
+                    range=[0, max(monthly_metrics_df['order_count']) * 1.1]
+                )
             )
 
-    sub_col_1_1, sub_col_1_2 = st.columns([1,2])
-    with sub_col_1_1:
-        st.subheader('Main metrics per quarter')
-        st.dataframe(quarterly_metrics_df)
-
-    with sub_col_1_2:
-        st.subheader('Revenue and order count per month')
-        # Create a bar chart for Sales
-        bar = go.Bar(
-            x=monthly_metrics_df['month'],
-            y=monthly_metrics_df['revenue_w_o_freight'],
-            name='Revenue',
-            yaxis='y1'
-        )
+            # Combine the bar and line charts
+            fig = go.Figure(data=[bar, line], layout=layout)
 
-        # Create a line chart for Profit
-        line = go.Scatter(
-            x=monthly_metrics_df['month'],
-            y=monthly_metrics_df['order_count'],
-            mode='lines+markers',
-            name='Order count',
-            yaxis='y2'
-        )
+            # Display the chart in Streamlit
+            st.plotly_chart(fig, use_container_width=True)
 
-        # Create layout with secondary y-axis
-        layout = go.Layout(
-            yaxis=dict(
-                title='Revenue',
-                side='left',
-                range=[0, max(monthly_metrics_df['revenue_w_o_freight']) * 1.1]  # Adjust the range to start at zero
-            ),
-            yaxis2=dict(
-                title='Order count',
-                overlaying='y',
-                side='right',
-                range=[0, max(monthly_metrics_df['order_count']) * 1.1]
+        sub_col_2_1, sub_col_2_2 = st.columns([1,2])
+        with sub_col_2_1:
+            st.subheader('States based on total revenue')
+            # Create the pie chart
+            fig = px.pie(top_states_revenue_df[['State', 'Revenue']], names='State', values='Revenue')
+
+            # Display the pie chart in Streamlit
+            st.plotly_chart(fig)
+
+        with sub_col_2_2:
+            st.subheader('Monthly active customers')
+            # Create a bar chart for Sales
+            bar = go.Bar(
+                x=monthly_metrics_df['month'],
+                y=monthly_metrics_df['customer_count'],
+                name='Revenue',
+                yaxis='y1'
             )
-        )
 
-        # Combine the bar and line charts
-        fig = go.Figure(data=[bar, line], layout=layout)
+            # Create layout with secondary y-axis
+            layout = go.Layout(
+                yaxis=dict(
+                    title='Customer count',
+                    side='left',
+                    range=[0, max(monthly_metrics_df['customer_count']) * 1.1]  # Adjust the range to start at zero
+                )
+            )
 
-        # Display the chart in Streamlit
-        st.plotly_chart(fig, use_container_width=True)
+            # Combine the bar and line charts
+            fig = go.Figure(data=bar, layout=layout)
 
-    sub_col_2_1, sub_col_2_2 = st.columns([1,2])
-    with sub_col_2_1:
-        st.subheader('States based on total revenue')
-        # Create the pie chart
-        fig = px.pie(top_states_revenue_df[['State', 'Revenue']], names='State', values='Revenue')
-
-        # Display the pie chart in Streamlit
-        st.plotly_chart(fig)
-
-    with sub_col_2_2:
-        st.subheader('Monthly active customers')
-        # Create a bar chart for Sales
-        bar = go.Bar(
-            x=monthly_metrics_df['month'],
-            y=monthly_metrics_df['customer_count'],
-            name='Revenue',
-            yaxis='y1'
-        )
+            # Display the chart in Streamlit
+            st.plotly_chart(fig, use_container_width=True)
 
-        # Create layout with secondary y-axis
-        layout = go.Layout(
-            yaxis=dict(
-                title='Customer count',
-                side='left',
-                range=[0, max(monthly_metrics_df['customer_count']) * 1.1]  # Adjust the range to start at zero
-            )
-        )
+        sub_col_3_1, sub_col_3_2 = st.columns([1,2])
+        with sub_col_3_1:
+            st.subheader('Product categories based on total revenue')
+            # Create the pie chart
+            fig = px.pie(top_product_revenue_df[['Category', 'Revenue']], names='Category', values='Revenue')
+
+            # Display the pie chart in Streamlit
+            st.plotly_chart(fig)
+
+        with sub_col_3_2:
+            st.subheader('Order flow based on status')
+            fig = go.Figure(data=[go.Sankey(
+                node = dict(
+                pad = 15,
+                thickness = 20,
+                line = dict(color = "black", width = 0.5),
+                label = flow_status,
+                ),
+                link = dict(
+                source = [flow_status.index(x) for x in order_flow_df['from']], # indices correspond to labels, eg A1, A2, A1, B1, ...
+                target = [flow_status.index(x) for x in order_flow_df['to']],
+                value = list(order_flow_df['count'])
+            ))])
 
-        # Combine the bar and line charts
-        fig = go.Figure(data=bar, layout=layout)
+            # Display the chart in Streamlit
+            st.plotly_chart(fig, use_container_width=True)
 
-        # Display the chart in Streamlit
-        st.plotly_chart(fig, use_container_width=True)
+if 'Product Portofolio' in containers:
+    with containers['Product Portofolio']:
+        import numpy as np
+        import plotly.graph_objects as go
+        import plotly.express as px
+
+        # Get the data of the section
+        data_ = graph.compute(u.section_dependencies['Product Portofolio'])
+        top_product_revenue_no_mask_df = data_['top_product_revenue_no_mask_df']
+        monthly_top_product_df = data_['monthly_top_product_df']
+        monthly_review_df = data_['monthly_review_df']
+        product_df = data_['product_df']
+
+        # Add first rows as overview
+        st.header('Product Portofolio')
+
+        pp_col_1_1, pp_col_1_2 = st.columns([3, 1])
+        with pp_col_1_1:
+
+            st.subheader('Best and Worst Performing Product Categories by Revenue')
+            pp_col_1_1_col1, pp_col_1_1_col2 = st.columns(2)
+            with pp_col_1_1_col1:
+                # Create the horizontal bar chart
+                fig = px.bar(
+                    top_product_revenue_no_mask_df.head(), 
+                    x='Revenue', 
+                    y='Category', 
+                    orientation='h',
+                    title='Best Performing Product',
+                    color='Category',
+                    color_discrete_sequence=["#72BCD4"] + ["#D3D3D3"]*4
+                )
+                fig.update_layout(yaxis={'categoryorder':'total ascending'}, showlegend=False)
+                # Display the chart in Streamlit
+                st.plotly_chart(fig, use_container_width=True)
+            with pp_col_1_1_col2:
+                # Create the horizontal bar chart
+                fig = px.bar(
+                    top_product_revenue_no_mask_df.tail(),
+                    x='Revenue', 
+                    y='Category', 
+                    orientation='h',
+                    title='Worst Performing Product',
+                    color='Category',
+                    color_discrete_sequence= ["#D3D3D3"]*4 + ["#72BCD4"]
+                )
+                fig.update_layout(yaxis={'categoryorder':'total descending', 'side': 'right'}, showlegend=False)
+                # Display the chart in Streamlit
+                st.plotly_chart(fig, use_container_width=True)
+    
+        with pp_col_1_2:
+
+            st.subheader("Best Categories' Revenue This Month")
+            with st.container(border=True):
+                st.metric(
+                    label=f"#1: {monthly_top_product_df['Category'].iloc[0]}",
+                    value=f"{monthly_top_product_df['Revenue'].iloc[0]:,.0f}"
+                )
+            with st.container(border=True):
+                st.metric(
+                    label=f"#2: {monthly_top_product_df['Category'].iloc[1]}",
+                    value=f"{monthly_top_product_df['Revenue'].iloc[1]:,.0f}"
+                )
+            with st.container(border=True):
+                st.metric(
+                    label=f"#3: {monthly_top_product_df['Category'].iloc[2]}",
+                    value=f"{monthly_top_product_df['Revenue'].iloc[2]:,.0f}"
+                )
+
+
+        pp_col_2_1, pp_col_2_2 = st.columns([3, 1])
+        with pp_col_2_1:
+            st.subheader('Average Review Score by Month')
+            # Create a line chart for Profit
+            line = go.Scatter(
+                x=monthly_review_df['month'],
+                y=monthly_review_df['review_score'],
+                mode='lines+markers',
+                name='Score review'
+            )
+            # Combine the bar and line charts
+            fig = go.Figure(data=line)
 
-    sub_col_3_1, sub_col_3_2 = st.columns([1,2])
-    with sub_col_3_1:
-        st.subheader('Product categories based on total revenue')
-        # Create the pie chart
-        fig = px.pie(top_product_revenue_df[['Category', 'Revenue']], names='Category', values='Revenue')
-
-        # Display the pie chart in Streamlit
-        st.plotly_chart(fig)
-
-    with sub_col_3_2:
-        st.subheader('Order flow based on status')
-        fig = go.Figure(data=[go.Sankey(
-            node = dict(
-            pad = 15,
-            thickness = 20,
-            line = dict(color = "black", width = 0.5),
-            label = flow_status,
-            ),
-            link = dict(
-            source = [flow_status.index(x) for x in order_flow_df['from']], # indices correspond to labels, eg A1, A2, A1, B1, ...
-            target = [flow_status.index(x) for x in order_flow_df['to']],
-            value = list(order_flow_df['count'])
-        ))])
+            # Display the chart in Streamlit
+            st.plotly_chart(fig, use_container_width=True)
+        
+            st.subheader(f"Average review score vs revenue (corr: {product_df['review_score'].corr(product_df['revenue_w_o_freight']):.2f})")
+            # Create a scatter plot with its least squares line (np.polyfit,
+            # trendline='ols' would import statsmodels)
+            fig = px.scatter(x=product_df['review_score'], y=product_df['revenue_w_o_freight'])
+            trend_df = product_df[['review_score', 'revenue_w_o_freight']].dropna()
+            if len(trend_df) > 1:
+                slope, intercept = np.polyfit(trend_df['review_score'], trend_df['revenue_w_o_freight'], 1)
+                trend_x = np.array([trend_df['review_score'].min(), trend_df['review_score'].max()])
+                fig.add_trace(go.Scatter(x=trend_x, y=slope * trend_x + intercept, mode='lines', name='OLS trendline', showlegend=False))
+            fig.update_layout(
+                xaxis_title='Review score',
+                yaxis_title='Revenue',
+            )
+            # Display the chart in Streamlit
+            st.plotly_chart(fig, use_container_width=True)
 
-        # Display the chart in Streamlit
-        st.plotly_chart(fig, use_container_width=True)
+        with pp_col_2_2:
+            st.subheader('Review Score This Month')
+            fig = go.Figure(go.Indicator(
+                domain = {'x': [0, 1], 'y': [0, 1]},
+                value = monthly_review_df['review_score'].iloc[-1],
+                mode = "gauge+number+delta",
+                title = {'text': "Score [1-5]"},
+                delta = {'reference': monthly_review_df['review_score'].iloc[-2], 'relative': True, 'valueformat': '.00%'},
+                gauge = {
+                    'axis': {'range': [None, 5]},    
+                    'steps' : [
+                        {'range': [0, 1], 'color': "indianred"},
+                        {'range': [1, 3.5], 'color': "khaki"},
+                        {'range': [3.5, 5], 'color': "lightgreen"}
+                    ],
+                    'threshold' : {'line': {'color': "black", 'width': 4}, 'thickness': 0.75, 'value': 4}
+                }
+            ))
+            # Display the chart in Streamlit
+            st.plotly_chart(fig, use_container_width=True)
 
-with tabs[1]:
-    # Add first rows as overview
-    st.header('Product Portofolio')
+if 'Demographic Analysis' in containers:
+    with containers['Demographic Analysis']:
+        import plotly.express as px
 
-    pp_col_1_1, pp_col_1_2 = st.columns([3, 1])
-    with pp_col_1_1:
+        # Get the data of the section
+        data_ = graph.compute(u.section_dependencies['Demographic Analysis'])
+        filtered_df = data_['filtered_df']
+        metrics_by_locations_df = data_['metrics_by_locations_df']
+        rfm_df = data_['rfm_df']
+        costs_by_distance_df = data_['costs_by_distance_df']
+        costs_by_state_pair_df = data_['costs_by_state_pair_df']
+
+        # Add first rows as overview
+        st.header('Demographic Analysis')
+    
+        st.subheader('Where are the customers?')
+        loc_c_1, loc_c_2, loc_c_3, loc_c_4 = st.columns([1,1,1,3])
+        with loc_c_1:
+            location_options = st.selectbox(label='Select by', options=['State', 'City'], index=0)
+        with loc_c_2:
+            metrics_options = st.selectbox(label='Based on', options=['Revenue', 'Order count', 'Customer count'], index=0)
+        with loc_c_3:
+            points_options = st.selectbox(label='Points', options=['Grid cells', 'Zip codes'], index=0)
+        location_dict = {'City': 'geolocation_city', 'State': 'geolocation_state'}
+        metrics_dict = {'Revenue': 'revenue_w_o_freight', 'Order count': 'order_count', 'Customer count': 'customer_count'}
+        # Bin the zips into grid cells (or keep the largest ones), with a fixed
+        # color per location
+        map_points_df = u.get_map_points(
+            metrics_by_locations_df,
+            location_dict[location_options],
+            metrics_dict[metrics_options],
+            binned=(points_options == 'Grid cells')
+        )
 
-        st.subheader('Best and Worst Performing Product Categories by Revenue')
-        pp_col_1_1_col1, pp_col_1_1_col2 = st.columns(2)
-        with pp_col_1_1_col1:
+        loc_c2_1, loc_c2_2 = st.columns(2)
+        with loc_c2_1:
+            st.markdown(f'#### Map grouped by {str(location_options).lower()} based on {str(metrics_options).lower()}')
+            st.map(
+                data=map_points_df,
+                latitude='geolocation_lat',
+                longitude='geolocation_lng',
+                color='color',
+                size='size'
+            )
+        with loc_c2_2:
+            st.markdown(f'#### Top {location_options} by {metrics_options}')
+            agg_dict = {'Revenue': {'price': 'sum'}, 'Order count': {"order_id": "nunique"}, 'Customer count': {"customer_unique_id": "nunique"}}
+            metrics_grouped = (
+                SketchUtils()
+                .agg(filtered_df, location_dict[location_options], agg_dict[metrics_options], approximate=u.approximate_distinct)
+                .reset_index()
+                .rename(columns={
+                    'customer_unique_id': 'Customer count',
+                    'order_id': 'Order count',
+                    'price': 'Revenue',
+                    'geolocation_city': 'City',
+                    'geolocation_state': 'State'
+                })
+                .sort_values(by=metrics_options, ascending=False)
+                .reset_index(drop=True)
+            )
             # Create the horizontal bar chart
             fig = px.bar(
-                top_product_revenue_no_mask_df.head(), 
-                x='Revenue', 
-                y='Category', 
+                metrics_grouped.head(), 
+                x=metrics_options, 
+                y=location_options, 
                 orientation='h',
-                title='Best Performing Product',
-                color='Category',
+                color=location_options,
                 color_discrete_sequence=["#72BCD4"] + ["#D3D3D3"]*4
             )
             fig.update_layout(yaxis={'categoryorder':'total ascending'}, showlegend=False)
             # Display the chart in Streamlit
             st.plotly_chart(fig, use_container_width=True)
-        with pp_col_1_1_col2:
-            # Create the horizontal bar chart
+
+        st.subheader('Recency, Frquency, and Monetary (RFM) Analysis')
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        # Visualize the data
+        fig, ax = plt.subplots(nrows=1, ncols=3, figsize=(30, 6))
+    
+        colors = ["#72BCD4", "#72BCD4", "#72BCD4", "#72BCD4", "#72BCD4"]
+    
+        sns.barplot(y="recency", x="index", data=u.get_top_customers(rfm_df, "recency", 5, ascending=True), palette=colors, ax=ax[0])
+        ax[0].set_ylabel(None)
+        ax[0].set_xlabel(None)
+        ax[0].set_title("By Recency (days)", loc="center", fontsize=18)
+        ax[0].tick_params(axis ='x', labelsize=15)
+    
+        sns.barplot(y="frequency", x="index", data=u.get_top_customers(rfm_df, "frequency", 5), palette=colors, ax=ax[1])
+        ax[1].set_ylabel(None)
+        ax[1].set_xlabel(None)
+        ax[1].set_title("By Frequency", loc="center", fontsize=18)
+        ax[1].tick_params(axis='x', labelsize=15)
+    
+        sns.barplot(y="monetary", x="index", data=u.get_top_customers(rfm_df, "monetary", 5), palette=colors, ax=ax[2])
+        ax[2].set_ylabel(None)
+        ax[2].set_xlabel(None)
+        ax[2].set_title("By Monetary", loc="center", fontsize=18)
+        ax[2].tick_params(axis='x', labelsize=15)
+    
+        plt.suptitle("Best Customer Based on RFM Parameters (customer_id)", fontsize=20)
+        st.pyplot(fig=fig, use_container_width=True)
+
+        st.subheader('Customer Segments (RFM scores)')
+        segment_df = (
+            rfm_df
+            .groupby('segment', observed=False)
+            .agg(customers=('customer_id', 'count'), monetary=('monetary', 'sum'))
+            .reset_index()
+        )
+        # Create the horizontal bar chart
+        fig = px.bar(
+            segment_df,
+            x='customers',
+            y='segment',
+            orientation='h',
+            hover_data=['monetary'],
+            color_discrete_sequence=["#72BCD4"]
+        )
+        fig.update_layout(yaxis={'categoryorder':'total ascending', 'title': None}, xaxis={'title': 'Customer count'})
+        # Display the chart in Streamlit
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.subheader('How far are the sellers from the customers?')
+        dist_c_1, dist_c_2 = st.columns(2)
+        with dist_c_1:
+            st.markdown('#### Freight per km by distance')
+            # Create the bar chart of the freight per km, with the order lines
             fig = px.bar(
-                top_product_revenue_no_mask_df.tail(),
-                x='Revenue', 
-                y='Category', 
-                orientation='h',
-                title='Worst Performing Product',
-                color='Category',
-                color_discrete_sequence= ["#D3D3D3"]*4 + ["#72BCD4"]
+                costs_by_distance_df,
+                x='distance_band',
+                y='freight_per_km',
+                hover_data=['order_items', 'mean_freight_value', 'median_distance_km'],
+                color_discrete_sequence=["#72BCD4"]
             )
-            fig.update_layout(yaxis={'categoryorder':'total descending', 'side': 'right'}, showlegend=False)
+            fig.update_layout(xaxis={'title': 'Distance'}, yaxis={'title': 'Freight per km'})
             # Display the chart in Streamlit
             st.plotly_chart(fig, use_container_width=True)
-    
-    with pp_col_1_2:
-
-        st.subheader("Best Categories' Revenue This Month")
-        with st.container(border=True):
-            st.metric(
-                label=f"#1: {monthly_top_product_df['Category'].iloc[0]}",
-                value=f"{monthly_top_product_df['Revenue'].iloc[0]:,.0f}"
-            )
-        with st.container(border=True):
-            st.metric(
-                label=f"#2: {monthly_top_product_df['Category'].iloc[1]}",
-                value=f"{monthly_top_product_df['Revenue'].iloc[1]:,.0f}"
-            )
-        with st.container(border=True):
-            st.metric(
-                label=f"#3: {monthly_top_product_df['Category'].iloc[2]}",
-                value=f"{monthly_top_product_df['Revenue'].iloc[2]:,.0f}"
+        with dist_c_2:
+            st.markdown('#### Delivery time by distance')
+            # Create the bar chart of the median delivery time
+            fig = px.bar(
+                costs_by_distance_df,
+                x='distance_band',
+                y='median_delivery_days',
+                hover_data=['order_items', 'mean_delivery_days'],
+                color_discrete_sequence=["#72BCD4"]
             )
+            fig.update_layout(xaxis={'title': 'Distance'}, yaxis={'title': 'Median delivery time (days)'})
+            # Display the chart in Streamlit
+            st.plotly_chart(fig, use_container_width=True)
 
-
-    pp_col_2_1, pp_col_2_2 = st.columns([3, 1])
-    with pp_col_2_1:
-        st.subheader('Average Review Score by Month')
-        # Create a line chart for Profit
-        line = go.Scatter(
-            x=monthly_review_df['month'],
-            y=monthly_review_df['review_score'],
-            mode='lines+markers',
-            name='Score review'
+        st.markdown('#### Top 10 routes (seller state to customer state)')
+        st.dataframe(
+            costs_by_state_pair_df
+            .head(10)
+            [['seller_state', 'customer_state', 'order_items', 'median_distance_km', 'mean_freight_value', 'freight_per_km', 'median_delivery_days']]
+            .rename(columns={
+                'seller_state': 'Seller state',
+                'customer_state': 'Customer state',
+                'order_items': 'Order lines',
+                'median_distance_km': 'Median distance (km)',
+                'mean_freight_value': 'Mean freight',
+                'freight_per_km': 'Freight per km',
+                'median_delivery_days': 'Median delivery time (days)'
+            }),
+            hide_index=True,
+            use_container_width=True
         )
-        # Combine the bar and line charts
-        fig = go.Figure(data=line)
 
-        # Display the chart in Streamlit
-        st.plotly_chart(fig, use_container_width=True)
-        
-        st.subheader(f"Average review score vs revenue (corr: {product_df['review_score'].corr(product_df['revenue_w_o_freight']):.2f})")
-        # Create a scatter plot
-        fig = px.scatter(x=product_df['review_score'], y=product_df['revenue_w_o_freight'], trendline='ols')
-        fig.update_layout(
-            xaxis_title='Review score',
-            yaxis_title='Revenue',
+if 'Delivery Performance' in containers:
+    with containers['Delivery Performance']:
+        import plotly.express as px
+
+        # Get the data of the section
+        data_ = graph.compute(u.section_dependencies['Delivery Performance'])
+        lead_time_summary_df = data_['lead_time_summary_df']
+        lead_times_by_month_df = data_['lead_times_by_month_df']
+        lead_times_by_state_df = data_['lead_times_by_state_df']
+        lead_times_by_category_df = data_['lead_times_by_category_df']
+
+        # Add first rows as overview
+        st.header('Delivery Performance')
+
+        st.subheader('Lead times of the filtered orders')
+        lead_col_1, lead_col_2, lead_col_3, lead_col_4 = st.columns(4)
+        with lead_col_1:
+            with st.container(border=True):
+                st.metric(label="Median delivery time (days)", value=f"{lead_time_summary_df['delivery_p50'][0]:0.1f}")
+        with lead_col_2:
+            with st.container(border=True):
+                st.metric(label="P90 delivery time (days)", value=f"{lead_time_summary_df['delivery_p90'][0]:0.1f}")
+        with lead_col_3:
+            with st.container(border=True):
+                st.metric(label="Late deliveries", value=f"{lead_time_summary_df['late_rate'][0]:0.1%}")
+        with lead_col_4:
+            with st.container(border=True):
+                st.metric(label="Median approval time (hours)", value=f"{lead_time_summary_df['approval_p50'][0] * 24:0.1f}")
+
+        stage_c_1, stage_c_2 = st.columns([1,5])
+        with stage_c_1:
+            stage_options = st.selectbox(label='Stage', options=['Delivery', 'Approval', 'Handling', 'Transit', 'Delay'], index=0)
+        stage = stage_options.lower()
+        percentile_columns = {f'{stage}_p{_percentile}': f'P{_percentile}' for _percentile in u.lead_time_percentiles}
+
+        st.subheader(f'{stage_options} time per month (days)')
+        # Create the line chart of the percentiles
+        fig = px.line(
+            lead_times_by_month_df.rename(columns=percentile_columns),
+            x='month',
+            y=list(percentile_columns.values()),
+            markers=True
         )
+        fig.update_layout(xaxis={'title': None}, yaxis={'title': 'Days'}, legend={'title': None})
         # Display the chart in Streamlit
         st.plotly_chart(fig, use_container_width=True)
 
-    with pp_col_2_2:
-        st.subheader('Review Score This Month')
-        fig = go.Figure(go.Indicator(
-            domain = {'x': [0, 1], 'y': [0, 1]},
-            value = monthly_review_df['review_score'].iloc[-1],
-            mode = "gauge+number+delta",
-            title = {'text': "Score [1-5]"},
-            delta = {'reference': monthly_review_df['review_score'].iloc[-2], 'relative': True, 'valueformat': '.00%'},
-            gauge = {
-                'axis': {'range': [None, 5]},    
-                'steps' : [
-                    {'range': [0, 1], 'color': "indianred"},
-                    {'range': [1, 3.5], 'color': "khaki"},
-                    {'range': [3.5, 5], 'color': "lightgreen"}
-                ],
-                'threshold' : {'line': {'color': "black", 'width': 4}, 'thickness': 0.75, 'value': 4}
-            }
-        ))
-        # Display the chart in Streamlit
-        st.plotly_chart(fig, use_container_width=True)
+        sla_c_1, sla_c_2 = st.columns(2)
+        with sla_c_1:
+            st.markdown(f'#### {stage_options} time by state (P90, days)')
+            # Create the horizontal bar chart, the slowest states first
+            fig = px.bar(
+                lead_times_by_state_df.sort_values(by=f'{stage}_p90', ascending=False).head(10),
+                x=f'{stage}_p90',
+                y='state',
+                orientation='h',
+                hover_data=['orders', 'late_rate'],
+                color_discrete_sequence=["#72BCD4"]
+            )
+            fig.update_layout(yaxis={'categoryorder':'total ascending', 'title': None}, xaxis={'title': 'Days'})
+            # Display the chart in Streamlit
+            st.plotly_chart(fig, use_container_width=True)
+        with sla_c_2:
+            st.markdown('#### Late deliveries by state')
+            # Create the horizontal bar chart, the latest states first
+            fig = px.bar(
+                lead_times_by_state_df.sort_values(by='late_rate', ascending=False).head(10),
+                x='late_rate',
+                y='state',
+                orientation='h',
+                hover_data=['delivered_orders', 'late_orders'],
+                color_discrete_sequence=["#72BCD4"]
+            )
+            fig.update_layout(yaxis={'categoryorder':'total ascending', 'title': None}, xaxis={'title': 'Late rate', 'tickformat': '.0%'})
+            # Display the chart in Streamlit
+            st.plotly_chart(fig, use_container_width=True)
 
-with tabs[2]:
-    # Add first rows as overview
-    st.header('Demographic Analysis')
-    
-    st.subheader('Where are the customers?')
-    loc_c_1, loc_c_2, loc_c_3 = st.columns([1,1,4])
-    with loc_c_1:
-        location_options = st.selectbox(label='Select by', options=['State', 'City'], index=0)
-    with loc_c_2:
-        metrics_options = st.selectbox(label='Based on', options=['Revenue', 'Order count', 'Customer count'], index=0)
-    location_dict = {'City': 'geolocation_city', 'State': 'geolocation_state'}
-    metrics_dict = {'Revenue': 'revenue_w_o_freight', 'Order count': 'order_count', 'Customer count': 'customer_count'}
-    # Generate random colors for each category
-    unique_categories = metrics_by_locations_df[location_dict[location_options]].unique()
-    color_map = {category: random.choice(u.css_colors) for category in unique_categories}
-
-    # Add color column to the dataframe
-    metrics_by_locations_df['color'] = metrics_by_locations_df[location_dict[location_options]].map(color_map)
-
-    loc_c2_1, loc_c2_2 = st.columns(2)
-    with loc_c2_1:
-        st.markdown(f'#### Map grouped by {str(location_options).lower()} based on {str(metrics_options).lower()}')
-        st.map(
-            data=metrics_by_locations_df,
-            latitude='geolocation_lat',
-            longitude='geolocation_lng',
-            color='color',
-            size=metrics_dict[metrics_options]
-        )
-    with loc_c2_2:
-        st.markdown(f'#### Top {location_options} by {metrics_options}')
-        agg_dict = {'Revenue': {'price': 'sum'}, 'Order count': {"order_id": "nunique"}, 'Customer count': {"customer_unique_id": "nunique"}}
-        metrics_grouped = (
-            filtered_df
-            .groupby(location_dict[location_options])
-            .agg(agg_dict[metrics_options])
-            .reset_index()
+        st.markdown(f'#### {stage_options} time of the top 10 categories by order count (days)')
+        st.dataframe(
+            lead_times_by_category_df
+            .sort_values(by='orders', ascending=False)
+            .head(10)
+            [['category', 'orders'] + list(percentile_columns) + ['late_rate']]
             .rename(columns={
-                'customer_unique_id': 'Customer count',
-                'order_id': 'Order count',
-                'price': 'Revenue',
-                'geolocation_city': 'City',
-                'geolocation_state': 'State'
-            })
-            .sort_values(by=metrics_options, ascending=False)
-            .reset_index(drop=True)
+                'category': 'Category',
+                'orders': 'Order count',
+                'late_rate': 'Late rate',
+                **percentile_columns
+            }),
+            hide_index=True,
+            use_container_width=True
         )
-        # Create the horizontal bar chart
-        fig = px.bar(
-            metrics_grouped.head(), 
-            x=metrics_options, 
-            y=location_options, 
-            orientation='h',
-            color=location_options,
-            color_discrete_sequence=["#72BCD4"] + ["#D3D3D3"]*4
-        )
-        fig.update_layout(yaxis={'categoryorder':'total ascending'}, showlegend=False)
-        # Display the chart in Streamlit
-        st.plotly_chart(fig, use_container_width=True)
-
-    st.subheader('Recency, Frquency, and Monetary (RFM) Analysis')
-    # Visualize the data
-    fig, ax = plt.subplots(nrows=1, ncols=3, figsize=(30, 6))
-    
-    colors = ["#72BCD4", "#72BCD4", "#72BCD4", "#72BCD4", "#72BCD4"]
-    
-    sns.barplot(y="recency", x="index", data=rfm_df.sort_values(by="recency", ascending=True).head(5), palette=colors, ax=ax[0])
-    ax[0].set_ylabel(None)
-    ax[0].set_xlabel(None)
-    ax[0].set_title("By Recency (days)", loc="center", fontsize=18)
-    ax[0].tick_params(axis ='x', labelsize=15)
-    
-    sns.barplot(y="frequency", x="index", data=rfm_df.sort_values(by="frequency", ascending=False).head(5), palette=colors, ax=ax[1])
-    ax[1].set_ylabel(None)
-    ax[1].set_xlabel(None)
-    ax[1].set_title("By Frequency", loc="center", fontsize=18)
-    ax[1].tick_params(axis='x', labelsize=15)
-    
-    sns.barplot(y="monetary", x="index", data=rfm_df.sort_values(by="monetary", ascending=False).head(5), palette=colors, ax=ax[2])
-    ax[2].set_ylabel(None)
-    ax[2].set_xlabel(None)
-    ax[2].set_title("By Monetary", loc="center", fontsize=18)
-    ax[2].tick_params(axis='x', labelsize=15)
-    
-    plt.suptitle("Best Customer Based on RFM Parameters (customer_id)", fontsize=20)
-    st.pyplot(fig=fig, use_container_width=True)
\ No newline at end of file
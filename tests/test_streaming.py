@@ -0,0 +1,105 @@
+import os
+import shutil
+import tracemalloc
+import pandas as pd
+import pytest
+
+import sys
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+from utils.synthetic import SyntheticDataUtils
+from utils.streaming import StreamingUtils
+from utils.st_utils import StDataUtils, cache
+
+# The streamed aggregates of a synthetic set (30% of the size of Olist) are
+# compared with the ones computed in memory, for a few sidebar filters, and the
+# peak memory of the streaming must be set by its chunk size, not by the data
+
+SCALE = 0.3
+CHUNK_ROWS = 2_000
+LARGE_CHUNK_ROWS = 16 * CHUNK_ROWS
+FILTERS = {
+    'no filter': (None, None, [], [], [], []),
+    'date range, status & states': (
+        pd.Timestamp('2017-03-05').date(), pd.Timestamp('2018-02-20').date(),
+        ['delivered', 'shipped'], [], [], ['SP', 'rj']
+    )
+}
+
+@pytest.fixture(scope='module')
+def data_dir(tmp_path_factory):
+    # Synthetic sources in a working directory of their own (the sources, the
+    # snapshots & the partitions are relative paths)
+    c = Constants()
+    work_dir = tmp_path_factory.mktemp('streaming')
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        SyntheticDataUtils().generate(os.path.dirname(c.source['orders']), SCALE)
+        ## One geolocation per zip code prefix: the peak memory is then the one
+        ## of the orders, not of the (fixed size) geolocations
+        geolocations_df = pd.read_csv(c.source['geolocations'], dtype=str)
+        geolocations_df.drop_duplicates(subset='geolocation_zip_code_prefix').to_csv(c.source['geolocations'], index=False)
+        cache.clear()
+        yield work_dir
+    finally:
+        os.chdir(cwd)
+
+def get_in_memory_results(filters: tuple) -> dict:
+    u = StDataUtils()
+    filtered_df = u.get_filtered_data(u.get_fact_data(u.get_clean_data()), *filters)
+    return {
+        'monthly_metrics_df': u.get_metrics_by_month(filtered_df),
+        'quarterly_metrics_df': u.get_metrics_by_quarter(filtered_df),
+        'metrics_by_locations_df': u.get_metrics_by_locations(filtered_df),
+        'rfm_df': u.get_rfm_analysis(filtered_df)
+    }
+
+def get_peak_memory(func) -> tuple:
+    # (result, peak of the memory allocated by func in MB)
+    tracemalloc.start()
+    try:
+        result = func()
+        return result, tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.parametrize('name', FILTERS)
+def test_streaming_matches_in_memory(data_dir, name):
+    s = StreamingUtils()
+    s.streaming_chunk_rows = CHUNK_ROWS
+    result = s.aggregate(*FILTERS[name])
+    expected = get_in_memory_results(FILTERS[name])
+    for _name, expected_df in expected.items():
+        ## The float sums may differ by their rounding (other summation order)
+        pd.testing.assert_frame_equal(
+            result[_name].reset_index(drop=True),
+            expected_df.reset_index(drop=True),
+            check_exact=False,
+            rtol=1e-9
+        )
+
+def get_streaming_peak(chunk_rows: int) -> float:
+    s = StreamingUtils()
+    s.streaming_chunk_rows = chunk_rows
+    ## The partitions are built again, from the sources
+    shutil.rmtree(s.streaming_dir, ignore_errors=True)
+    return get_peak_memory(lambda: s.aggregate(*FILTERS['no filter']))[1]
+
+def test_streaming_peak_memory(data_dir):
+    cache.clear()
+    _, in_memory_peak = get_peak_memory(lambda: get_in_memory_results(FILTERS['no filter']))
+    peak = get_streaming_peak(CHUNK_ROWS)
+    large_chunk_peak = get_streaming_peak(LARGE_CHUNK_ROWS)
+    ## The peak is the one of the chunks (on top of the aggregates): larger
+    ## chunks take more memory, and the small ones a fraction of the dataset
+    assert peak < large_chunk_peak < in_memory_peak
+    assert peak < in_memory_peak / 4
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+class BitmapIndexUtils(Constants):
+
+    def build_column_index(self, values: pd.Series) -> dict:
+        # Inverted index of one column: for each distinct value, the rows that
+        # hold it, as a compressed bitmap (like a roaring container)
+        ## - sparse values: the sorted row positions (int32)
+        ## - dense values: a packed bitmap (1 bit per row)
+        n_rows = len(values)
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        order = np.argsort(codes, kind='stable').astype('int32')
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        starts = np.searchsorted(codes[order], np.arange(len(uniques)), side='left')
+
+        bitmaps = {}
+        for _code, _value in enumerate(uniques):
+            positions = order[starts[_code]:starts[_code] + counts[_code]]
+            if counts[_code] * 32 < n_rows:
+                bitmaps[_value] = ('positions', positions)
+            else:
+                mask = np.zeros(n_rows, dtype=bool)
+                mask[positions] = True
+                bitmaps[_value] = ('bitmap', np.packbits(mask))
+
+        ## The lowercase lookup serves the case-insensitive filters
+        lowercase = {}
+        for _value in uniques:
+            lowercase.setdefault(str(_value).lower(), []).append(_value)
+
+        return {'n_rows': n_rows, 'bitmaps': bitmaps, 'lowercase': lowercase}
+
+    def build_index(self, df: pd.DataFrame) -> dict:
+        # Build the inverted index of every multiselect filter column
+        return {
+            _col: self.build_column_index(df[_col])
+            for _col in self.bitmap_index_columns
+            if _col in df.columns
+        }
+
+    def get_mask(self, column_index: dict, selection: list, ignore_case: bool=False) -> np.ndarray:
+        # OR the bitmaps of the selected values into a row mask, the cost is
+        # the number of selected rows (sparse) or n_rows / 8 bytes (dense)
+        if selection is None or len(selection) == 0:
+            return None
+        if ignore_case:
+            selection = [
+                _value for x in selection
+                for _value in column_index['lowercase'].get(str(x).lower(), [])
+            ]
+
+        n_rows = column_index['n_rows']
+        mask = np.zeros(n_rows, dtype=bool)
+        for _value in set(selection):
+            if _value not in column_index['bitmaps']:
+                continue
+            kind, bitmap = column_index['bitmaps'][_value]
+            if kind == 'positions':
+                mask[bitmap] = True
+            else:
+                mask |= np.unpackbits(bitmap, count=n_rows).view(bool)
+        return mask
@@ -0,0 +1,295 @@
+import hashlib
+import inspect
+import pickle
+import shutil
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from functools import wraps
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+class DiskCacheUtils(Constants):
+
+    # Shared cache backend: every result is a pickle in cache_dir/<function>/,
+    # so that it's shared by the processes (the dashboard workers, the batch
+    # jobs) and kept across restarts. Any object with the same get, set &
+    # clear methods can be a backend (see CacheUtils.set_backend)
+
+    def __init__(self, cache_dir: str=None) -> None:
+        super().__init__()
+        self.cache_dir = cache_dir or self.cache_dir
+
+    def get_path(self, name: str, key: str) -> str:
+        return os.path.join(self.cache_dir, name, f'{key}.pkl')
+
+    def get(self, name: str, key: str) -> tuple:
+        # (found, value) of a key, a missing or unreadable file is a miss
+        path = self.get_path(name, key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return False, None
+        ## The modification time orders the entries for the LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True, value
+
+    def set(self, name: str, key: str, value) -> int:
+        # Write the value (atomically, another process may read it), then drop
+        # the least recently used entries of the function beyond
+        # shared_cache_max_entries, returns the number of dropped entries
+        path = self.get_path(name, key)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            ## e.g. a value that can't be pickled, it's only cached in memory
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return 0
+
+        evictions = 0
+        try:
+            entries = sorted(
+                (_entry for _entry in os.scandir(os.path.dirname(path)) if _entry.name.endswith('.pkl')),
+                key=lambda _entry: _entry.stat().st_mtime
+            )
+            for _entry in entries[:max(0, len(entries) - self.shared_cache_max_entries)]:
+                os.remove(_entry.path)
+                evictions += 1
+        except OSError:
+            ## Removed by another process in the meantime
+            pass
+        return evictions
+
+    def clear(self) -> None:
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+class CacheUtils(Constants):
+
+    def __init__(self) -> None:
+        super().__init__()
+        # LRU entries of every cached function: {function: {key: value}}
+        self.entries = {}
+        # Fingerprints carried by the datasets: {id: (weakref, fingerprint)}
+        self.fingerprints = {}
+        self.stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0, 'key_time': 0.0}
+        self.lock = threading.RLock()
+        # Shared backend behind the LRU of the process (None: no backend)
+        self.backend = DiskCacheUtils() if self.cache_backend == 'disk' else None
+
+    def set_backend(self, backend) -> None:
+        # Plug a shared backend (e.g. DiskCacheUtils) behind the LRU: on a miss
+        # of the LRU the result is read from it before being computed, and
+        # every computed result is written to it
+        with self.lock:
+            self.backend = backend
+
+    def is_copy_on_write(self) -> bool:
+        # pandas 3 (or pandas 2 with the option on) copies the data of a
+        # shallow copy before it's modified, so the cached values are safe
+        return int(pd.__version__.split('.')[0]) >= 3 or pd.options.mode.copy_on_write is True
+
+    def get_arrays(self, value) -> list:
+        # numpy arrays holding the data of a DataFrame or Series (those of its
+        # blocks, and those behind its extension arrays), or of an array
+        ## The blocks are internals of pandas 2, only read without copy-on-write
+        ## (see freeze_value)
+        if isinstance(value, np.ndarray):
+            return [value]
+        arrays = []
+        for _block in value._mgr.blocks:
+            for _array in [_block.values] + [getattr(_block.values, _name, None) for _name in ('_ndarray', '_data', '_mask')]:
+                if isinstance(_array, np.ndarray):
+                    arrays.append(_array)
+        return arrays
+
+    def set_fingerprint(self, value, fingerprint: str) -> None:
+        # Attach a fingerprint to a dataset (DataFrame, Series, Index or array) and to
+        # the datasets inside a dict/list/tuple, it's dropped with the object,
+        # or as soon as one of its columns is added, replaced or removed
+        if isinstance(value, dict):
+            for _key, _value in value.items():
+                self.set_fingerprint(_value, f'{fingerprint}/{_key}')
+        elif isinstance(value, (list, tuple)):
+            for i, _value in enumerate(value):
+                self.set_fingerprint(_value, f'{fingerprint}/{i}')
+        elif isinstance(value, (pd.DataFrame, pd.Series, pd.Index, np.ndarray)):
+            object_id = id(value)
+            with self.lock:
+                self.fingerprints[object_id] = (
+                    weakref.ref(value, lambda ref: self.fingerprints.pop(object_id, None)),
+                    fingerprint,
+                    self.get_structure(value)
+                )
+
+    def get_structure(self, value) -> tuple:
+        # Labels & data of the columns of a DataFrame or Series (the address
+        # of a numpy column, the extension array of another one): a column
+        # added, renamed, replaced or copied on write changes it (a cached
+        # value can't be modified in place, see freeze_value)
+        if not isinstance(value, (pd.DataFrame, pd.Series)):
+            return None
+        columns = [value] if isinstance(value, pd.Series) else [value.iloc[:, i] for i in range(value.shape[1])]
+        return (
+            tuple(value.columns) if isinstance(value, pd.DataFrame) else value.name,
+            tuple(
+                _column.to_numpy(copy=False).__array_interface__['data'][0]
+                if isinstance(_column.dtype, np.dtype) else id(_column.array)
+                for _column in columns
+            )
+        )
+
+    def get_fingerprint(self, value) -> str:
+        # Fingerprint of an argument: the one carried by a dataset returned by
+        # the cache, else a hash of its content (computed once per object)
+        if isinstance(value, (pd.DataFrame, pd.Series, pd.Index, np.ndarray)):
+            ref, fingerprint, structure = self.fingerprints.get(id(value), (None, None, None))
+            if ref is not None and ref() is value and structure == self.get_structure(value):
+                return fingerprint
+            if isinstance(value, np.ndarray):
+                content = value.tobytes() if value.dtype.kind != 'O' else pd.util.hash_array(value.ravel()).tobytes()
+                fingerprint = hashlib.sha1(content + repr((value.dtype, value.shape)).encode()).hexdigest()
+            else:
+                ## The whole content is hashed (no sampling of the rows)
+                content = pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes()
+                structure = repr((value.shape, list(value.columns), list(value.dtypes)) if isinstance(value, pd.DataFrame) else (value.name, value.dtype))
+                fingerprint = hashlib.sha1(content + structure.encode()).hexdigest()
+            self.set_fingerprint(value, fingerprint)
+            return fingerprint
+        if isinstance(value, dict):
+            return repr([(_key, self.get_fingerprint(_value)) for _key, _value in value.items()])
+        if isinstance(value, (list, tuple, set)):
+            return repr((type(value).__name__, [self.get_fingerprint(_value) for _value in value]))
+        ## Scalars, strings, dates...
+        return repr((type(value).__name__, value))
+
+    def get_key(self, signature: inspect.Signature, args: tuple, kwargs: dict) -> str:
+        # Key of a call from the fingerprints of its arguments, the arguments
+        # named with a leading '_' are not part of it (like st.cache_data)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        fingerprints = [
+            (_name, self.get_fingerprint(_value))
+            for _name, _value in bound.arguments.items()
+            if not _name.startswith('_')
+        ]
+        return hashlib.sha1(repr(fingerprints).encode()).hexdigest()
+
+    def freeze_value(self, value) -> None:
+        # Make the arrays of a cached value read-only, so that modifying a
+        # returned DataFrame in place raises an error instead of changing the
+        # cached one (and making its fingerprint wrong), the DataFrames are
+        # already safe with copy-on-write
+        if isinstance(value, dict):
+            for _value in value.values():
+                self.freeze_value(_value)
+        elif isinstance(value, (list, tuple)):
+            for _value in value:
+                self.freeze_value(_value)
+        elif isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        elif isinstance(value, (pd.DataFrame, pd.Series)) and not self.is_copy_on_write():
+            for _array in self.get_arrays(value):
+                _array.flags.writeable = False
+
+    def copy_value(self, value, fingerprint: str):
+        # Shallow copy of a cached value, so that adding a column to a returned
+        # DataFrame doesn't change the cached one (the read-only data isn't
+        # copied), with the fingerprint of the call attached
+        if isinstance(value, dict):
+            return {_key: self.copy_value(_value, f'{fingerprint}/{_key}') for _key, _value in value.items()}
+        if isinstance(value, (list, tuple)):
+            return type(value)(self.copy_value(_value, f'{fingerprint}/{i}') for i, _value in enumerate(value))
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            value = value.copy(deep=False)
+        self.set_fingerprint(value, fingerprint)
+        return value
+
+    def cache_data(self, func=None, max_entries: int=None, version=None, shared: bool=True):
+        # Decorator: cache the results of func keyed on the fingerprints of its
+        # arguments, in an LRU of max_entries results (and in the backend if
+        # shared), and fingerprint them
+        ## version is an optional callable whose result is part of the key
+        ## (e.g. the version of the source files of the data)
+        if func is None:
+            return lambda func: self.cache_data(func, max_entries, version, shared)
+        max_entries = max_entries or self.cache_max_entries
+        signature = inspect.signature(func)
+        name = func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            key = self.get_key(signature, args, kwargs)
+            if version is not None:
+                key = hashlib.sha1(f'{version()}:{key}'.encode()).hexdigest()
+            fingerprint = hashlib.sha1(f'{name}:{key}'.encode()).hexdigest()
+            with self.lock:
+                self.stats['key_time'] += time.perf_counter() - start
+                entries = self.entries.setdefault(name, OrderedDict())
+                if key in entries:
+                    self.stats['hits'] += 1
+                    entries.move_to_end(key)
+                    return self.copy_value(entries[key], fingerprint)
+                backend = self.backend if shared else None
+
+            ## The keys don't depend on the process, so the result may have
+            ## been computed by another one
+            found, evictions = False, 0
+            if backend is not None:
+                found, value = backend.get(name, key)
+            if not found:
+                value = func(*args, **kwargs)
+                if backend is not None:
+                    evictions = backend.set(name, key, value)
+
+            self.freeze_value(value)
+            with self.lock:
+                self.stats['shared_hits' if found else 'misses'] += 1
+                self.stats['evictions'] += evictions
+                entries[key] = value
+                entries.move_to_end(key)
+                while len(entries) > max_entries:
+                    entries.popitem(last=False)
+                    self.stats['evictions'] += 1
+            return self.copy_value(value, fingerprint)
+
+        return wrapper
+
+    def get_stats(self) -> dict:
+        # Hit/miss/eviction counters, cached entries & time spent on the keys
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = sum(len(entries) for entries in self.entries.values())
+        return stats
+
+    def clear(self, shared: bool=False) -> None:
+        # Drop every cached result of the process (and of the backend if
+        # shared) and reset the counters
+        with self.lock:
+            self.entries.clear()
+            self.stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0, 'key_time': 0.0}
+            if shared and self.backend is not None:
+                self.backend.clear()
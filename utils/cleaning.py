@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+from utils.ingestion import IngestionUtils
+
+class CleaningUtils(Constants):
+
+    def get_outlier_bounds(self, df: pd.DataFrame, col: str) -> dict:
+        # IQR bounds of the column, and its mean (the imputed value)
+        Q1 = (df[col]).quantile(0.25)
+        Q3 = (df[col]).quantile(0.75)
+        IQR = Q3 - Q1
+
+        return {
+            'minimum': float(Q1 - (1.5*IQR)),
+            'maximum': float(Q3 + (1.5*IQR)),
+            'mean': float(df[col].mean())
+        }
+
+    def get_quantile_from_counts(self, counts: pd.Series, q: float) -> float:
+        # Series.quantile(q) of the values repeated by their counts (linear
+        # interpolation, like numpy), e.g. from the value_counts of chunks
+        counts = counts[counts > 0].sort_index()
+        values = counts.index.to_numpy(dtype='float64')
+        ends = np.cumsum(counts.to_numpy())
+        position = (ends[-1] - 1) * q
+        lower = int(np.floor(position))
+        a = values[np.searchsorted(ends, lower, side='right')]
+        b = values[np.searchsorted(ends, min(lower + 1, ends[-1] - 1), side='right')]
+        t = position - lower
+        return b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t
+
+    def get_outlier_bounds_from_counts(self, counts: pd.Series) -> dict:
+        # get_outlier_bounds of a column from the counts of its values
+        Q1 = self.get_quantile_from_counts(counts, 0.25)
+        Q3 = self.get_quantile_from_counts(counts, 0.75)
+        IQR = Q3 - Q1
+
+        return {
+            'minimum': float(Q1 - (1.5*IQR)),
+            'maximum': float(Q3 + (1.5*IQR)),
+            'mean': float((counts.index.to_numpy(dtype='float64') * counts.to_numpy()).sum() / counts.sum())
+        }
+
+    def impute_outlier(self, df: pd.DataFrame, col: str, bounds: dict=None) -> pd.DataFrame:
+        # Replace the values out of the bounds by the mean, the bounds of df by
+        # default (or e.g. the ones of the last full cleaning for a delta)
+        bounds = bounds or self.get_outlier_bounds(df, col)
+
+        condition_lower_than = df[col] < bounds['minimum']
+        condition_more_than = df[col] > bounds['maximum']
+
+        df.loc[condition_more_than, col] = bounds['mean']
+        df.loc[condition_lower_than, col] = bounds['mean']
+
+        return df
+
+    def clean_reviews(self, df: pd.DataFrame, bounds: dict=None) -> pd.DataFrame:
+        # Impute the outliers of review_score with the mean (see impute_outlier)
+        df = self.impute_outlier(df, 'review_score', bounds)
+
+        ## Ensure the result is between 'review_score' range [1,5] (0 = no participation)
+        max_condition = df['review_score'] > 5
+        min_condition = (df['review_score'] < 1) & (df['review_score'].notna())
+
+        df.loc[max_condition, 'review_score'] = 5
+        df.loc[min_condition, 'review_score'] = 1
+
+        return df
+
+    def clean_delta(self, table_name: str, df: pd.DataFrame, cleaning_stats: dict) -> pd.DataFrame:
+        # Clean the rows appended to an append-only source with the statistics
+        # of the last full cleaning (frozen until the next one), so that the
+        # appended rows don't change the rows already cleaned
+        if table_name == 'order_reviews':
+            df = self.clean_reviews(df, cleaning_stats['review_score'])
+        return IngestionUtils().match_data_types(df, table_name)
@@ -11,6 +11,190 @@ class Constants:
             'products' : 'data_sources/products_dataset.csv',
             'sellers' : 'data_sources/sellers_dataset.csv',
         }
+        self.snapshot_dir = 'data_snapshots'
+        # Bump this whenever the cleaning logic in get_clean_data changes,
+        # so that previously written snapshots are invalidated
+        self.cleaning_version = 4
+        # Incremental ingestion: the rows appended to these sources since the
+        # snapshot are cleaned & appended to it (see get_appended_sources), a
+        # change to any other source rebuilds the snapshot
+        self.incremental_ingestion = True
+        self.append_only_sources = ['orders', 'order_items', 'order_payments', 'order_reviews']
+        # Rebuild the snapshot (and the statistics of the imputations) anyway
+        # once a source grew by more than this share since the full cleaning
+        self.incremental_max_growth = 0.25
+        # Streaming mode (see StreamingUtils): the order sources are read by
+        # chunks of streaming_chunk_rows rows and shuffled into partitions of
+        # about the same size in streaming_dir, the peak memory is bounded by it
+        self.streaming_dir = 'data_streams'
+        self.streaming_chunk_rows = 100_000
+        # CSV parser used by the ingestion ('c' or 'pyarrow')
+        self.csv_engine = 'c'
+        # City columns normalized by get_clean_data (unidecode), once per distinct
+        # name with a dictionary shared by the tables (see NormalizationUtils)
+        self.city_columns = {
+            'geolocations': 'geolocation_city',
+            'customers': 'customer_city',
+            'sellers': 'seller_city'
+        }
+        # Size (degrees) of the cells of the grid index of the locations (see
+        # SpatialIndexUtils.build_grid), about 55 km
+        self.grid_cell_size = 0.5
+        # Map of the Demographic Analysis: the zips are binned into square cells
+        # of 1/map_grid_cells of the span of the map (st.map zooms to fit the
+        # points), coarser until there are at most map_max_points cells, so the
+        # payload sent to the browser doesn't grow with the number of zips
+        self.map_grid_cells = 64
+        self.map_max_points = 2000
+        # Lower bounds (km) of the bands of the distance from the seller to the
+        # customer (see DeliveryUtils), the last band has no upper bound
+        self.distance_bands = [0, 50, 200, 500, 1000, 2000]
+        # Lead times of the orders (see DeliveryUtils.get_lead_times): the days
+        # from the start to the end timestamp of every stage (delay: after the
+        # estimated delivery date, late if delivered on a later day), their
+        # percentiles, and the fact table columns of the groups other than the
+        # month
+        self.lead_time_stages = {
+            'approval': ('order_purchase_timestamp', 'order_approved_at'),
+            'handling': ('order_approved_at', 'order_delivered_carrier_date'),
+            'transit': ('order_delivered_carrier_date', 'order_delivered_customer_date'),
+            'delivery': ('order_purchase_timestamp', 'order_delivered_customer_date'),
+            'delay': ('order_estimated_delivery_date', 'order_delivered_customer_date')
+        }
+        self.lead_time_percentiles = [50, 90, 99]
+        self.lead_time_groups = {
+            'state': 'geolocation_state',
+            'category': 'product_category_name_english'
+        }
+        # Integer columns that may have missing values before the imputation
+        self.nullable_columns = {
+            'products': ['product_photos_qty']
+        }
+        self.column_replacement = {
+            'products': {
+                'product_name_lenght': 'product_name_length',
+                'product_description_lenght': 'product_description_length'
+            }
+        }
+        # Compact mode: dictionary-encode the key columns into int32 codes
+        self.compact_keys = False
+        # Every key is encoded with one dictionary shared by all of its tables
+        self.dictionary_keys = {
+            'order_id': {
+                'orders': 'order_id',
+                'order_items': 'order_id',
+                'order_payments': 'order_id',
+                'order_reviews': 'order_id'
+            },
+            'customer_id': {
+                'customers': 'customer_id',
+                'orders': 'customer_id'
+            },
+            'customer_unique_id': {
+                'customers': 'customer_unique_id'
+            },
+            'product_id': {
+                'products': 'product_id',
+                'order_items': 'product_id'
+            },
+            'seller_id': {
+                'sellers': 'seller_id',
+                'order_items': 'seller_id'
+            },
+            'review_id': {
+                'order_reviews': 'review_id'
+            },
+            'zip_code_prefix': {
+                'customers': 'customer_zip_code_prefix',
+                'geolocations': 'geolocation_zip_code_prefix',
+                'sellers': 'seller_zip_code_prefix'
+            }
+        }
+        # Distinct counts (nunique): exact by default, or HyperLogLog estimates
+        # with a relative standard error of about distinct_error
+        self.approximate_distinct = False
+        self.distinct_error = 0.01
+        # Max number of HyperLogLog registers (bytes) computed as a dense array
+        self.dense_registers = 1 << 24
+        # Fact table columns with a bitmap index (the sidebar multiselects)
+        self.bitmap_index_columns = [
+            'order_status',
+            'product_category_name_english',
+            'geolocation_city',
+            'geolocation_state'
+        ]
+        # Dimensions of the monthly cube of the fact table
+        self.cube_dimensions = [
+            'month',
+            'order_status',
+            'product_category_name_english',
+            'geolocation_state',
+            'geolocation_city'
+        ]
+        # Max number of cached results per function (least recently used first out)
+        self.cache_max_entries = 16
+        # Shared backend of the cached results behind the memory of the process
+        # ('disk': pickles in cache_dir, shared by the dashboard workers & the
+        # batch jobs and kept across restarts, None: no backend), and its max
+        # number of results per function (see DiskCacheUtils)
+        self.cache_backend = None
+        self.cache_dir = 'data_cache'
+        self.shared_cache_max_entries = 256
+        # Order statuses selected by default in the dashboard (and precomputed
+        # by EngineUtils.precompute)
+        self.default_order_status = ['delivered']
+        # Dashboard sections: only the selected one is computed & rendered if
+        # lazy_sections (else all of them, in tabs), with the derived data it
+        # needs (the nodes of StDataUtils.get_data_graph)
+        self.lazy_sections = True
+        # Threads computing the independent nodes of the graph concurrently (1:
+        # one node after the other, None: up to 4 depending on the cores)
+        self.graph_workers = None
+        self.section_dependencies = {
+            'Overview': [
+                'date_range_proper',
+                'main_metrics',
+                'success_rate',
+                'quarterly_metrics_df',
+                'monthly_metrics_df',
+                'top_states_revenue_df',
+                'top_product_revenue_df',
+                'order_flow'
+            ],
+            'Product Portofolio': [
+                'top_product_revenue_no_mask_df',
+                'monthly_top_product_df',
+                'monthly_review_df',
+                'product_df'
+            ],
+            'Demographic Analysis': [
+                'filtered_df',
+                'metrics_by_locations_df',
+                'rfm_df',
+                'costs_by_distance_df',
+                'costs_by_state_pair_df'
+            ],
+            'Delivery Performance': [
+                'lead_time_summary_df',
+                'lead_times_by_month_df',
+                'lead_times_by_state_df',
+                'lead_times_by_category_df'
+            ]
+        }
+        # RFM segments of the customers by their recency & frequency scores
+        # ('<r_score><f_score>', 1 to 5)
+        self.rfm_segments = {
+            'Hibernating': ['11', '12', '21', '22'],
+            'At Risk': ['13', '14', '23', '24'],
+            "Can't Lose Them": ['15', '25'],
+            'About to Sleep': ['31', '32'],
+            'Need Attention': ['33'],
+            'Loyal Customers': ['34', '35', '44', '45'],
+            'Promising': ['41'],
+            'Potential Loyalists': ['42', '43', '52', '53'],
+            'New Customers': ['51'],
+            'Champions': ['54', '55']
+        }
         self.requirements = {
             'customers': {
                 'customer_id': 'object',
@@ -0,0 +1,270 @@
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+from utils.filters import FilterUtils
+from utils.timeindex import TimeIndexUtils
+from utils.sketch import SketchUtils
+
+# Distinct sketches of the cube: {name: column of the codes}, the HyperLogLog
+# registers of every cell, and the exact members (only in an exact cube)
+REGISTERS = {'order_registers': 'order_codes', 'customer_registers': 'customer_codes'}
+MEMBERS = {'orders': 'order_codes', 'customers': 'customer_codes'}
+
+class CubeUtils(Constants):
+
+    def get_month_labels(self, timestamps: pd.Series) -> np.ndarray:
+        # Month-end label of every timestamp (the 'ME' label of resample)
+        months = timestamps.to_numpy(dtype='datetime64[ns]').astype('datetime64[M]')
+        return (months + 1).astype('datetime64[ns]') - np.timedelta64(1, 'D')
+
+    def get_registers(self, cell_ids: np.ndarray, codes: np.ndarray, precision: int) -> dict:
+        # HyperLogLog sketch of every cell: its registers that are set (at most
+        # 2^precision per cell, whatever the number of rows), sorted by cell,
+        # mergeable by the max of each register (missing codes are -1 and skipped)
+        valid = codes >= 0
+        registers = SketchUtils().get_registers(cell_ids[valid].astype('int64'), codes[valid], precision)
+        keys = registers.index.to_numpy()
+        return {
+            'cell': (keys >> precision).astype('int32'),
+            'register': (keys & ((1 << precision) - 1)).astype('int32'),
+            'rank': registers.to_numpy()
+        }
+
+    def get_members(self, cell_ids: np.ndarray, codes: np.ndarray) -> dict:
+        # Exact distinct-count sketch of every cell: its distinct (cell, code)
+        # pairs, mergeable by union (missing codes are -1 and skipped), its
+        # size grows with the orders & customers of the cell
+        valid = codes >= 0
+        n_codes = int(codes.max()) + 1 if valid.any() else 1
+        pairs = np.unique(cell_ids[valid].astype('int64') * n_codes + codes[valid])
+        return {
+            'cell': (pairs // n_codes).astype('int32'),
+            'code': (pairs % n_codes).astype('int32')
+        }
+
+    def slice_members(self, members: dict, first_id: int, last_id: int) -> dict:
+        # Members of the cells first_id <= cell < last_id (binary search)
+        start, stop = np.searchsorted(members['cell'], [first_id, last_id], side='left')
+        return {_col: values[start:stop] for _col, values in members.items()}
+
+    def build_cells(self, df: pd.DataFrame, codes: dict, precision: int, exact: bool, first_cell: int=0) -> dict:
+        # Aggregate the fact rows into cells of (month, status, category, state,
+        # city) with the additive measures & the distinct sketches of the codes
+        # {'order_codes': ..., 'customer_codes': ...} of the rows: the registers,
+        # and the exact members if exact
+        keys = df[self.cube_dimensions[1:]].assign(month=self.get_month_labels(df['order_purchase_timestamp']))
+        cell_ids = keys.groupby(self.cube_dimensions, dropna=False, sort=False).ngroup().to_numpy()
+        n_cells = int(cell_ids.max()) + 1 if len(cell_ids) else 0
+
+        ## The dimensions of a cell are the ones of its first row
+        first_rows = np.unique(cell_ids, return_index=True)[1]
+        cells = keys.iloc[first_rows][self.cube_dimensions].reset_index(drop=True)
+        cells['cell_id'] = np.arange(first_cell, first_cell + n_cells)
+        cells['line_count'] = np.bincount(cell_ids, minlength=n_cells)
+        cells['revenue'] = np.bincount(cell_ids, weights=df['price'].fillna(0).to_numpy(), minlength=n_cells)
+        cells['freight'] = np.bincount(cell_ids, weights=df['freight_value'].fillna(0).to_numpy(), minlength=n_cells)
+        cells['review_sum'] = np.bincount(cell_ids, weights=df['review_score'].fillna(0).to_numpy(), minlength=n_cells)
+        cells['review_count'] = np.bincount(cell_ids, weights=df['review_score'].notna().to_numpy(), minlength=n_cells).astype('int64')
+
+        cube = {'cells': cells, 'precision': precision}
+        for _sketch, _codes in REGISTERS.items():
+            cube[_sketch] = self.get_registers(cell_ids + first_cell, codes[_codes], precision)
+        if exact:
+            for _sketch, _codes in MEMBERS.items():
+                cube[_sketch] = self.get_members(cell_ids + first_cell, codes[_codes])
+        return cube
+
+    def build_cube(self, fact_df: pd.DataFrame, exact: bool=True) -> dict:
+        # Materialize the monthly cube of the fact table (sorted on the purchase
+        # timestamp, see get_fact_data) with the row position of each month, so
+        # that partial months at the edges of a date range can be re-aggregated
+        ## The exact members are only kept if exact (opt-in): they grow with
+        ## the orders & customers, the registers of a cell don't (see rollup)
+        row_codes = {
+            'order_codes': pd.factorize(fact_df['order_id'])[0].astype('int32'),
+            'customer_codes': pd.factorize(fact_df['customer_unique_id'])[0].astype('int32')
+        }
+        cube = self.build_cells(fact_df, row_codes, SketchUtils().get_precision(), exact)
+
+        labels, codes = TimeIndexUtils().get_period_codes(fact_df['order_purchase_timestamp'], 'ME')
+        if codes is not None:
+            cube['month_labels'] = labels.to_numpy()
+            cube['month_positions'] = np.searchsorted(codes, np.arange(len(labels) + 1), side='left')
+        cube.update(row_codes)
+        return cube
+
+    def get_sketches(self, cube: dict) -> list:
+        # Names of the distinct sketches of a cube (or of a selection)
+        return [_sketch for _sketch in list(REGISTERS) + list(MEMBERS) if _sketch in cube]
+
+    def merge_cubes(self, cubes: list) -> dict:
+        # Union of cells & sketches (the cell ids must not overlap)
+        merged = {
+            'cells': pd.concat([cube['cells'] for cube in cubes], ignore_index=True),
+            'precision': cubes[0]['precision']
+        }
+        for _sketch in self.get_sketches(cubes[0]):
+            merged[_sketch] = {
+                _col: np.concatenate([cube[_sketch][_col] for cube in cubes])
+                for _col in cubes[0][_sketch]
+            }
+        return merged
+
+    def select(self,
+               cube: dict,
+               fact_df: pd.DataFrame,
+               start_date=None,
+               end_date=None,
+               order_status: list=None,
+               product_categories: list=None,
+               cities: list=None,
+               states: list=None) -> dict:
+        # Select the cells of the sidebar filters: the months fully inside the
+        # date range come from the cube, the (at most 2) partial months are
+        # aggregated from their fact rows only
+        date_slice = TimeIndexUtils().get_date_slice(fact_df['order_purchase_timestamp'], start_date, end_date)
+        n_cells = len(cube['cells'])
+        if date_slice is None or 'month_positions' not in cube:
+            ## Unsorted fact table: aggregate the rows of the date range
+            mask = FilterUtils().get_date_mask(fact_df['order_purchase_timestamp'], start_date, end_date)
+            rows = np.flatnonzero(mask) if mask is not None else np.arange(len(fact_df))
+            edge_rows = [rows]
+            full_months = np.array([], dtype='datetime64[ns]')
+        else:
+            positions = cube['month_positions']
+            full = (positions[:-1] >= date_slice.start) & (positions[1:] <= date_slice.stop)
+            full_months = cube['month_labels'][full]
+            if full.any():
+                first_full = positions[:-1][full][0]
+                last_full = positions[1:][full][-1]
+                edge_rows = [
+                    np.arange(date_slice.start, first_full),
+                    np.arange(last_full, date_slice.stop)
+                ]
+            else:
+                edge_rows = [np.arange(date_slice.start, date_slice.stop)]
+
+        ## The cells (and their sketches, sorted by cell) are in month order when
+        ## the fact table is sorted, so the full months are a contiguous range
+        full_cells = cube['cells'][cube['cells']['month'].isin(full_months)]
+        first_id = int(full_cells['cell_id'].min()) if len(full_cells) else 0
+        last_id = int(full_cells['cell_id'].max()) + 1 if len(full_cells) else 0
+        cubes = [{
+            'cells': full_cells,
+            'precision': cube['precision'],
+            **{_sketch: self.slice_members(cube[_sketch], first_id, last_id) for _sketch in self.get_sketches(cube)}
+        }]
+        edge_rows = np.concatenate(edge_rows)
+        if len(edge_rows):
+            cubes.append(self.build_cells(
+                fact_df.iloc[edge_rows],
+                {_codes: cube[_codes][edge_rows] for _codes in REGISTERS.values()},
+                cube['precision'],
+                'orders' in cube,
+                first_cell=n_cells
+            ))
+        selection = self.merge_cubes(cubes)
+
+        # Apply the multiselect filters on the cells
+        f = FilterUtils()
+        cells = selection['cells']
+        mask = f.combine_masks([
+            f.get_isin_mask(cells['order_status'], order_status),
+            f.get_isin_mask(cells['product_category_name_english'], product_categories),
+            f.get_isin_mask(cells['geolocation_city'], cities, ignore_case=True),
+            f.get_isin_mask(cells['geolocation_state'], states, ignore_case=True)
+        ])
+        if mask is not None:
+            cells = cells[mask]
+        selection['cells'] = cells.reset_index(drop=True)
+
+        ## Keep the sketches of the selected cells only
+        selected = np.zeros(n_cells + len(edge_rows) + 1, dtype=bool)
+        selected[cells['cell_id'].to_numpy()] = True
+        for _sketch in self.get_sketches(selection):
+            keep = selected[selection[_sketch]['cell']]
+            selection[_sketch] = {
+                _col: values[keep] for _col, values in selection[_sketch].items()
+            }
+        return selection
+
+    def rollup(self, selection: dict, by: list, approximate: bool=False, distinct: bool=True) -> pd.DataFrame:
+        # Roll the selected cells up to the 'by' dimensions (the rows with a
+        # missing dimension are dropped, like groupby): sums of the additive
+        # measures, and (if distinct) the distinct orders/customers by union of
+        # the sketches, HyperLogLog estimates from the max of the registers if
+        # approximate (their size doesn't depend on the rows), else the exact
+        # members
+        if distinct and not approximate and 'orders' not in selection:
+            raise ValueError('The exact distinct counts need a cube built with exact=True')
+        cells = selection['cells'].copy()
+        if 'quarter' in by:
+            cells['quarter'] = (
+                pd.Series(cells['month']).dt.to_period('Q').dt.end_time.dt.normalize()
+            )
+        cells = cells.dropna(subset=by)
+        group_ids = cells.groupby(by, sort=True).ngroup().to_numpy()
+        result = cells.groupby(by, sort=True).agg({
+            'line_count': 'sum',
+            'revenue': 'sum',
+            'freight': 'sum',
+            'review_sum': 'sum',
+            'review_count': 'sum'
+        })
+
+        ## Union of the sketches per group, then count the distinct codes
+        n_groups = len(result)
+        cell_groups = np.full(int(selection['cells']['cell_id'].max()) + 1 if len(selection['cells']) else 1, -1)
+        cell_groups[cells['cell_id'].to_numpy()] = group_ids
+        if not distinct:
+            sketches = []
+        elif approximate:
+            sketches = [('order_registers', 'order_count'), ('customer_registers', 'customer_count')]
+        else:
+            sketches = [('orders', 'order_count'), ('customers', 'customer_count')]
+        precision = selection['precision']
+        for _sketch, _col in sketches:
+            groups = cell_groups[selection[_sketch]['cell']] if len(selection[_sketch]['cell']) else np.array([], dtype='int64')
+            valid = groups >= 0
+            groups = groups[valid].astype('int64')
+            if approximate:
+                s = SketchUtils()
+                keys = groups * (1 << precision) + selection[_sketch]['register'][valid]
+                registers = s.max_registers(keys, selection[_sketch]['rank'][valid], n_groups << precision)
+                result[_col] = np.round(s.get_estimates(registers, n_groups, precision)).astype('int64')
+                continue
+            codes = selection[_sketch]['code'][valid].astype('int64')
+            n_codes = int(codes.max()) + 1 if len(codes) else 1
+            distinct = np.unique(groups * n_codes + codes) // n_codes
+            result[_col] = np.bincount(distinct, minlength=n_groups)[:n_groups]
+
+        result['line_count'] = result['line_count'].astype('int64')
+        result['review_score'] = result['review_sum'] / result['review_count'].where(result['review_count'] > 0)
+        return result
+
+    def get_monthly_rollup(self, selection: dict, rule: str='ME', approximate: bool=False, distinct: bool=True) -> pd.DataFrame:
+        # Roll up by month (or quarter, rule='QE'), with the empty periods
+        # between the first and the last one, like resample
+        by = {'ME': 'month', 'QE': 'quarter'}[rule]
+        result = self.rollup(selection, [by], approximate, distinct)
+        if len(result) == 0:
+            return result
+        periods = pd.date_range(result.index.min(), result.index.max(), freq=rule)
+        result = result.reindex(periods)
+        counts = [_col for _col in ['line_count', 'order_count', 'customer_count', 'review_count'] if _col in result]
+        result[counts] = result[counts].fillna(0).astype('int64')
+        result[['revenue', 'freight', 'review_sum']] = result[['revenue', 'freight', 'review_sum']].fillna(0)
+        result.index.name = by
+        return result
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+from utils.spatial import SpatialIndexUtils
+
+class DeliveryUtils(Constants):
+
+    def get_seller_locations(self, zip_lookup: dict, sellers_df: pd.DataFrame, seller_ids: pd.Series) -> pd.DataFrame:
+        # State, latitude & longitude of the sellers of seller_ids (with its
+        # index): the sellers are located once at the centroid of their zip code
+        # prefix, then gathered by their row (NaN for an unknown seller)
+        sp = SpatialIndexUtils()
+        locations = sp.get_zip_locations(zip_lookup, sellers_df['seller_zip_code_prefix'])
+        rows = pd.Index(sellers_df['seller_id']).get_indexer(seller_ids)
+        found = rows >= 0
+        rows = np.where(found, rows, 0)
+        return pd.DataFrame({
+            'seller_state': np.where(found, sellers_df['seller_state'].to_numpy(dtype='object')[rows], np.nan),
+            'seller_lat': np.where(found, locations['geolocation_lat'].to_numpy()[rows], np.nan),
+            'seller_lng': np.where(found, locations['geolocation_lng'].to_numpy()[rows], np.nan)
+        }, index=seller_ids.index)
+
+    def get_distance_bands(self, distances: pd.Series) -> pd.Series:
+        # Band of distance_bands (km) of every distance, NaN if it's missing
+        bounds = self.distance_bands
+        labels = [f'{_low:,}-{_high:,} km' for _low, _high in zip(bounds[:-1], bounds[1:])] + [f'{bounds[-1]:,}+ km']
+        return pd.cut(distances, bins=bounds + [np.inf], right=False, labels=labels)
+
+    def get_delivery_days(self, fact_df: pd.DataFrame) -> pd.Series:
+        # Days from the purchase to the delivery to the customer, NaN if the
+        # order wasn't delivered
+        return (fact_df['order_delivered_customer_date'] - fact_df['order_purchase_timestamp']).dt.total_seconds() / 86400
+
+    def get_delivery_costs(self, fact_df: pd.DataFrame, keys: dict) -> pd.DataFrame:
+        # Order lines, freight & distance of the rows of fact_df with a seller
+        # and a customer located, by the keys {name: values of the rows} (e.g.
+        # the distance band, the states of the seller & customer): freight per
+        # km is the total freight over the total distance, delivery days are
+        # the ones of the delivered orders
+        located = fact_df['distance_km'].notna()
+        df = pd.DataFrame({
+            **keys,
+            'freight_value': fact_df['freight_value'],
+            'distance_km': fact_df['distance_km'],
+            'delivery_days': self.get_delivery_days(fact_df)
+        })[located]
+        costs_df = (
+            df
+            .groupby(list(keys), observed=True)
+            .agg(
+                order_items=('freight_value', 'size'),
+                freight_value=('freight_value', 'sum'),
+                mean_freight_value=('freight_value', 'mean'),
+                distance_km=('distance_km', 'sum'),
+                median_distance_km=('distance_km', 'median'),
+                mean_delivery_days=('delivery_days', 'mean'),
+                median_delivery_days=('delivery_days', 'median')
+            )
+        )
+        ## The lines of a group all within one zip code prefix have no distance
+        costs_df['freight_per_km'] = costs_df['freight_value'] / costs_df['distance_km'].where(costs_df['distance_km'] > 0)
+        return costs_df.reset_index()
+
+    def get_costs_by_distance(self, fact_df: pd.DataFrame) -> pd.DataFrame:
+        # Delivery costs by distance band, from the nearest
+        return self.get_delivery_costs(fact_df, {'distance_band': self.get_distance_bands(fact_df['distance_km'])})
+
+    def get_costs_by_state_pair(self, fact_df: pd.DataFrame) -> pd.DataFrame:
+        # Delivery costs by state of the seller & of the customer, from the
+        # pair with the most order lines
+        return (
+            self.get_delivery_costs(fact_df, {
+                'seller_state': fact_df['seller_state'],
+                'customer_state': fact_df['customer_state']
+            })
+            .sort_values(by='order_items', ascending=False, kind='stable')
+            .reset_index(drop=True)
+        )
+
+    def get_nanoseconds(self, timestamps: pd.Series) -> np.ndarray:
+        # int64 nanoseconds since the epoch of the timestamps (NaT is the
+        # smallest int64)
+        return timestamps.to_numpy(dtype='datetime64[ns]').view('int64')
+
+    def get_lead_times(self, fact_df: pd.DataFrame) -> dict:
+        # Days of every stage of lead_time_stages {name: (start, end)} of the
+        # rows, by int64 arithmetic on the timestamps, NaN if one is missing
+        nat = np.iinfo('int64').min
+        lead_times = {}
+        for _stage, (_start, _end) in self.lead_time_stages.items():
+            start = self.get_nanoseconds(fact_df[_start])
+            end = self.get_nanoseconds(fact_df[_end])
+            missing = (start == nat) | (end == nat)
+            lead_times[_stage] = np.where(missing, np.nan, (end - np.where(missing, end, start)) / 86_400e9)
+        return lead_times
+
+    def get_group_percentiles(self, codes: np.ndarray, n_groups: int, values: np.ndarray, percentiles: list) -> np.ndarray:
+        # Percentiles (linear interpolation, like np.percentile) of the values
+        # of every group of codes (n_groups x percentiles, NaN for a group
+        # without values): the values are sorted by group then value once, the
+        # percentiles are read at their rank in the partition of every group
+        valid = (codes >= 0) & ~np.isnan(values)
+        codes, values = codes[valid], values[valid]
+        order = np.argsort(values)
+        ## A stable sort by group keeps the values sorted in every partition
+        ## (a radix sort for int16 codes)
+        group_codes = codes[order].astype('int16' if n_groups < 1 << 15 else 'int64')
+        order = order[np.argsort(group_codes, kind='stable')]
+        values = values[order]
+        counts = np.bincount(codes, minlength=n_groups)
+        starts = np.cumsum(counts) - counts
+        ## The empty groups read the first value, then get NaN
+        last = np.maximum(starts + counts - 1, 0)
+        result = np.full((n_groups, len(percentiles)), np.nan)
+        if not len(values):
+            return result
+        for i, _percentile in enumerate(percentiles):
+            ranks = starts + np.maximum(counts - 1, 0) * _percentile / 100
+            lower = np.minimum(np.floor(ranks).astype('int64'), len(values) - 1)
+            upper = np.minimum(lower + 1, last)
+            weight = ranks - np.floor(ranks)
+            result[:, i] = np.where(counts > 0, values[lower] + (values[upper] - values[lower]) * weight, np.nan)
+        return result
+
+    def get_lead_time_keys(self, fact_df: pd.DataFrame, by: str) -> pd.Series:
+        # Values of the groups of the lead times: the purchase month (from
+        # int64 months), the state of the customer or the category
+        if by == 'month':
+            months = fact_df['order_purchase_timestamp'].to_numpy(dtype='datetime64[ns]').astype('datetime64[M]')
+            return pd.Series(months, index=fact_df.index, name='month')
+        return fact_df[self.lead_time_groups[by]].rename(by)
+
+    def get_lead_time_summary(self, fact_df: pd.DataFrame, by: str=None) -> pd.DataFrame:
+        # Orders, delivered & late orders and the lead_time_percentiles of
+        # every stage (days) of the orders of fact_df, by month, state or
+        # category (one row for all the orders if by is None): an order counts
+        # once per group (the fact rows are order lines), and is late if it's
+        # delivered after the estimated delivery day
+        if by == 'category':
+            first = ~pd.DataFrame({'order_id': fact_df['order_id'], 'key': fact_df[self.lead_time_groups[by]]}).duplicated().to_numpy()
+        else:
+            ## The month & state are the same for all the lines of an order,
+            ## which are next to each other in the fact table (and in its
+            ## filtered rows): only the first line of every order is kept
+            order_ids = fact_df['order_id'].to_numpy()
+            first = np.ones(len(order_ids), dtype='bool')
+            first[1:] = order_ids[1:] != order_ids[:-1]
+        if by is None:
+            ## One group, even without any order
+            codes, n_groups = np.zeros(first.sum(), dtype='int64'), 1
+        else:
+            codes, uniques = pd.factorize(self.get_lead_time_keys(fact_df, by)[first], sort=True)
+            n_groups = len(uniques)
+        lead_times = {_stage: _values[first] for _stage, _values in self.get_lead_times(fact_df).items()}
+        ## The estimated delivery dates are days (at midnight): an order is
+        ## late if it's delivered on a later day, not just after midnight
+        estimated_days, delivered_days = (
+            self.get_nanoseconds(fact_df[_column])[first] // 86_400_000_000_000
+            for _column in self.lead_time_stages['delay']
+        )
+        late = ~np.isnan(lead_times['delay']) & (delivered_days > estimated_days)
+
+        summary_df = pd.DataFrame({
+            'orders': np.bincount(codes[codes >= 0], minlength=n_groups),
+            'delivered_orders': np.bincount(codes[(codes >= 0) & ~np.isnan(lead_times['delay'])], minlength=n_groups),
+            'late_orders': np.bincount(codes[(codes >= 0) & late], minlength=n_groups)
+        })
+        summary_df['late_rate'] = summary_df['late_orders'] / summary_df['delivered_orders'].where(summary_df['delivered_orders'] > 0)
+        for _stage, _values in lead_times.items():
+            percentiles = self.get_group_percentiles(codes, n_groups, _values, self.lead_time_percentiles)
+            for i, _percentile in enumerate(self.lead_time_percentiles):
+                summary_df[f'{_stage}_p{_percentile}'] = percentiles[:, i]
+
+        if by is not None:
+            summary_df.insert(0, by, np.asarray(uniques))
+            if by == 'month':
+                summary_df['month'] = pd.to_datetime(summary_df['month']).dt.strftime('%Y-%m')
+        return summary_df
@@ -0,0 +1,80 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+class EncodingUtils(Constants):
+
+    def get_key_columns(self, table_name: str) -> list:
+        # Get the columns of a table that are encoded by the compact mode
+        return [
+            columns[table_name] for columns in self.dictionary_keys.values()
+            if table_name in columns
+        ]
+
+    def get_arrow_column(self, table, col: str) -> pa.ChunkedArray:
+        # Get a key column as Arrow strings, from a DataFrame or an Arrow table
+        if isinstance(table, pa.Table):
+            return table.column(col).cast(pa.string())
+        return pa.chunked_array([pa.array(table[col], type=pa.string(), from_pandas=True)])
+
+    def encode_keys(self, data: dict) -> dict:
+        # Dictionary-encode every key into int32 codes, with one dictionary
+        # shared by all of its tables so the codes stay valid across the joins
+        encoded = {table_: {} for table_ in data.keys()}
+        dictionaries = {}
+        for key_, columns in self.dictionary_keys.items():
+            arrays = {
+                table_: self.get_arrow_column(data[table_], col_)
+                for table_, col_ in columns.items()
+            }
+
+            ## The dictionary is kept as Arrow strings (no Python object per value),
+            ## sorted so that the codes keep the order of the strings
+            dictionary = pc.drop_null(
+                pc.unique(pa.chunked_array(
+                    [chunk for array in arrays.values() for chunk in array.chunks],
+                    type=pa.string()
+                ))
+            )
+            dictionary = dictionary.take(pc.array_sort_indices(dictionary))
+            dictionaries[key_] = pd.Series(pd.arrays.ArrowStringArray(dictionary), name=key_)
+
+            ## Missing keys are encoded as -1
+            for table_, array in arrays.items():
+                encoded[table_][columns[table_]] = (
+                    pc.fill_null(pc.index_in(array, value_set=dictionary), -1)
+                    .to_numpy()
+                )
+
+        # Replace the key columns, and keep the original column order
+        result = {}
+        for table_, table in data.items():
+            columns = list(table.column_names if isinstance(table, pa.Table) else table.columns)
+            if isinstance(table, pa.Table):
+                table = table.drop_columns(list(encoded[table_].keys())).to_pandas()
+            result[table_] = table.assign(**encoded[table_])[columns]
+        result['dictionaries'] = dictionaries
+        return result
+
+    def decode_key(self, codes: pd.Series, dictionary: pd.Series) -> pd.Series:
+        # Map the codes of a key back to its strings (e.g. for an export),
+        # the codes may be float after a left merge with missing rows
+        codes = codes.fillna(-1).astype('int64')
+        return pd.Series(
+            dictionary.array.take(codes.to_numpy(), allow_fill=True),
+            index=codes.index,
+            name=codes.name
+        )
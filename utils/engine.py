@@ -0,0 +1,990 @@
+import zlib
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+from utils.ingestion import IngestionUtils
+from utils.encoding import EncodingUtils
+from utils.snapshot import SnapshotUtils
+from utils.cleaning import CleaningUtils
+from utils.normalization import NormalizationUtils
+from utils.spatial import SpatialIndexUtils
+from utils.delivery import DeliveryUtils
+from utils.filters import FilterUtils
+from utils.timeindex import TimeIndexUtils
+from utils.bitmap import BitmapIndexUtils
+from utils.cube import CubeUtils
+from utils.sketch import SketchUtils
+from utils.cache import CacheUtils, DiskCacheUtils
+from utils.graph import DataGraphUtils
+from utils.flow import FlowUtils
+from utils.rfm import RfmUtils
+from utils.streaming import StreamingUtils
+
+# Results of the methods below, shared by the sessions & reruns of the app
+# (and by the processes with a shared backend, see CacheUtils.set_backend)
+cache = CacheUtils()
+
+class EngineUtils(Constants):
+
+    ## The snapshot is already shared by the processes, so the cleaned data is
+    ## not written to the shared backend of the cache
+    @cache.cache_data(version=lambda: SnapshotUtils().get_source_version(), shared=False)
+    def get_clean_data(_self, compact: bool=False) -> pd.DataFrame:
+        # Initialize the constants
+        c = Constants()
+
+        # Load the cleaned data from the snapshot if the sources are unchanged
+        s = SnapshotUtils()
+        if s.is_snapshot_valid():
+            return s.load_snapshot(compact)
+
+        # Incremental mode: if rows were only appended to the append-only
+        # sources (the orders and their items, payments & reviews), only those
+        # rows are cleaned and appended to the snapshot
+        if c.incremental_ingestion:
+            appended = s.get_appended_sources()
+            if appended:
+                try:
+                    s.append_snapshot(appended)
+                    return s.load_snapshot(compact)
+                except (OSError, ValueError):
+                    ## e.g. unparsable appended rows, rebuild the snapshot
+                    pass
+
+        # Extract all data into dictionary of pandas DataFrames
+        ## The columns are parsed directly into their required types, and the
+        ## invalid column names are corrected by the ingestion
+        i = IngestionUtils()
+        data = {}
+        for source_ in c.source.keys():
+            data[source_] = i.read_source(source_)
+
+        # Create modified_data variable
+        modified_data = data
+
+        # Remove duplicated data
+        ## One row per zip code prefix, located at the median of its points
+        modified_data['geolocations'] = SpatialIndexUtils().get_zip_centroids(modified_data['geolocations'])
+
+        # Handle missing value
+        ## Handle missing value for
+        ## - product_photos_qty column in products table
+        ##   - Use imputation method with value=0
+        modified_data['products']['product_photos_qty'] = (
+            modified_data['products']['product_photos_qty']
+            .fillna(value=0)
+        )
+
+        ## Handle missing value for
+        ## - product_weight_g, product_length_cm, product_height_cm, product_width_cm columns in products table
+        ##   - Use imputation method with value=mean
+        missing_value_columns = ['product_weight_g', 'product_length_cm', 'product_height_cm', 'product_width_cm']
+        for col in missing_value_columns:
+            modified_data['products'][col] = (
+                modified_data['products'][col]
+                .fillna(value=modified_data['products'][col].mean())
+            )
+
+        # Handle outlier value for
+        ## - review_score in order_reviews table
+        ##   - Use imputation method with value = mean
+        ## The bounds are saved with the snapshot, the rows appended later are
+        ## imputed with them (see CleaningUtils.clean_delta)
+        cl = CleaningUtils()
+        cleaning_stats = {
+            'review_score': cl.get_outlier_bounds(modified_data['order_reviews'], 'review_score')
+        }
+        modified_data['order_reviews'] = cl.clean_reviews(
+            modified_data['order_reviews'],
+            cleaning_stats['review_score']
+        )
+
+        ## Ad-hoc: Normalize the city names (once per distinct name, with the
+        ## names normalized by the previous runs)
+        modified_data = NormalizationUtils().normalize_cities(modified_data)
+
+
+        # Match the data types (only the imputed integer columns are left)
+        for table_ in c.requirements.keys():
+            modified_data[table_] = i.match_data_types(modified_data[table_], table_)
+
+        # Save the cleaned data as a snapshot for the next cold starts
+        try:
+            s.save_snapshot(modified_data, cleaning_stats)
+        except OSError:
+            pass
+
+        # Compact mode: dictionary-encode the keys with shared dictionaries
+        if compact:
+            modified_data = EncodingUtils().encode_keys(modified_data)
+
+        return modified_data
+
+
+    @cache.cache_data
+    def get_fact_data(_self, data: dict) -> pd.DataFrame:
+        # Build the order-line fact table once (star schema: orders as the fact,
+        # order items, products, reviews, customers, sellers and geolocations as
+        # dimensions)
+        ## Create an order_items_df with the product category first
+        order_items_df = (
+            pd.merge(
+                data['order_items'][['order_id', 'price', 'freight_value', 'product_id', 'seller_id']],
+                data['products'][['product_id', 'product_category_name']],
+                how="left",
+                on="product_id"
+            )
+            .merge(
+                data['product_category_name_translations'][['product_category_name', 'product_category_name_english']],
+                how="left",
+                on="product_category_name"
+            )
+            .drop(columns=['product_category_name'])
+        )
+
+        # Merge all dfs
+        fact_df = (
+            pd.merge(
+                data['orders'],
+                order_items_df,
+                how="left",
+                on="order_id"
+            )
+            .merge(
+                data['order_reviews'][['review_id', 'order_id', 'review_score']],
+                how="left",
+                on="order_id"
+            )
+            .merge(
+                data['customers'][['customer_id', 'customer_unique_id', 'customer_city', 'customer_state', 'customer_zip_code_prefix']],
+                how="left",
+                on="customer_id"
+            )
+        )
+
+        ## The geolocation of the customers is gathered from the dense lookup
+        ## by zip code prefix (instead of a merge)
+        zip_lookup = _self.get_zip_lookup(data)
+        fact_df = fact_df.join(SpatialIndexUtils().get_zip_locations(zip_lookup, fact_df['customer_zip_code_prefix']))
+
+        ## The state of the seller and its distance to the customer (km), both
+        ## located at the centroid of their zip code prefix
+        sellers_df = DeliveryUtils().get_seller_locations(zip_lookup, data['sellers'], fact_df['seller_id'])
+        fact_df['seller_state'] = sellers_df['seller_state']
+        fact_df['distance_km'] = SpatialIndexUtils().get_haversine_distance(
+            sellers_df['seller_lat'], sellers_df['seller_lng'],
+            fact_df['geolocation_lat'], fact_df['geolocation_lng']
+        )
+
+        # Keep the fact table sorted on the purchase timestamp, so that the date
+        # filter and the monthly/quarterly bins are binary searches
+        fact_df = (
+            fact_df
+            .sort_values(by='order_purchase_timestamp', kind='stable')
+            .reset_index(drop=True)
+        )
+
+        return fact_df
+
+    @cache.cache_data
+    def get_zip_lookup(_self, data: dict) -> dict:
+        # Dense lookup of the geolocations by zip code prefix (see
+        # SpatialIndexUtils.build_zip_lookup)
+        return SpatialIndexUtils().build_zip_lookup(data['geolocations'])
+
+    @cache.cache_data
+    def get_seller_grid(_self, data: dict, zip_lookup: dict) -> dict:
+        # Grid index of the sellers, located at their zip code prefix (ids:
+        # rows of the sellers table)
+        locations = SpatialIndexUtils().get_zip_locations(zip_lookup, data['sellers']['seller_zip_code_prefix'])
+        return SpatialIndexUtils().build_grid(locations['geolocation_lat'], locations['geolocation_lng'])
+
+    @cache.cache_data
+    def get_orders_within_radius(_self,
+                                 filtered_df: pd.DataFrame,
+                                 lat: float,
+                                 lng: float,
+                                 radius: float) -> pd.DataFrame:
+        # Rows of the filtered data whose customer is within radius km of
+        # (lat, lng), with their distance: the bounding box of the radius is a
+        # cheap prefilter, the distance is only computed for the rows in it
+        lat_span, lng_span = SpatialIndexUtils().get_radius_span(lat, radius)
+        rows_lat = filtered_df['geolocation_lat'].to_numpy(dtype='float64')
+        rows_lng = filtered_df['geolocation_lng'].to_numpy(dtype='float64')
+        candidates = np.flatnonzero(
+            (rows_lat >= lat - lat_span) & (rows_lat <= lat + lat_span)
+            & (rows_lng >= lng - lng_span) & (rows_lng <= lng + lng_span)
+        )
+        distances = SpatialIndexUtils().get_haversine_distance(lat, lng, rows_lat[candidates], rows_lng[candidates])
+        within = distances <= radius
+        return filtered_df.iloc[candidates[within]].assign(distance_km=distances[within])
+
+    @cache.cache_data
+    def get_nearest_sellers(_self,
+                            data: dict,
+                            seller_grid: dict,
+                            lat: float,
+                            lng: float,
+                            k: int=5) -> pd.DataFrame:
+        # The k sellers nearest to (lat, lng), with their distance in km
+        sellers, distances = SpatialIndexUtils().get_nearest(seller_grid, lat, lng, k)
+        return (
+            data['sellers']
+            .iloc[sellers]
+            .assign(distance_km=distances)
+            .reset_index(drop=True)
+        )
+
+    @cache.cache_data
+    def get_fact_index(_self, fact_df: pd.DataFrame) -> dict:
+        # Bitmap index of the multiselect filter columns of the fact table
+        return BitmapIndexUtils().build_index(fact_df)
+
+    @cache.cache_data
+    def get_filtered_data(_self,
+                          fact_df: pd.DataFrame, 
+                          start_date: datetime, 
+                          end_date: datetime,
+                          order_status: list,
+                          product_categories: list,
+                          cities: list,
+                          states: list,
+                          _fact_index: dict=None) -> pd.DataFrame:
+
+        # Filter the data (boolean masks over the fact table, no merge needed),
+        # the filters that are not set are skipped
+        ## _fact_index is the bitmap index of fact_df (see get_fact_index), it's
+        ## not part of the cache key since it's derived from fact_df
+        f = FilterUtils()
+        filtered_df = f.filter_data(fact_df, start_date, end_date, order_status, product_categories, cities, states, _fact_index)
+
+        return filtered_df
+
+    @cache.cache_data
+    def get_fact_cube(_self, fact_df: pd.DataFrame, exact: bool=True) -> dict:
+        # Monthly cube of the fact table (see CubeUtils), with the exact
+        # distinct members if exact (not needed with approximate_distinct)
+        return CubeUtils().build_cube(fact_df, exact)
+
+    @cache.cache_data
+    def get_cube_selection(_self,
+                           fact_df: pd.DataFrame,
+                           start_date: datetime,
+                           end_date: datetime,
+                           order_status: list,
+                           product_categories: list,
+                           cities: list,
+                           states: list,
+                           _fact_cube: dict=None) -> dict:
+        # Select the cube cells of the filters, same arguments as get_filtered_data
+        ## _fact_cube is the cube of fact_df (see get_fact_cube), not hashed
+        return CubeUtils().select(_fact_cube, fact_df, start_date, end_date, order_status, product_categories, cities, states)
+
+    @cache.cache_data
+    def get_order_funnel_from_cube(_self, cube_selection: dict, approximate: bool=False) -> pd.DataFrame:
+        # Same as get_order_funnel, rolled up from the cube
+        funnel_df = CubeUtils().rollup(cube_selection, ['month', 'order_status'], approximate)[['order_count']].reset_index()
+        funnel_df['month'] = funnel_df['month'].dt.strftime('%Y-%m')
+        funnel_df = (
+            funnel_df
+            .sort_values(by=['month','order_status'])
+            .reset_index(drop=True)
+        )
+        return funnel_df
+
+    @cache.cache_data
+    def get_metrics_by_month_from_cube(_self, cube_selection: dict, approximate: bool=False) -> pd.DataFrame:
+        # Same as get_metrics_by_month, rolled up from the cube
+        metrics_df = (
+            CubeUtils().get_monthly_rollup(cube_selection, 'ME', approximate)[['order_count', 'customer_count', 'revenue']]
+            .reset_index()
+            .rename(columns={'revenue': 'revenue_w_o_freight'})
+            .sort_values(by='month', ascending=True)
+            .reset_index(drop=True)
+        )
+
+        return metrics_df
+
+    @cache.cache_data
+    def get_metrics_by_quarter_from_cube(_self, cube_selection: dict, approximate: bool=False) -> pd.DataFrame:
+        # Same as get_metrics_by_quarter, rolled up from the cube
+        metrics_df = (
+            CubeUtils().get_monthly_rollup(cube_selection, 'QE', approximate)[['order_count', 'customer_count', 'revenue']]
+            .reset_index()
+            .rename(columns={
+                'quarter': 'Quarter',
+                'customer_count': 'Customer',
+                'order_count': 'Order',
+                'revenue': 'Revenue'
+            })
+            .sort_values(by='Quarter', ascending=False)
+            .reset_index(drop=True)
+        )
+        metrics_df['Quarter'] = metrics_df['Quarter'].dt.to_period('Q')
+
+        return metrics_df
+
+    @cache.cache_data
+    def get_review_by_month_from_cube(_self, cube_selection: dict) -> pd.DataFrame:
+        # Same as get_review_by_month, rolled up from the cube
+        review_df = (
+            CubeUtils().get_monthly_rollup(cube_selection, 'ME', distinct=False)[['review_score']]
+            .reset_index()
+            .sort_values(by='month', ascending=True)
+            .reset_index(drop=True)
+        )
+
+        return review_df
+
+    @cache.cache_data
+    def get_product_data_from_cube(_self, cube_selection: dict) -> pd.DataFrame:
+        # Same as get_product_data, rolled up from the cube
+        agg_df = (
+            CubeUtils().rollup(cube_selection, ['product_category_name_english'], distinct=False)
+            [['line_count', 'revenue', 'review_score']]
+            .rename(columns={'line_count': 'order_id', 'revenue': 'price'})
+            .sort_values(by='order_id', ascending=False)
+            .reset_index()
+            .rename(columns={
+                'order_id': 'product_count',
+                'price': 'revenue_w_o_freight'
+            })
+        )
+
+        return agg_df
+
+    @cache.cache_data
+    def get_product_data_by_month_from_cube(_self, cube_selection: dict) -> pd.DataFrame:
+        # Same as get_product_data_by_month, rolled up from the cube
+        agg_df = CubeUtils().rollup(cube_selection, ['month', 'product_category_name_english'], distinct=False)[['line_count', 'revenue', 'review_score']]
+        agg_df.index = agg_df.index.set_levels(agg_df.index.levels[0].strftime('%Y-%m'), level='month')
+        agg_df = (
+            agg_df
+            .rename(columns={'line_count': 'order_id', 'revenue': 'price'})
+            .sort_values(by='month', ascending=False)
+            .reset_index()
+            .rename(columns={
+                'order_id': 'product_count',
+                'price': 'revenue_w_o_freight'
+            })
+        )
+
+        return agg_df
+
+    @cache.cache_data
+    def get_order_funnel(_self, filtered_df: pd.DataFrame, approximate: bool=False) -> pd.DataFrame:
+        # Note: filtered_df in this context is filtered_df without order_status_filter
+        # Get funnel_df
+        funnel_df = filtered_df.copy()
+
+        ## Add year month column
+        funnel_df['month'] = funnel_df['order_purchase_timestamp'].dt.strftime('%Y-%m')
+        funnel_df = (
+            SketchUtils()
+            .agg(funnel_df, ['month','order_status'], {
+                "order_id": "nunique"
+            }, approximate)
+            .reset_index()
+            .rename(columns={'order_id': 'order_count'})
+            .sort_values(by=['month','order_status'])
+            .reset_index(drop=True)
+        )
+        return funnel_df
+    
+    @cache.cache_data
+    def get_order_success_rate(_self, funnel_df: pd.DataFrame) -> tuple:
+        # Get latest & previous month
+        prev_month, latest_month = sorted(list(funnel_df['month'].unique()))[-2:]
+
+        # Get succes_df 
+        success_df = funnel_df.copy()  
+        success_df = success_df[success_df['order_status'] == 'delivered']
+
+        # Get success count latest month
+        try:
+            latest_success_count = success_df[success_df['month'] == latest_month]['order_count'].values[0]
+        except IndexError:
+            latest_success_count = 0
+
+        # Get success count previous month
+        try:
+            previous_success_count = success_df[success_df['month'] == prev_month]['order_count'].values[0]
+        except IndexError:
+            previous_success_count = 0
+        
+        # Get total_df
+        total_df = funnel_df.copy()  
+        total_df = total_df.groupby('month').agg({'order_count': 'sum'}).reset_index().sort_values(by='month').reset_index(drop=True)
+
+        # Get total count latest month
+        try:
+            latest_total_count = total_df[total_df['month'] == latest_month]['order_count'].values[0]
+        except IndexError:
+            latest_total_count = 0
+
+        # Get total count previous month
+        try:
+            previous_total_count = total_df[total_df['month'] == prev_month]['order_count'].values[0]
+        except IndexError:
+            previous_total_count = 0
+
+        latest_success_rate = latest_success_count / latest_total_count
+        previous_success_rate = previous_success_count / previous_total_count
+        try:
+            mom_success_rate = (latest_success_rate - previous_success_rate) / previous_success_rate
+        except ZeroDivisionError:
+            mom_success_rate = 0
+        
+        return latest_success_rate, mom_success_rate
+    
+    @cache.cache_data
+    def get_metrics_by_month(_self, filtered_df: pd.DataFrame, approximate: bool=False) -> pd.DataFrame:
+        # Aggregate the data
+        ## filtered_df is sorted on order_purchase_timestamp (see get_fact_data)
+        metrics_df = (
+            TimeIndexUtils()
+            .resample(filtered_df, rule='ME', on='order_purchase_timestamp', agg={
+                "order_id": "nunique",
+                "customer_unique_id": "nunique",
+                "price": "sum"
+            }, approximate=approximate)
+            .rename(columns={
+                'order_purchase_timestamp': 'month',
+                'customer_unique_id': 'customer_count',
+                'order_id': 'order_count',
+                'price': 'revenue_w_o_freight'
+            })
+            .sort_values(by='month', ascending=True)
+            .reset_index(drop=True)
+        )
+
+        return metrics_df
+    
+    @cache.cache_data
+    def get_metrics_by_quarter(_self, filtered_df: pd.DataFrame, approximate: bool=False) -> pd.DataFrame:
+        # Aggregate the data
+        ## filtered_df is sorted on order_purchase_timestamp (see get_fact_data)
+        metrics_df = (
+            TimeIndexUtils()
+            .resample(filtered_df, rule='QE', on='order_purchase_timestamp', agg={
+                "order_id": "nunique",
+                "customer_unique_id": "nunique",
+                "price": "sum"
+            }, approximate=approximate)
+            .rename(columns={
+                'order_purchase_timestamp': 'Quarter',
+                'customer_unique_id': 'Customer',
+                'order_id': 'Order',
+                'price': 'Revenue'
+            })
+            .sort_values(by='Quarter', ascending=False)
+            .reset_index(drop=True)
+        )
+        metrics_df['Quarter'] = metrics_df['Quarter'].dt.to_period('Q')
+
+        return metrics_df
+    
+    @cache.cache_data
+    def get_main_metrics(_self, metrics_df: pd.DataFrame) -> dict:
+
+        # Create a dummy dataframe
+        df = metrics_df.copy()
+        
+        # Get main metrics: order_count, customer_count, revenue_w_o_freight latest month
+        df = df.sort_values(by='month', ascending=False).reset_index(drop=True)
+        
+        # Calculate m-o-m progress
+        df['order_count_mom'] = (df['order_count'] - df['order_count'].shift(-1)) / df['order_count'].shift(-1)
+        df['customer_count_mom'] = (df['customer_count'] - df['customer_count'].shift(-1)) / df['customer_count'].shift(-1)
+        df['revenue_w_o_freight_mom'] = (df['revenue_w_o_freight'] - df['revenue_w_o_freight'].shift(-1)) / df['revenue_w_o_freight'].shift(-1)
+
+        result = df.head(1).to_dict()
+
+        return result
+    
+    @cache.cache_data
+    def calculate_flowing_count(_self, filtered_df: pd.DataFrame, approximate: bool=False):
+        # Count the distinct orders per status (only order_id & order_status are read)
+        counts = (
+            SketchUtils()
+            .agg(filtered_df[['order_status', 'order_id']], 'order_status', {'order_id': 'nunique'}, approximate)
+            ['order_id']
+        )
+
+        # Propagate the counts through the status transition graph (one
+        # adjacency matrix per level of order_status_level)
+        f = FlowUtils()
+        final_df = f.get_flows(counts, f.get_transition_graph(_self.order_status_level))
+
+        final_df = final_df.fillna(0)
+        final_df['count'] = final_df['count'].astype('int64')
+        final_df['level'] = final_df['level'].astype('str')
+        final_df['target'] = final_df['to'].map(final_df.groupby('from').max()['level'], na_action='ignore')
+        final_df = final_df.reset_index(drop=True)
+        condition = final_df['from'] == final_df['to']
+        final_df['to'] = final_df['to'].mask(condition, final_df['to'] + "'")
+        
+        status = list(pd.unique(final_df[['from', 'to']].values.ravel()))
+
+        return status, final_df
+
+    @cache.cache_data
+    def get_product_data(_self, filtered_df: pd.DataFrame) -> pd.DataFrame:
+
+        # Create a dummy dataframe
+        df = filtered_df.copy()
+
+        # Aggregate the data
+        agg_df = (
+            df
+            .groupby(['product_category_name_english'])
+            .agg({
+                'order_id': 'count',
+                'price': 'sum',
+                'review_score': 'mean'
+            })
+            .sort_values(by='order_id', ascending=False)
+            .reset_index()
+            .rename(columns={
+                'order_id': 'product_count',
+                'price': 'revenue_w_o_freight'
+            })
+        )
+
+        return agg_df
+    
+    @cache.cache_data
+    def get_top_product_by_unit(_self, product_df: pd.DataFrame) -> pd.DataFrame:
+        # Get top 5 product by unit (product_count)
+        top_products = product_df.sort_values(by='product_count', ascending=False).head()['product_category_name_english']
+
+        # Mask non top product + format the text
+        top_product_unit_df = product_df.copy()
+        top_product_unit_df['product_category_name_english'] = (
+            top_product_unit_df['product_category_name_english']
+            .mask(~(top_product_unit_df['product_category_name_english'].isin(top_products)), 'Others')
+            .str.replace('_', ' ')
+            .str.title()
+        )
+
+        # Aggregate the result
+        top_product_unit_df = (
+            top_product_unit_df
+            .groupby('product_category_name_english')
+            .sum()[['product_count']]
+            .reset_index()
+            .rename(columns={
+                'product_category_name_english': 'Category',
+                'product_count': 'Product count'
+            })
+        )
+
+        return top_product_unit_df
+    
+    @cache.cache_data
+    def get_top_product_by_revenue(_self, product_df: pd.DataFrame, use_mask: bool=False) -> pd.DataFrame:
+        # Get top 5 product by revenue (revenue_w_o_freight)
+        top_products = product_df.sort_values(by='revenue_w_o_freight', ascending=False).head()['product_category_name_english']
+
+        # Mask non top product
+        top_product_revenue_df = product_df.copy()
+        if use_mask == False:
+            top_product_revenue_df['product_category_name_english'] = (
+                top_product_revenue_df['product_category_name_english']
+                .mask(~(top_product_revenue_df['product_category_name_english'].isin(top_products)), 'Others')
+            )
+        # Format the category text
+        top_product_revenue_df['product_category_name_english'] = (
+            top_product_revenue_df['product_category_name_english']
+            .str.replace('_', ' ')
+            .str.title()
+        )
+        # Aggregate the result
+        top_product_revenue_df = (
+            top_product_revenue_df
+            .groupby('product_category_name_english')
+            .sum()[['revenue_w_o_freight']]
+            .reset_index()
+            .rename(columns={
+                'product_category_name_english': 'Category',
+                'revenue_w_o_freight': 'Revenue'
+            })
+            .sort_values(by='Revenue', ascending=False)
+            .reset_index(drop=True)
+        )
+
+        return top_product_revenue_df
+    
+    @cache.cache_data
+    def get_product_data_by_month(_self, filtered_df: pd.DataFrame) -> pd.DataFrame:
+
+        # Create a dummy dataframe
+        df = filtered_df.copy()
+
+        # Create month column
+        df['month'] = df['order_purchase_timestamp'].dt.strftime('%Y-%m')
+
+        # Aggregate the data
+        agg_df = (
+            df
+            .groupby(['month', 'product_category_name_english'])
+            .agg({
+                'order_id': 'count',
+                'price': 'sum',
+                'review_score': 'mean'
+            })
+            .sort_values(by='month', ascending=False)
+            .reset_index()
+            .rename(columns={
+                'order_id': 'product_count',
+                'price': 'revenue_w_o_freight'
+            })
+        )
+
+        return agg_df
+    
+    @cache.cache_data
+    def get_monthly_top_product(_self, monthly_product_df: pd.DataFrame, month: str) -> pd.DataFrame:
+        # Filter based on month
+        top_product_revenue_df = monthly_product_df[monthly_product_df['month'] == month].copy()
+
+        # Format the category text
+        top_product_revenue_df['product_category_name_english'] = (
+            top_product_revenue_df['product_category_name_english']
+            .str.replace('_', ' ')
+            .str.title()
+        )
+        # Aggregate the result
+        top_product_revenue_df = (
+            top_product_revenue_df
+            .groupby('product_category_name_english')
+            .sum()[['revenue_w_o_freight']]
+            .reset_index()
+            .rename(columns={
+                'product_category_name_english': 'Category',
+                'revenue_w_o_freight': 'Revenue'
+            })
+            .sort_values(by='Revenue', ascending=False)
+            .reset_index(drop=True)
+        )
+
+        return top_product_revenue_df
+
+    @cache.cache_data
+    def get_review_by_month(_self, filtered_df: pd.DataFrame) -> pd.DataFrame:
+        # Aggregate the data
+        review_df = (
+            filtered_df
+            .resample(rule='ME', on='order_purchase_timestamp')
+            .agg({
+                'review_score': 'mean'
+            })
+            .reset_index()
+            .rename(columns={'order_purchase_timestamp':'month'})
+            .sort_values(by='month', ascending=True)
+            .reset_index(drop=True)
+        )
+
+        return review_df
+    
+    @cache.cache_data
+    def get_metrics_by_locations(_self, filtered_df: pd.DataFrame, approximate: bool=False) -> pd.DataFrame:
+        # Aggregate the data
+        metrics_df = (
+            SketchUtils()
+            .agg(filtered_df, 'customer_zip_code_prefix', {
+                "order_id": "nunique",
+                "customer_unique_id": "nunique",
+                'price': 'sum',
+                'review_score': 'mean',
+                'geolocation_lat': 'max',
+                'geolocation_lng': 'max',
+                'geolocation_city': 'max',
+                'geolocation_state': 'max'
+            }, approximate)
+            .reset_index()
+            .rename(columns={
+                'customer_unique_id': 'customer_count',
+                'order_id': 'order_count',
+                'price': 'revenue_w_o_freight'
+            })
+            .dropna(subset=['geolocation_lat', 'geolocation_lng'])
+            .reset_index(drop=True)
+        )
+
+        return metrics_df
+    
+    def get_location_colors(self, locations: pd.Series) -> pd.Series:
+        # Color of every location from css_colors, picked by a checksum of its
+        # name so that it's the same on every rerun and in every process
+        codes, uniques = pd.factorize(locations)
+        colors = np.array(
+            [self.css_colors[zlib.crc32(str(_location).encode()) % len(self.css_colors)] for _location in uniques] + [self.css_colors[0]],
+            dtype='object'
+        )
+        ## The missing locations (code -1) take the last item
+        return pd.Series(colors[codes], index=locations.index)
+
+    @cache.cache_data
+    def get_map_points(_self,
+                       metrics_by_locations_df: pd.DataFrame,
+                       location_column: str,
+                       size_column: str,
+                       binned: bool=True) -> pd.DataFrame:
+        # Points of the map: latitude, longitude, color (of location_column) and
+        # size (radius in meters). Binned, the zips are aggregated into square
+        # cells sized for the span of the map: the sums of the metrics, located
+        # at the centroid of the orders and colored by the location with the
+        # most revenue, sized by the square root of the share of the largest
+        # cell. Otherwise, the map_max_points largest zips by size_column (sized
+        # by its value).
+        metrics_columns = ['revenue_w_o_freight', 'order_count', 'customer_count']
+        df = metrics_by_locations_df
+        if not binned:
+            points_df = df.nlargest(_self.map_max_points, size_column)[['geolocation_lat', 'geolocation_lng', location_column]]
+            return (
+                points_df
+                .assign(
+                    color=_self.get_location_colors(points_df[location_column]),
+                    size=df[size_column]
+                )
+                .drop(columns=[location_column])
+                .reset_index(drop=True)
+            )
+
+        sp = SpatialIndexUtils()
+        lat = df['geolocation_lat'].to_numpy(dtype='float64')
+        lng = df['geolocation_lng'].to_numpy(dtype='float64')
+        ## The span of the map, as st.map zooms: a power of 2 fraction of 360 degrees
+        extent = max(np.ptp(lat), np.ptp(lng)) if len(df) else 360.0
+        span = 360.0 / 2 ** max(0, int(np.floor(np.log2(360.0 / max(extent, 1e-3)))))
+        cell_size = max(span / _self.map_grid_cells, 0.01)
+        while True:
+            rows, cols = sp.get_cells(lat, lng, cell_size)
+            cells = rows * (1 << 20) + cols
+            if len(np.unique(cells)) <= _self.map_max_points:
+                break
+            cell_size *= 2
+
+        ## The location of a cell is the one of its zip with the most revenue
+        binned_df = (
+            df[metrics_columns + [location_column]]
+            .assign(
+                cell=cells,
+                lat_orders=lat * df['order_count'].to_numpy(),
+                lng_orders=lng * df['order_count'].to_numpy()
+            )
+            .sort_values(by='revenue_w_o_freight', ascending=False, kind='stable')
+            .groupby('cell', sort=False)
+            .agg({
+                'revenue_w_o_freight': 'sum',
+                'order_count': 'sum',
+                'customer_count': 'sum',
+                'lat_orders': 'sum',
+                'lng_orders': 'sum',
+                location_column: 'first'
+            })
+            .reset_index(drop=True)
+        )
+        share = binned_df[size_column] / binned_df[size_column].max()
+        return pd.DataFrame({
+            'geolocation_lat': binned_df['lat_orders'] / binned_df['order_count'],
+            'geolocation_lng': binned_df['lng_orders'] / binned_df['order_count'],
+            'color': _self.get_location_colors(binned_df[location_column]),
+            ## At most half of a cell (111 km per degree)
+            'size': np.sqrt(share.clip(lower=0)) * cell_size * 111_000 / 2
+        })
+
+    @cache.cache_data
+    def get_delivery_costs_by_distance(_self, filtered_df: pd.DataFrame) -> pd.DataFrame:
+        # Freight & delivery time by band of distance from the seller to the
+        # customer (see DeliveryUtils)
+        return DeliveryUtils().get_costs_by_distance(filtered_df)
+
+    @cache.cache_data
+    def get_delivery_costs_by_state_pair(_self, filtered_df: pd.DataFrame) -> pd.DataFrame:
+        # Freight & delivery time by state of the seller & of the customer
+        return DeliveryUtils().get_costs_by_state_pair(filtered_df)
+
+    @cache.cache_data
+    def get_lead_time_summary(_self, filtered_df: pd.DataFrame, by: str=None) -> pd.DataFrame:
+        # Lead times & late deliveries of the orders, by month, state or
+        # category (see DeliveryUtils.get_lead_time_summary)
+        return DeliveryUtils().get_lead_time_summary(filtered_df, by)
+
+    @cache.cache_data
+    def get_top_states_by_revenue(_self, metrics_by_locations_df: pd.DataFrame) -> pd.DataFrame:
+        # Get top 5 states by revenue (revenue_w_o_freight)
+        top_states = (
+            metrics_by_locations_df
+            .groupby('geolocation_state')
+            .agg({'revenue_w_o_freight': 'sum'})
+            .reset_index()
+            .sort_values(by='revenue_w_o_freight', ascending=False)
+            .head()
+            ['geolocation_state']
+        )
+
+        # Mask non top state + format the text
+        top_states_revenue_df = metrics_by_locations_df.copy()
+        top_states_revenue_df['geolocation_state'] = (
+            top_states_revenue_df['geolocation_state']
+            .mask(~(top_states_revenue_df['geolocation_state'].isin(top_states)), 'Others')
+            .str.replace('_', ' ')
+            .str.upper()
+        )
+
+        # Aggregate the result
+        top_states_revenue_df = (
+            top_states_revenue_df
+            .groupby('geolocation_state')
+            .agg({'revenue_w_o_freight': 'sum'})
+            .reset_index()
+            .rename(columns={
+                'geolocation_state': 'State',
+                'revenue_w_o_freight': 'Revenue'
+            })
+        )
+
+        return top_states_revenue_df
+
+    @cache.cache_data
+    def get_rfm_analysis(_self, filtered_df: pd.DataFrame) -> pd.DataFrame:
+        ## Create an rfm dataframe: recency, frequency & monetary of every
+        ## customer with their quintile scores & segment (see RfmUtils)
+        rfm_df = RfmUtils().get_rfm(filtered_df)
+        rfm_df = rfm_df.reset_index()
+
+        return rfm_df
+
+    @cache.cache_data(version=lambda: SnapshotUtils().get_source_version())
+    def get_streamed_metrics(_self,
+                             start_date: datetime,
+                             end_date: datetime,
+                             order_status: list,
+                             product_categories: list,
+                             cities: list,
+                             states: list) -> dict:
+        # Streaming mode: monthly_metrics_df, quarterly_metrics_df,
+        # metrics_by_locations_df and rfm_df of the filters, computed partition
+        # by partition from the sources (see StreamingUtils), for sources that
+        # don't fit in memory (no get_clean_data / get_fact_data)
+        return StreamingUtils().aggregate(start_date, end_date, order_status, product_categories, cities, states)
+
+    @cache.cache_data
+    def get_top_customers(_self, rfm_df: pd.DataFrame, by: str, k: int=5, ascending: bool=False) -> pd.DataFrame:
+        # Top k customers of the rfm dataframe by recency, frequency or monetary
+        return RfmUtils().get_top(rfm_df, by, k, ascending)
+
+    def get_filter_options(self, data: dict) -> dict:
+        # Options of the filters of the dashboard, and the date range of the
+        # orders (the default dates)
+        return {
+            'start_date': data['orders']['order_purchase_timestamp'].min(),
+            'end_date': data['orders']['order_purchase_timestamp'].max(),
+            'order_status': data['orders']['order_status'].unique(),
+            'product_categories': data['product_category_name_translations']['product_category_name_english'].unique(),
+            'cities': data['geolocations']['geolocation_city'].unique(),
+            'states': data['geolocations']['geolocation_state'].unique()
+        }
+
+    def get_data_graph(self,
+                       fact_df: pd.DataFrame,
+                       fact_index: dict,
+                       fact_cube: dict,
+                       start_date: datetime,
+                       end_date: datetime,
+                       order_status: list,
+                       product_categories: list,
+                       cities: list,
+                       states: list) -> DataGraphUtils:
+        # Declare the derived data of the dashboard for the sidebar filters, a
+        # node is only computed when a section needs it (see section_dependencies)
+        a = self.approximate_distinct
+        g = DataGraphUtils()
+
+        # Filtered data and its actual date range, filtered data for counting
+        # the success rate (without the order status filter)
+        g.add('filtered_df', lambda: self.get_filtered_data(fact_df, start_date, end_date, order_status, product_categories, cities, states, fact_index))
+        g.add('date_range_proper', lambda df: (
+            df['order_purchase_timestamp'].min().date(),
+            df['order_purchase_timestamp'].max().date()
+        ), ['filtered_df'])
+        g.add('filtered_df_2', lambda dates: self.get_filtered_data(fact_df, *dates, [], product_categories, cities, states, fact_index), ['date_range_proper'])
+        g.add('cube_selection', lambda: self.get_cube_selection(fact_df, start_date, end_date, order_status, product_categories, cities, states, fact_cube))
+        g.add('cube_selection_2', lambda dates: self.get_cube_selection(fact_df, *dates, [], product_categories, cities, states, fact_cube), ['date_range_proper'])
+
+        # Funnel, success rate and order flow
+        g.add('funnel_df', lambda cs: self.get_order_funnel_from_cube(cs, approximate=a), ['cube_selection_2'])
+        g.add('success_rate', self.get_order_success_rate, ['funnel_df'])
+        g.add('order_flow', lambda df: self.calculate_flowing_count(df, approximate=a), ['filtered_df_2'])
+
+        # Main and other metrics
+        g.add('monthly_metrics_df', lambda cs: self.get_metrics_by_month_from_cube(cs, approximate=a), ['cube_selection'])
+        g.add('quarterly_metrics_df', lambda cs: self.get_metrics_by_quarter_from_cube(cs, approximate=a), ['cube_selection'])
+        g.add('main_metrics', self.get_main_metrics, ['monthly_metrics_df'])
+
+        # Products and reviews
+        g.add('product_df', self.get_product_data_from_cube, ['cube_selection'])
+        g.add('top_product_revenue_df', self.get_top_product_by_revenue, ['product_df'])
+        g.add('top_product_revenue_no_mask_df', lambda df: self.get_top_product_by_revenue(df, use_mask=True), ['product_df'])
+        g.add('monthly_product_df', self.get_product_data_by_month_from_cube, ['cube_selection'])
+        g.add('monthly_top_product_df', lambda df, dates: self.get_monthly_top_product(df, dates[1].strftime('%Y-%m')), ['monthly_product_df', 'date_range_proper'])
+        g.add('monthly_review_df', self.get_review_by_month_from_cube, ['cube_selection'])
+
+        # Locations and RFM
+        g.add('metrics_by_locations_df', lambda df: self.get_metrics_by_locations(df, approximate=a), ['filtered_df'])
+        g.add('top_states_revenue_df', self.get_top_states_by_revenue, ['metrics_by_locations_df'])
+        g.add('rfm_df', self.get_rfm_analysis, ['filtered_df'])
+
+        # Delivery costs
+        g.add('costs_by_distance_df', self.get_delivery_costs_by_distance, ['filtered_df'])
+        g.add('costs_by_state_pair_df', self.get_delivery_costs_by_state_pair, ['filtered_df'])
+
+        # Lead times
+        g.add('lead_time_summary_df', self.get_lead_time_summary, ['filtered_df'])
+        g.add('lead_times_by_month_df', lambda df: self.get_lead_time_summary(df, 'month'), ['filtered_df'])
+        g.add('lead_times_by_state_df', lambda df: self.get_lead_time_summary(df, 'state'), ['filtered_df'])
+        g.add('lead_times_by_category_df', lambda df: self.get_lead_time_summary(df, 'category'), ['filtered_df'])
+
+        return g
+
+    def precompute(self, sections: list=None) -> dict:
+        # Batch job (e.g. a cron job after the sources are updated): compute the
+        # data of the sections (all by default) for the default filters of the
+        # dashboard, with a shared cache backend the dashboard workers then
+        # start from these results
+        data = self.get_clean_data(compact=self.compact_keys)
+        fact_df = self.get_fact_data(data)
+        fact_index = self.get_fact_index(fact_df)
+        fact_cube = self.get_fact_cube(fact_df, exact=not self.approximate_distinct)
+        options = self.get_filter_options(data)
+
+        ## The same values as the widgets of the dashboard (dates & lists)
+        graph = self.get_data_graph(
+            fact_df, fact_index, fact_cube,
+            options['start_date'].date(), options['end_date'].date(),
+            list(self.default_order_status), [], [], []
+        )
+        sections = sections or list(self.section_dependencies.keys())
+        return graph.compute([_name for _section in sections for _name in self.section_dependencies[_section]])
+
+if __name__ == '__main__':
+    # Precompute the default state of the dashboard into the disk cache:
+    #   python utils/engine.py [cache dir]
+    cache.set_backend(DiskCacheUtils(sys.argv[1] if len(sys.argv) > 1 else None))
+    EngineUtils().precompute()
+    print(cache.get_stats())
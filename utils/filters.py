@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+from utils.timeindex import TimeIndexUtils
+from utils.bitmap import BitmapIndexUtils
+
+class FilterUtils(Constants):
+
+    def get_date_mask(self, timestamps: pd.Series, start_date=None, end_date=None) -> np.ndarray:
+        # Compare the datetime64 values with the day bounds directly, instead of
+        # building a datetime.date object per row (.dt.date)
+        ## Same semantics as .dt.date >= start_date & .dt.date <= end_date,
+        ## i.e. the end date is included until midnight, NaT never matches
+        values = timestamps.to_numpy(dtype='datetime64[ns]')
+        masks = []
+        if start_date:
+            start = pd.Timestamp(start_date).normalize().to_datetime64()
+            masks.append(values >= start)
+        if end_date:
+            end = (pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)).to_datetime64()
+            masks.append(values < end)
+        return self.combine_masks(masks)
+
+    def get_isin_mask(self, values: pd.Series, selection: list, ignore_case: bool=False) -> np.ndarray:
+        # Skip the filter when nothing is selected
+        if selection is None or len(selection) == 0:
+            return None
+        if ignore_case:
+            ## Lowercase the distinct values only (a few thousand cities at most)
+            ## rather than every row, then match the rows on the original values
+            selection = {str(x).lower() for x in selection}
+            uniques = values.dropna().unique()
+            selection = [x for x in uniques if str(x).lower() in selection]
+        return values.isin(selection).to_numpy()
+
+    def combine_masks(self, masks: list) -> np.ndarray:
+        # AND the masks that are set, None means "no filter"
+        masks = [mask for mask in masks if mask is not None]
+        if not masks:
+            return None
+        mask = masks[0]
+        for _mask in masks[1:]:
+            mask = mask & _mask
+        return mask
+
+    def get_filter_mask(self,
+                        df: pd.DataFrame,
+                        start_date=None,
+                        end_date=None,
+                        order_status: list=None,
+                        product_categories: list=None,
+                        cities: list=None,
+                        states: list=None) -> np.ndarray:
+        # Build the mask of the sidebar filters over the fact table
+        return self.combine_masks([
+            self.get_date_mask(df['order_purchase_timestamp'], start_date, end_date),
+            self.get_isin_mask(df['order_status'], order_status),
+            self.get_isin_mask(df['product_category_name_english'], product_categories),
+            self.get_isin_mask(df['geolocation_city'], cities, ignore_case=True),
+            self.get_isin_mask(df['geolocation_state'], states, ignore_case=True)
+        ])
+
+    def filter_data(self,
+                    df: pd.DataFrame,
+                    start_date=None,
+                    end_date=None,
+                    order_status: list=None,
+                    product_categories: list=None,
+                    cities: list=None,
+                    states: list=None,
+                    fact_index: dict=None) -> pd.DataFrame:
+        # Slice the date range first when the table is sorted on the purchase
+        # timestamp (binary search), then mask the other filters on that slice
+        date_slice = TimeIndexUtils().get_date_slice(df['order_purchase_timestamp'], start_date, end_date)
+        if fact_index is None:
+            if date_slice is None:
+                return self.apply_mask(
+                    df,
+                    self.get_filter_mask(df, start_date, end_date, order_status, product_categories, cities, states)
+                )
+            df = df.iloc[date_slice]
+            return self.apply_mask(df, self.get_filter_mask(df, None, None, order_status, product_categories, cities, states))
+
+        # With the bitmap index of the table (BitmapIndexUtils.build_index),
+        # the multiselects are resolved by OR/AND of bitmaps, without any scan
+        b = BitmapIndexUtils()
+        mask = self.combine_masks([
+            b.get_mask(fact_index['order_status'], order_status),
+            b.get_mask(fact_index['product_category_name_english'], product_categories),
+            b.get_mask(fact_index['geolocation_city'], cities, ignore_case=True),
+            b.get_mask(fact_index['geolocation_state'], states, ignore_case=True)
+        ])
+        if date_slice is None:
+            return self.apply_mask(
+                df,
+                self.combine_masks([mask, self.get_date_mask(df['order_purchase_timestamp'], start_date, end_date)])
+            )
+        return self.apply_mask(df.iloc[date_slice], mask[date_slice] if mask is not None else None)
+
+    def apply_mask(self, df: pd.DataFrame, mask: np.ndarray) -> pd.DataFrame:
+        # Without any filter, the data is returned as is (no boolean indexing)
+        if mask is None:
+            return df.reset_index(drop=True)
+        return df[mask].reset_index(drop=True)
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+class FlowUtils(Constants):
+
+    def get_transition_graph(self, order_status_level: list=None) -> dict:
+        # Encode the status transition graph (order_status_level by default)
+        # once, as a sparse adjacency matrix per level: the distinct (from ->
+        # to) edges with their number of occurrences, grouped by level from
+        # the last one (the order of the flow table, then by from & to)
+        edges = pd.DataFrame(order_status_level or self.order_status_level).explode('to', ignore_index=True)
+        statuses = pd.Index(pd.unique(edges[['from', 'to']].to_numpy().ravel()))
+        edges = (
+            edges
+            .groupby(['level', 'from', 'to'], sort=False)
+            .size()
+            .rename('weight')
+            .reset_index()
+            .sort_values(by=['level', 'from', 'to'], ascending=[False, True, True])
+            .reset_index(drop=True)
+        )
+        levels = pd.unique(edges['level'])
+        level_codes = pd.Index(levels).get_indexer(edges['level'])
+        return {
+            'statuses': statuses,
+            'levels': levels,
+            'edges': edges[['level', 'from', 'to']],
+            'weights': edges['weight'].to_numpy().astype('float64'),
+            'from_codes': statuses.get_indexer(edges['from']),
+            'to_codes': statuses.get_indexer(edges['to']),
+            'level_bounds': np.searchsorted(level_codes, np.arange(len(levels) + 1), side='left')
+        }
+
+    def get_flows(self, counts: pd.Series, graph: dict=None) -> pd.DataFrame:
+        # Count of every edge of the graph from the count of every status,
+        # propagated from the last level to the first one: an edge carries the
+        # count of its 'to' status, plus what flows out of that status at the
+        # next level (if it's a 'from' status there)
+        ## One vectorized step per level (a gather & a bincount over its edges)
+        graph = graph or self.get_transition_graph()
+        n_statuses = len(graph['statuses'])
+        status_counts = counts.reindex(graph['statuses'], fill_value=0).to_numpy().astype('float64')
+        from_codes, to_codes, bounds = graph['from_codes'], graph['to_codes'], graph['level_bounds']
+
+        flows = np.zeros(len(from_codes))
+        carried = status_counts
+        for i in range(len(graph['levels'])):
+            start, stop = bounds[i], bounds[i + 1]
+            if i > 0:
+                level_from = np.unique(from_codes[start:stop])
+                carried = outflow
+                carried[level_from] += status_counts[level_from]
+            flows[start:stop] = graph['weights'][start:stop] * carried[to_codes[start:stop]]
+            outflow = np.bincount(from_codes[start:stop], weights=flows[start:stop], minlength=n_statuses)
+
+        flow_df = graph['edges'].copy()
+        flow_df['count'] = np.round(flows).astype('int64')
+        return flow_df
@@ -0,0 +1,86 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+class DataGraphUtils(Constants):
+
+    def __init__(self) -> None:
+        super().__init__()
+        # Nodes of the graph: {name: (function, dependencies)}, the function is
+        # called with the values of its dependencies
+        self.nodes = {}
+        # Values of the nodes computed so far & compute time of every node
+        self.values = {}
+        self.timings = {}
+
+    def add(self, name: str, func, dependencies: list=None) -> None:
+        # Declare a node, nothing is computed until it's needed
+        self.nodes[name] = (func, dependencies or [])
+
+    def get_order(self, names: list) -> list:
+        # The nodes needed by names (themselves & their dependencies), each
+        # one after its dependencies
+        order = []
+        visiting = set()
+        def visit(name: str) -> None:
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f'Cyclic dependency on {name}')
+            visiting.add(name)
+            for _dependency in self.nodes[name][1]:
+                visit(_dependency)
+            visiting.discard(name)
+            order.append(name)
+        for _name in names:
+            visit(_name)
+        return order
+
+    def compute_node(self, name: str) -> None:
+        func, dependencies = self.nodes[name]
+        start = time.perf_counter()
+        self.values[name] = func(*[self.values[_dependency] for _dependency in dependencies])
+        self.timings[name] = time.perf_counter() - start
+
+    def compute(self, names: list, workers: int=None) -> dict:
+        # Values of names, only the nodes that were not computed yet are
+        # (the intermediates shared by several nodes are computed once)
+        ## With workers > 1, the nodes whose dependencies are computed run
+        ## concurrently on a pool of threads (graph_workers by default)
+        order = [_name for _name in self.get_order(names) if _name not in self.values]
+        workers = workers or self.graph_workers or min(4, os.cpu_count() or 1)
+        if workers <= 1 or len(order) <= 1:
+            for _name in order:
+                self.compute_node(_name)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                pending = {}
+                while order or pending:
+                    ready = [
+                        _name for _name in order
+                        if all(_dependency in self.values for _dependency in self.nodes[_name][1])
+                    ]
+                    for _name in ready:
+                        order.remove(_name)
+                        pending[pool.submit(self.compute_node, _name)] = _name
+                    done = wait(pending, return_when=FIRST_COMPLETED)[0]
+                    for _future in done:
+                        del pending[_future]
+                        ## Raise the error of a node here
+                        _future.result()
+        return {_name: self.values[_name] for _name in names}
+
+    def get(self, name: str):
+        return self.compute([name])[name]
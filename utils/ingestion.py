@@ -0,0 +1,108 @@
+import io
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+class IngestionUtils(Constants):
+
+    def get_read_csv_kwargs(self, table_name: str, engine: str=None) -> dict:
+        # Map the final column names back to the (possibly misspelled) source names
+        column_replacement = self.column_replacement.get(table_name, {})
+        source_names = {_new: _old for _old, _new in column_replacement.items()}
+
+        nullable_columns = self.nullable_columns.get(table_name, [])
+        engine = engine or self.csv_engine
+
+        dtype = {}
+        parse_dates = []
+        for _col, _type in self.requirements[table_name].items():
+            source_col = source_names.get(_col, _col)
+            if _type.startswith('datetime64'):
+                parse_dates.append(source_col)
+            elif _type == 'object' and engine == 'pyarrow':
+                # The pyarrow engine infers the 'object' columns (e.g. the zip
+                # code prefixes into integers) unless they are read as strings
+                dtype[source_col] = 'str'
+            elif _type == 'int64' and _col in nullable_columns:
+                # Parse into a nullable integer, it's cast after the imputation
+                dtype[source_col] = 'Int64'
+            else:
+                dtype[source_col] = _type
+
+        return {
+            'usecols': list(dtype.keys()) + parse_dates,
+            'dtype': dtype,
+            'parse_dates': parse_dates,
+            'engine': engine
+        }
+
+    def read_source(self, table_name: str, engine: str=None, start: int=0, stop: int=None) -> pd.DataFrame:
+        # Parse the columns directly into (nearly) their final types, and skip
+        # the columns that are not in the requirements
+        ## start & stop are byte offsets of whole lines (e.g. the rows appended
+        ## since the snapshot), read after the header line
+        kwargs = self.get_read_csv_kwargs(table_name, engine)
+
+        ## The C parser falls back to a slow path when parse_dates is combined
+        ## with dtype, so the timestamps are converted right after the read
+        parse_dates = []
+        if kwargs['engine'] == 'c':
+            parse_dates = kwargs.pop('parse_dates')
+
+        source = self.source[table_name]
+        if start or stop is not None:
+            with open(source, 'rb') as f:
+                header = f.readline()
+                f.seek(max(start, len(header)))
+                source = io.BytesIO(header + f.read(-1 if stop is None else stop - f.tell()))
+
+        df = pd.read_csv(source, **kwargs)
+        for _col in parse_dates:
+            df[_col] = pd.to_datetime(df[_col], format='ISO8601')
+
+        df = df.rename(columns=self.column_replacement.get(table_name, {}))
+        return df[list(self.requirements[table_name].keys())]
+
+    def read_source_chunks(self, table_name: str, chunk_rows: int, columns: list=None):
+        # Same as read_source, chunk_rows rows at a time (the C parser, the
+        # pyarrow engine can't read by chunks), only the columns if set
+        kwargs = self.get_read_csv_kwargs(table_name, engine='c')
+        parse_dates = kwargs.pop('parse_dates')
+        columns = columns or list(self.requirements[table_name].keys())
+
+        ## Only parse the source columns of the columns
+        column_replacement = self.column_replacement.get(table_name, {})
+        source_names = {_new: _old for _old, _new in column_replacement.items()}
+        source_columns = [source_names.get(_col, _col) for _col in columns]
+        kwargs['usecols'] = source_columns
+        kwargs['dtype'] = {_col: _type for _col, _type in kwargs['dtype'].items() if _col in source_columns}
+        parse_dates = [_col for _col in parse_dates if _col in source_columns]
+
+        with pd.read_csv(self.source[table_name], chunksize=chunk_rows, **kwargs) as reader:
+            for chunk in reader:
+                for _col in parse_dates:
+                    chunk[_col] = pd.to_datetime(chunk[_col], format='ISO8601')
+                yield chunk.rename(columns=column_replacement)[columns]
+
+    def match_data_types(self, df: pd.DataFrame, table_name: str, skip_columns: list=None) -> pd.DataFrame:
+        # Only cast the columns whose type doesn't match the requirements yet
+        # (skip_columns are e.g. the keys encoded by the compact mode)
+        skip_columns = skip_columns or []
+        mismatch_columns = {
+            _col: _type for _col, _type in self.requirements[table_name].items()
+            if str(df[_col].dtype) != _type and _col not in skip_columns
+        }
+        if mismatch_columns:
+            df = df.astype(mismatch_columns)
+        return df
@@ -0,0 +1,73 @@
+import json
+from importlib.metadata import version
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+class NormalizationUtils(Constants):
+
+    def __init__(self, path: str=None) -> None:
+        super().__init__()
+        # Dictionary of the normalized names {name: unidecode(name)}, shared by
+        # the city columns and kept across restarts (next to the snapshot)
+        self.path = path or os.path.join(self.snapshot_dir, 'city_names.json')
+
+    def load_names(self) -> dict:
+        # The saved dictionary, empty if it's missing, unreadable or from
+        # another version of unidecode
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(saved, dict) or saved.get('unidecode') != version('unidecode'):
+            return {}
+        return saved.get('names', {})
+
+    def save_names(self, names: dict):
+        # Atomic write, another process may read it
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(temp_path, 'w') as f:
+                json.dump({'unidecode': version('unidecode'), 'names': names}, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+    def normalize(self, values: pd.Series, names: dict) -> pd.Series:
+        # Same as values.apply(unidecode), but unidecode only runs once per
+        # distinct value missing from names (which gets it): the values are
+        # factorized, their uniques normalized and taken back by their codes
+        codes, uniques = pd.factorize(values)
+        for _name in uniques:
+            if _name not in names:
+                names[_name] = unidecode(_name)
+        normalized = np.array([names[_name] for _name in uniques] + [np.nan], dtype='object')
+        ## The missing values (code -1) take the last item, NaN
+        return pd.Series(normalized.take(codes), index=values.index, name=values.name)
+
+    def normalize_cities(self, data: dict) -> dict:
+        # Normalize the city names of every table of city_columns with the
+        # saved dictionary, and save it if new names were normalized
+        names = self.load_names()
+        count = len(names)
+        for table_, _col in self.city_columns.items():
+            if table_ in data:
+                data[table_][_col] = self.normalize(data[table_][_col], names)
+        if len(names) > count:
+            self.save_names(names)
+        return data
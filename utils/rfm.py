@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+class RfmUtils(Constants):
+
+    def get_days(self, timestamps: pd.Series) -> np.ndarray:
+        # Day number (int64 days since the epoch) of every timestamp, NaT is -1
+        days = timestamps.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+        return np.where(np.isnat(days), -1, days.astype('int64'))
+
+    def get_min_ranks(self, values: np.ndarray) -> np.ndarray:
+        # Number of values lower than every value (the 'min' rank from 0), by
+        # counting for small-range integers, else with one stable argsort
+        if values.dtype.kind in 'iu' and len(values) and values.max() - values.min() <= 4 * len(values):
+            offsets = values.astype('int64') - values.min()
+            counts = np.bincount(offsets)
+            return (np.cumsum(counts) - counts)[offsets]
+        order = np.argsort(values, kind='stable')
+        sorted_values = values[order]
+        first = np.empty(len(values), dtype=bool)
+        first[:1] = True
+        first[1:] = sorted_values[1:] != sorted_values[:-1]
+        positions = np.flatnonzero(first)
+        ranks = np.empty(len(values), dtype='int64')
+        ranks[order] = np.repeat(positions, np.diff(np.append(positions, len(values))))
+        return ranks
+
+    def get_scores(self, values: np.ndarray, higher_is_better: bool=True) -> np.ndarray:
+        # Quintile score (1 to 5) of every value: 1 + 5 * (share of the values
+        # that are worse), so that equal values always get the same score
+        values = values if higher_is_better else -values
+        worse = self.get_min_ranks(values)
+        return (1 + (5 * worse) // max(len(values), 1)).astype('int8')
+
+    def get_codes(self, values: pd.Series, sort: bool=False) -> tuple:
+        # pd.factorize(values, sort): small-range integers (e.g. the keys of the
+        # compact mode) are coded by counting, strings are dictionary-encoded &
+        # sorted by Arrow (much faster than hashing & sorting Python objects)
+        array = values.to_numpy()
+        if array.dtype.kind in 'iu' and len(array) and array.max() - array.min() <= 4 * len(array):
+            offsets = array.astype('int64') - array.min()
+            present = np.bincount(offsets) > 0
+            uniques = (np.flatnonzero(present) + array.min()).astype(array.dtype)
+            return (np.cumsum(present) - 1)[offsets], uniques
+        if array.dtype != object:
+            return pd.factorize(array, sort=sort)
+        try:
+            encoded = pc.dictionary_encode(pa.array(array, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            ## Mixed types: like pandas
+            return pd.factorize(array, sort=sort)
+        codes = encoded.indices.fill_null(-1).to_numpy().astype('int64')
+        uniques = encoded.dictionary
+        if sort:
+            order = pc.sort_indices(uniques).to_numpy()
+            ranks = np.empty(len(order), dtype='int64')
+            ranks[order] = np.arange(len(order))
+            codes = np.where(codes >= 0, ranks[codes], -1)
+            uniques = uniques.take(order)
+        return codes, uniques.to_numpy(zero_copy_only=False)
+
+    def get_segments(self, r_scores: np.ndarray, f_scores: np.ndarray) -> pd.Categorical:
+        # Segment of every customer from its recency & frequency scores (see
+        # rfm_segments), looked up in a 5x5 grid
+        segments = list(self.rfm_segments.keys())
+        grid = np.full((6, 6), -1, dtype='int8')
+        for code, segment_ in enumerate(segments):
+            for _scores in self.rfm_segments[segment_]:
+                grid[int(_scores[0]), int(_scores[1])] = code
+        return pd.Categorical.from_codes(grid[r_scores, f_scores], categories=segments)
+
+    def get_rfm_state(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Frequency (distinct orders), monetary (sum of the prices) and last
+        # purchase day of every customer_unique_id, sorted by customer_unique_id
+        ## The states of disjoint sets of customers are concatenated as is
+        codes, customers = self.get_codes(df['customer_unique_id'], sort=True)
+        valid = codes >= 0
+        codes = codes[valid]
+        n_customers = len(customers)
+
+        ## Last purchase day, by a max into the customers (NaT is skipped)
+        days = self.get_days(df['order_purchase_timestamp'])[valid]
+        last_days = np.full(n_customers, -1, dtype='int64')
+        np.maximum.at(last_days, codes, days)
+
+        ## Distinct orders: count the distinct (customer, order) pairs, sorted
+        order_codes = self.get_codes(df['order_id'])[0][valid]
+        has_order = order_codes >= 0
+        n_orders = int(order_codes.max()) + 1 if has_order.any() else 1
+        pairs = np.sort(codes[has_order].astype('int64') * n_orders + order_codes[has_order])
+        pairs = pairs[np.append(True, pairs[1:] != pairs[:-1])] if len(pairs) else pairs
+        frequency = np.bincount(pairs // n_orders, minlength=n_customers)
+
+        return pd.DataFrame({
+            'customer_id': customers,
+            'frequency': frequency.astype('int64'),
+            'monetary': np.bincount(codes, weights=df['price'].fillna(0).to_numpy()[valid], minlength=n_customers),
+            'last_day': last_days
+        })
+
+    def get_rfm_scores(self, state_df: pd.DataFrame) -> pd.DataFrame:
+        # Recency (days since the last purchase, counted from the day after the
+        # last purchase of all customers) of the state, with the quintile scores
+        # and the segment
+        last_days = state_df['last_day'].to_numpy()
+        recent_day = last_days.max() + 1 if len(last_days) else 0
+        rfm_df = state_df.drop(columns='last_day')
+        rfm_df['recency'] = recent_day - last_days
+        rfm_df['r_score'] = self.get_scores(rfm_df['recency'].to_numpy(), higher_is_better=False)
+        rfm_df['f_score'] = self.get_scores(rfm_df['frequency'].to_numpy())
+        rfm_df['m_score'] = self.get_scores(rfm_df['monetary'].to_numpy())
+        rfm_df['segment'] = self.get_segments(rfm_df['r_score'].to_numpy(), rfm_df['f_score'].to_numpy())
+        return rfm_df
+
+    def get_rfm(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Recency, frequency and monetary of every customer_unique_id, with
+        # their quintile scores and segment, sorted by customer_unique_id
+        return self.get_rfm_scores(self.get_rfm_state(df))
+
+    def get_top(self, df: pd.DataFrame, by: str, k: int=5, ascending: bool=False) -> pd.DataFrame:
+        # df.sort_values(by, kind='stable').head(k) without sorting every row:
+        # argpartition finds the k-th value, only the rows up to it are sorted
+        if k <= 0:
+            return df.iloc[:0]
+        keys = df[by].to_numpy()
+        keys = keys if ascending else -keys
+        if len(keys) > k:
+            threshold = keys[np.argpartition(keys, k - 1)[:k]].max()
+            candidates = np.flatnonzero(keys <= threshold)
+        else:
+            candidates = np.arange(len(keys))
+        top = candidates[np.argsort(keys[candidates], kind='stable')][:k]
+        return df.iloc[top]
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+class SketchUtils(Constants):
+
+    def get_precision(self, error: float=None) -> int:
+        # Number of index bits p of the HyperLogLog registers (m = 2^p), the
+        # relative standard error of the estimates is 1.04 / sqrt(m)
+        error = error or self.distinct_error
+        return int(min(18, max(4, np.ceil(np.log2((1.04 / error) ** 2)))))
+
+    def get_hashes(self, values) -> tuple:
+        # 64-bit hashes of the values, and the mask of the non-missing ones
+        ## Integers (e.g. the keys of the compact mode) are mixed directly by
+        ## splitmix64, other values are first hashed with the builtin hash
+        ## (cached by the str objects, but salted per process: the sketches
+        ## are mergeable within a process, they're not meant to be persisted)
+        values = np.asarray(values)
+        if values.dtype.kind in 'iub':
+            valid = np.ones(len(values), dtype=bool)
+            hashes = values.astype('int64').view('uint64')
+        elif values.dtype.kind == 'f':
+            valid = ~np.isnan(values)
+            hashes = values[valid].astype('float64').view('uint64')
+        else:
+            valid = pd.notna(values)
+            hashes = np.fromiter(map(hash, values[valid]), dtype='int64', count=int(valid.sum())).view('uint64')
+
+        hashes = hashes + np.uint64(0x9E3779B97F4A7C15)
+        hashes = (hashes ^ (hashes >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        hashes = (hashes ^ (hashes >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        hashes = hashes ^ (hashes >> np.uint64(31))
+        return hashes, valid
+
+    def get_registers(self, group_ids: np.ndarray, values, precision: int) -> pd.Series:
+        # HyperLogLog registers of every group, kept sparse (only the registers
+        # that are set): the max rank per key = group_id * m + register index
+        ## Missing values (and group ids < 0, e.g. a missing groupby key) are skipped
+        valid = group_ids >= 0
+        hashes, valid_values = self.get_hashes(np.asarray(values)[valid])
+        group_ids = group_ids[valid][valid_values]
+
+        index = (hashes & np.uint64((1 << precision) - 1)).astype('int64')
+        ## Rank = position of the lowest set bit of the remaining bits (the
+        ## lowest set bit is a power of two, exact as a float)
+        remaining = hashes >> np.uint64(precision)
+        lowest_bit = remaining & (~remaining + np.uint64(1))
+        with np.errstate(divide='ignore'):
+            rank = np.where(
+                remaining == 0,
+                64 - precision + 1,
+                np.log2(lowest_bit.astype('float64')) + 1
+            ).astype('uint8')
+
+        keys = group_ids.astype('int64') * (1 << precision) + index
+        n_registers = (int(group_ids.max()) + 1 if len(group_ids) else 0) << precision
+        return self.max_registers(keys, rank, n_registers)
+
+    def max_registers(self, keys: np.ndarray, ranks: np.ndarray, n_registers: int) -> pd.Series:
+        # Sparse registers (sorted keys < n_registers) of the max rank per key
+        if n_registers <= self.dense_registers:
+            ## Few groups: max into a dense array of registers, then sparsify
+            registers = np.zeros(n_registers, dtype='uint8')
+            np.maximum.at(registers, keys, ranks)
+            keys = np.flatnonzero(registers)
+            return pd.Series(registers[keys], index=keys)
+        return pd.Series(ranks).groupby(keys).max()
+
+    def merge_registers(self, registers: list) -> pd.Series:
+        # Union of sketches (same precision & group ids): the max of each register
+        return pd.concat(registers).groupby(level=0).max()
+
+    def get_estimates(self, registers: pd.Series, n_groups: int, precision: int) -> np.ndarray:
+        # Distinct count estimate of every group, with the linear counting
+        # correction for the small cardinalities (no large range correction
+        # is needed with 64-bit hashes)
+        m = 1 << precision
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        groups = registers.index.to_numpy() // m
+        zeros = m - np.bincount(groups, minlength=n_groups)[:n_groups]
+        harmonic_sum = zeros + np.bincount(
+            groups,
+            weights=np.power(2.0, -registers.to_numpy().astype('float64')),
+            minlength=n_groups
+        )[:n_groups]
+
+        estimates = alpha * m * m / harmonic_sum
+        small = (estimates <= 2.5 * m) & (zeros > 0)
+        estimates[small] = m * np.log(m / zeros[small])
+        return estimates
+
+    def count_distinct(self, group_ids: np.ndarray, values, n_groups: int, error: float=None) -> np.ndarray:
+        # Approximate number of distinct values of every group (0..n_groups-1)
+        precision = self.get_precision(error)
+        registers = self.get_registers(group_ids, values, precision)
+        return np.round(self.get_estimates(registers, n_groups, precision)).astype('int64')
+
+    def agg(self, df: pd.DataFrame, by, agg: dict, approximate: bool=False, error: float=None) -> pd.DataFrame:
+        # df.groupby(by).agg(agg), where the 'nunique' are HyperLogLog estimates
+        # in the approximate mode (exact mode by default)
+        grouped = df.groupby(by, observed=True)
+        if not approximate:
+            return grouped.agg(agg)
+
+        other_agg = {_col: _func for _col, _func in agg.items() if _func != 'nunique'}
+        if other_agg:
+            result = grouped.agg(other_agg)
+        else:
+            result = grouped.size().to_frame()[[]]
+        group_ids = grouped.ngroup().fillna(-1).to_numpy().astype('int64')
+        for _col, _func in agg.items():
+            if _func == 'nunique':
+                result[_col] = self.count_distinct(group_ids, df[_col], len(result), error)
+        return result[list(agg.keys())]
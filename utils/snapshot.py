@@ -0,0 +1,282 @@
+import hashlib
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+from utils.ingestion import IngestionUtils
+from utils.encoding import EncodingUtils
+from utils.cleaning import CleaningUtils
+
+class SnapshotUtils(Constants):
+
+    def get_file_hash(self, path: str) -> str:
+        # Hash the file content in chunks to keep the memory usage flat
+        file_hash = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    def get_prefix_hashes(self, path: str, prefix_size: int, size: int) -> dict:
+        # Hash the first prefix_size bytes and the first size bytes of the file
+        # in one pass, with the last byte of both (to check for whole lines)
+        prefix_hash = hashlib.sha256()
+        file_hash = hashlib.sha256()
+        hashes = {'prefix_end': b'', 'end': b''}
+        position = 0
+        with open(path, 'rb') as f:
+            while position < size:
+                ## The chunks stop at prefix_size to hash the prefix on the way
+                limit = prefix_size if position < prefix_size else size
+                chunk = f.read(min(1 << 20, limit - position))
+                if not chunk:
+                    raise OSError(f'{path} is shorter than {size} bytes')
+                if position < prefix_size:
+                    prefix_hash.update(chunk)
+                file_hash.update(chunk)
+                position += len(chunk)
+                hashes['end'] = chunk[-1:]
+                if position == prefix_size:
+                    hashes['prefix_end'] = hashes['end']
+        hashes['prefix'] = prefix_hash.hexdigest()
+        hashes['sha256'] = file_hash.hexdigest()
+        return hashes
+
+    def get_manifest(self) -> dict:
+        # Read the manifest of the current snapshot (empty if there is none)
+        manifest_path = os.path.join(self.snapshot_dir, 'manifest.json')
+        try:
+            with open(manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get_source_fingerprint(self, manifest: dict=None) -> dict:
+        # Fingerprint every source file by size & mtime, and only hash the
+        # content when those differ from the manifest (e.g. a touched file)
+        manifest = manifest or {}
+        fingerprint = {}
+        for source_, path in self.source.items():
+            stat = os.stat(path)
+            previous = manifest.get('sources', {}).get(source_, {})
+            fingerprint[source_] = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns
+            }
+            if (
+                previous.get('size') == stat.st_size
+                and previous.get('mtime_ns') == stat.st_mtime_ns
+            ):
+                fingerprint[source_]['sha256'] = previous.get('sha256')
+            else:
+                fingerprint[source_]['sha256'] = self.get_file_hash(path)
+        return fingerprint
+
+    def get_source_version(self) -> str:
+        # Cheap version of the cleaned data: the cleaning logic version and the
+        # size & mtime of every source file (no content hash)
+        version = [self.cleaning_version]
+        for source_, path in self.source.items():
+            try:
+                stat = os.stat(path)
+                version.append((source_, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                version.append((source_, None, None))
+        return repr(version)
+
+    def is_snapshot_valid(self) -> bool:
+        # A snapshot is valid if it was written by the same cleaning logic
+        # from source files with the same content
+        manifest = self.get_manifest()
+        if manifest.get('cleaning_version') != self.cleaning_version:
+            return False
+        try:
+            ## A source with another size has changed, no need to hash it
+            for source_, path in self.source.items():
+                if os.stat(path).st_size != manifest.get('sources', {}).get(source_, {}).get('size'):
+                    return False
+            fingerprint = self.get_source_fingerprint(manifest)
+        except OSError:
+            return False
+        for source_, current in fingerprint.items():
+            previous = manifest.get('sources', {}).get(source_, {})
+            if previous.get('sha256') != current['sha256']:
+                return False
+        for table_ in self.requirements.keys():
+            if not os.path.exists(os.path.join(self.snapshot_dir, f'{table_}.arrow')):
+                return False
+        return True
+
+    def get_appended_sources(self, manifest: dict=None) -> dict:
+        # Rows appended to the sources since the snapshot: the start & stop
+        # bytes of the new rows of every grown source ('offsets') and the new
+        # fingerprint of the sources ('sources'), or None if the snapshot has
+        # to be rebuilt instead: the cleaning logic changed, a source that is
+        # not in append_only_sources changed, the previous content of a source
+        # is not a prefix of the new one (ending with a line break), or it grew
+        # by more than incremental_max_growth since the last full cleaning
+        manifest = manifest or self.get_manifest()
+        cleaning_stats = manifest.get('cleaning_stats')
+        if manifest.get('cleaning_version') != self.cleaning_version or not cleaning_stats:
+            return None
+        for table_ in self.requirements.keys():
+            if not os.path.exists(os.path.join(self.snapshot_dir, f'{table_}.arrow')):
+                return None
+
+        offsets = {}
+        fingerprint = {}
+        try:
+            for source_, path in self.source.items():
+                stat = os.stat(path)
+                previous = manifest['sources'][source_]
+                fingerprint[source_] = {
+                    'size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'sha256': previous['sha256']
+                }
+                if previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+                    continue
+                if stat.st_size < previous['size']:
+                    return None
+
+                ## Only the bytes up to the size above are hashed & read, the
+                ## rows appended in the meantime are left to the next update
+                hashes = self.get_prefix_hashes(path, previous['size'], stat.st_size)
+                fingerprint[source_]['sha256'] = hashes['sha256']
+                if hashes['prefix'] != previous['sha256']:
+                    return None
+                if stat.st_size == previous['size']:
+                    continue
+                if (
+                    source_ not in self.append_only_sources
+                    or hashes['prefix_end'] != b'\n'
+                    or hashes['end'] != b'\n'
+                ):
+                    return None
+                base_size = cleaning_stats['base_sizes'][source_]
+                if stat.st_size - base_size > self.incremental_max_growth * base_size:
+                    return None
+                offsets[source_] = (previous['size'], stat.st_size)
+        except (OSError, KeyError):
+            return None
+
+        if not offsets:
+            return None
+        return {'offsets': offsets, 'sources': fingerprint}
+
+    def load_snapshot(self, compact: bool=False) -> dict:
+        # Memory-map the Arrow IPC files
+        tables = {
+            table_: feather.read_table(
+                os.path.join(self.snapshot_dir, f'{table_}.arrow'),
+                memory_map=True
+            )
+            for table_ in self.requirements.keys()
+        }
+
+        # Convert them into pandas DataFrames, with the keys encoded straight
+        # from the Arrow columns in the compact mode
+        e = EncodingUtils()
+        if compact:
+            data = e.encode_keys(tables)
+        else:
+            data = {table_: table.to_pandas() for table_, table in tables.items()}
+
+        # Arrow may infer other types for some columns (e.g. the 'object'
+        # columns without any value), so cast back the columns that drifted
+        i = IngestionUtils()
+        for table_ in self.requirements.keys():
+            data[table_] = i.match_data_types(
+                data[table_],
+                table_,
+                skip_columns=e.get_key_columns(table_) if compact else None
+            )
+        return data
+
+    def write_table(self, table_: str, table: pa.Table):
+        # Write the table into a temporary file and rename it, so that
+        # concurrent workers never read a half-written table
+        path = os.path.join(self.snapshot_dir, f'{table_}.arrow')
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        feather.write_feather(table, temp_path, compression='uncompressed')
+        os.replace(temp_path, path)
+
+    def write_manifest(self, manifest: dict):
+        # The manifest is written last, it marks the snapshot as complete
+        manifest_path = os.path.join(self.snapshot_dir, 'manifest.json')
+        temp_path = f'{manifest_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, manifest_path)
+
+    def remove_manifest(self):
+        # Invalidate the current snapshot before writing its tables
+        manifest_path = os.path.join(self.snapshot_dir, 'manifest.json')
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+    def save_snapshot(self, data: dict, cleaning_stats: dict=None):
+        # cleaning_stats are the statistics of the imputations (e.g. the IQR
+        # bounds of the review scores), reused to clean the appended rows
+        sources = self.get_source_fingerprint(self.get_manifest())
+        manifest = {
+            'cleaning_version': self.cleaning_version,
+            'pandas_version': pd.__version__,
+            'sources': sources
+        }
+        if cleaning_stats:
+            manifest['cleaning_stats'] = {
+                **cleaning_stats,
+                'base_sizes': {_source: _fingerprint['size'] for _source, _fingerprint in sources.items()}
+            }
+
+        # Invalidate the current snapshot first, then write every table, so
+        # that concurrent workers never read a half-written snapshot
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        self.remove_manifest()
+        for table_ in self.requirements.keys():
+            self.write_table(table_, pa.Table.from_pandas(data[table_], preserve_index=False))
+        self.write_manifest(manifest)
+
+    def append_snapshot(self, appended: dict):
+        # Parse & clean only the appended rows (see get_appended_sources), with
+        # the imputation statistics of the last full cleaning, and append them
+        # to the snapshot tables
+        manifest = self.get_manifest()
+        i = IngestionUtils()
+        cl = CleaningUtils()
+        tables = {}
+        for source_, (start, stop) in appended['offsets'].items():
+            delta = cl.clean_delta(
+                source_,
+                i.read_source(source_, start=start, stop=stop),
+                manifest['cleaning_stats']
+            )
+            table = feather.read_table(os.path.join(self.snapshot_dir, f'{source_}.arrow'), memory_map=True)
+            ## The all-missing columns are null in Arrow, promoted by the values
+            tables[source_] = pa.concat_tables(
+                [table, pa.Table.from_pandas(delta, preserve_index=False)],
+                promote_options='default'
+            )
+
+        self.remove_manifest()
+        for table_, table in tables.items():
+            self.write_table(table_, table)
+        self.write_manifest({
+            **manifest,
+            'pandas_version': pd.__version__,
+            'sources': appended['sources']
+        })
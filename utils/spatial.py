@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+# Mean radius of the Earth (km)
+EARTH_RADIUS = 6371.0088
+
+class SpatialIndexUtils(Constants):
+
+    def get_haversine_distance(self, lat_1, lng_1, lat_2, lng_2) -> np.ndarray:
+        # Great-circle distance (km) between the points (degrees, arrays or
+        # scalars broadcast together), NaN if a point is missing
+        lat_1, lng_1, lat_2, lng_2 = (np.radians(np.asarray(_values, dtype='float64')) for _values in (lat_1, lng_1, lat_2, lng_2))
+        a = (
+            np.sin((lat_2 - lat_1) / 2) ** 2
+            + np.cos(lat_1) * np.cos(lat_2) * np.sin((lng_2 - lng_1) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+    def get_zip_centroids(self, geolocations_df: pd.DataFrame) -> pd.DataFrame:
+        # One row per zip code prefix: the city & state of its first row, and
+        # the median latitude & longitude of all of its points (robust to the
+        # misplaced points of the dataset), in the order of the first rows (a
+        # row without prefix is kept, without location)
+        centroids = (
+            geolocations_df
+            .groupby('geolocation_zip_code_prefix', sort=False)
+            [['geolocation_lat', 'geolocation_lng']]
+            .median()
+        )
+        return (
+            geolocations_df
+            .drop_duplicates(subset='geolocation_zip_code_prefix', ignore_index=True)
+            .drop(columns=['geolocation_lat', 'geolocation_lng'])
+            .join(centroids, on='geolocation_zip_code_prefix')
+            [geolocations_df.columns]
+        )
+
+    def get_zip_positions(self, zip_prefixes: pd.Series) -> np.ndarray:
+        # Position of the zip code prefixes in the dense lookup: the integer
+        # value of the prefix ('01037' -> 1037), or its code in the compact mode
+        # (already integers), -1 if it's missing or not a number
+        if pd.api.types.is_integer_dtype(zip_prefixes.dtype):
+            return zip_prefixes.to_numpy(dtype='int64')
+        ## Parsing the strings is the slow part: only the distinct ones are
+        ## parsed, then taken back by their codes
+        codes, uniques = pd.factorize(zip_prefixes)
+        positions = pd.to_numeric(pd.Series(uniques, dtype='object'), errors='coerce').to_numpy(dtype='float64')
+        positions[(positions < 0) | (positions != np.floor(positions))] = np.nan
+        ## The missing values (code -1) take the last item, -1
+        return np.append(np.nan_to_num(positions, nan=-1).astype('int64'), -1)[codes]
+
+    def build_zip_lookup(self, geolocations_df: pd.DataFrame) -> dict:
+        # Dense arrays indexed by the position of the zip code prefix (at most
+        # 100,000 entries, at least 1): its latitude & longitude (NaN if
+        # unknown), and the codes of its city & state in cities & states (-1 if
+        # unknown), so that locating any number of rows is an array gather
+        # instead of a merge
+        positions = self.get_zip_positions(geolocations_df['geolocation_zip_code_prefix'])
+        valid = positions >= 0
+        positions = positions[valid]
+        size = int(positions.max()) + 1 if len(positions) else 1
+        city_codes, cities = pd.factorize(geolocations_df['geolocation_city'])
+        state_codes, states = pd.factorize(geolocations_df['geolocation_state'])
+
+        lookup = {
+            'lat': np.full(size, np.nan),
+            'lng': np.full(size, np.nan),
+            'city_codes': np.full(size, -1, dtype='int32'),
+            'state_codes': np.full(size, -1, dtype='int32'),
+            'cities': np.asarray(cities, dtype='object'),
+            'states': np.asarray(states, dtype='object')
+        }
+        lookup['lat'][positions] = geolocations_df['geolocation_lat'].to_numpy(dtype='float64')[valid]
+        lookup['lng'][positions] = geolocations_df['geolocation_lng'].to_numpy(dtype='float64')[valid]
+        lookup['city_codes'][positions] = city_codes[valid]
+        lookup['state_codes'][positions] = state_codes[valid]
+        return lookup
+
+    def get_lookup_positions(self, lookup: dict, zip_prefixes: pd.Series) -> np.ndarray:
+        # Positions of the zip code prefixes in the lookup, -1 if not in it
+        positions = self.get_zip_positions(zip_prefixes)
+        positions[positions >= len(lookup['lat'])] = -1
+        return positions
+
+    def get_zip_locations(self, lookup: dict, zip_prefixes: pd.Series) -> pd.DataFrame:
+        # Geolocation columns of the zip code prefixes (like a left merge on
+        # geolocation_zip_code_prefix, with the index of zip_prefixes)
+        positions = self.get_lookup_positions(lookup, zip_prefixes)
+        found = positions >= 0
+        positions = np.where(found, positions, 0)
+
+        ## The missing codes (-1) take the last item, NaN
+        city_codes = np.where(found, lookup['city_codes'][positions], -1)
+        state_codes = np.where(found, lookup['state_codes'][positions], -1)
+        return pd.DataFrame({
+            'geolocation_lat': np.where(found, lookup['lat'][positions], np.nan),
+            'geolocation_lng': np.where(found, lookup['lng'][positions], np.nan),
+            'geolocation_city': np.append(lookup['cities'], np.nan).astype('object')[city_codes],
+            'geolocation_state': np.append(lookup['states'], np.nan).astype('object')[state_codes]
+        }, index=zip_prefixes.index)
+
+    def get_cells(self, lat: np.ndarray, lng: np.ndarray, cell_size: float) -> tuple:
+        # (row, column) of the grid cells of the points
+        return (
+            np.floor((np.asarray(lat) + 90) / cell_size).astype('int64'),
+            np.floor((np.asarray(lng) + 180) / cell_size).astype('int64')
+        )
+
+    def build_grid(self, lat: np.ndarray, lng: np.ndarray, cell_size: float=None) -> dict:
+        # Grid index of the points (e.g. the zips of a lookup, the sellers):
+        # the ids of the points (positions in lat & lng) sorted by their cell
+        # of cell_size degrees, and the sorted keys & offsets of the non-empty
+        # cells, so that the points of any cell are a binary search away
+        cell_size = cell_size or self.grid_cell_size
+        lat = np.asarray(lat, dtype='float64')
+        lng = np.asarray(lng, dtype='float64')
+        ids = np.flatnonzero(~(np.isnan(lat) | np.isnan(lng)))
+        rows, cols = self.get_cells(lat[ids], lng[ids], cell_size)
+        keys = rows * (1 << 20) + cols
+        order = np.argsort(keys, kind='stable')
+        cells, offsets = np.unique(keys[order], return_index=True)
+        return {
+            'cell_size': cell_size,
+            'ids': ids[order],
+            'lat': lat[ids[order]],
+            'lng': lng[ids[order]],
+            'cells': cells,
+            'offsets': np.append(offsets, len(order)),
+            'rows': (int(rows.min()), int(rows.max())) if len(ids) else (0, -1),
+            'cols': (int(cols.min()), int(cols.max())) if len(ids) else (0, -1)
+        }
+
+    def get_cell_points(self, grid: dict, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        # Positions (in the grid arrays) of the points of the cells
+        keys = np.asarray(rows, dtype='int64') * (1 << 20) + np.asarray(cols, dtype='int64')
+        if not len(grid['cells']):
+            return np.array([], dtype='int64')
+        found = np.searchsorted(grid['cells'], keys)
+        found = found[(found < len(grid['cells'])) & (grid['cells'][np.minimum(found, len(grid['cells']) - 1)] == keys)]
+        if not len(found):
+            return np.array([], dtype='int64')
+        starts = grid['offsets'][found]
+        lengths = grid['offsets'][found + 1] - starts
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+    def get_radius_span(self, lat: float, radius: float) -> tuple:
+        # Half height & half width (degrees) of a box around a point at lat
+        # that holds its radius (km)
+        lat_span = np.degrees(radius / EARTH_RADIUS)
+        lng_span = min(180.0, lat_span / max(np.cos(np.radians(min(89.9, abs(lat) + lat_span))), 1e-6))
+        return lat_span, lng_span
+
+    def get_within_radius(self, grid: dict, lat: float, lng: float, radius: float) -> tuple:
+        # (ids, distances in km) of the points within radius km of (lat, lng),
+        # by distance: only the cells of the bounding box are scanned
+        cell_size = grid['cell_size']
+        lat_span, lng_span = self.get_radius_span(lat, radius)
+        (row_min, col_min), (row_max, col_max) = (
+            [int(_cell) for _cell in self.get_cells(lat - lat_span, lng - lng_span, cell_size)],
+            [int(_cell) for _cell in self.get_cells(lat + lat_span, lng + lng_span, cell_size)]
+        )
+        rows, cols = np.meshgrid(np.arange(row_min, row_max + 1), np.arange(col_min, col_max + 1), indexing='ij')
+        points = self.get_cell_points(grid, rows.ravel(), cols.ravel())
+        distances = self.get_haversine_distance(lat, lng, grid['lat'][points], grid['lng'][points])
+        within = distances <= radius
+        order = np.argsort(distances[within], kind='stable')
+        return grid['ids'][points[within][order]], distances[within][order]
+
+    def get_nearest(self, grid: dict, lat: float, lng: float, k: int=1) -> tuple:
+        # (ids, distances in km) of the k points nearest to (lat, lng): the
+        # rings of cells around its cell are scanned until no point of the next
+        # ring can be nearer than the k-th nearest found
+        cell_size = grid['cell_size']
+        row, col = [int(_cell) for _cell in self.get_cells(lat, lng, cell_size)]
+        max_ring = max(
+            abs(row - grid['rows'][0]), abs(row - grid['rows'][1]),
+            abs(col - grid['cols'][0]), abs(col - grid['cols'][1])
+        )
+        points = np.array([], dtype='int64')
+        for ring in range(max_ring + 1):
+            ## The cells at a Chebyshev distance of ring cells
+            offsets = np.arange(-ring, ring + 1)
+            if ring:
+                rows = np.concatenate([np.full(len(offsets), -ring), np.full(len(offsets), ring), offsets[1:-1], offsets[1:-1]])
+                cols = np.concatenate([offsets, offsets, np.full(len(offsets) - 2, -ring), np.full(len(offsets) - 2, ring)])
+            else:
+                rows, cols = np.zeros(1, dtype='int64'), np.zeros(1, dtype='int64')
+            points = np.concatenate([points, self.get_cell_points(grid, row + rows, col + cols)])
+            if len(points) >= k:
+                distances = self.get_haversine_distance(lat, lng, grid['lat'][points], grid['lng'][points])
+                ## Lower bound of the distance to the points beyond this ring
+                width = np.cos(np.radians(min(89.9, abs(lat) + (ring + 1) * cell_size)))
+                bound = ring * cell_size * np.radians(1) * EARTH_RADIUS * min(1.0, width)
+                if np.partition(distances, k - 1)[k - 1] <= bound:
+                    break
+        distances = self.get_haversine_distance(lat, lng, grid['lat'][points], grid['lng'][points])
+        order = np.argsort(distances, kind='stable')[:k]
+        return grid['ids'][points[order]], distances[order]
@@ -0,0 +1,377 @@
+import json
+import math
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+from utils.ingestion import IngestionUtils
+from utils.cleaning import CleaningUtils
+from utils.normalization import NormalizationUtils
+from utils.spatial import SpatialIndexUtils
+from utils.snapshot import SnapshotUtils
+from utils.filters import FilterUtils
+from utils.rfm import RfmUtils
+
+class StreamingUtils(Constants):
+
+    def get_partition_count(self) -> int:
+        # Number of partitions so that a partition of the largest order source
+        # has about streaming_chunk_rows rows (estimated from its first lines)
+        n_rows = 0
+        for source_ in ['orders', 'order_items', 'order_reviews']:
+            path = self.source[source_]
+            with open(path, 'rb') as f:
+                sample = f.read(1 << 20)
+            line_size = len(sample) / max(sample.count(b'\n'), 1)
+            n_rows = max(n_rows, os.path.getsize(path) / line_size)
+        return max(1, math.ceil(n_rows / self.streaming_chunk_rows))
+
+    def get_partition_codes(self, values: pd.Series, n_partitions: int) -> np.ndarray:
+        # Partition of every key: a hash of the value, the same in every chunk
+        return (pd.util.hash_array(values.to_numpy()) % np.uint64(n_partitions)).astype('int64')
+
+    def get_schema(self, df: pd.DataFrame) -> pa.Schema:
+        # Arrow schema of the chunks, fixed by the first one ('object' columns
+        # are strings, even if a chunk has no values at all)
+        return pa.schema([
+            (_col, pa.string() if df[_col].dtype == object else pa.from_numpy_dtype(df[_col].dtype))
+            for _col in df.columns
+        ])
+
+    def get_partition_path(self, name: str, partition: int) -> str:
+        return os.path.join(self.streaming_dir, f'{name}.{partition}.arrow')
+
+    def write_partitions(self, chunks, key: str, n_partitions: int, name: str):
+        # Shuffle the chunks into n_partitions Arrow stream files by the hash of
+        # key, so that all the rows of a key end up in the same partition
+        writers = []
+        try:
+            for chunk in chunks:
+                if not writers:
+                    schema = self.get_schema(chunk)
+                    writers = [
+                        pa.ipc.new_stream(self.get_partition_path(name, p), schema)
+                        for p in range(n_partitions)
+                    ]
+                codes = self.get_partition_codes(chunk[key], n_partitions)
+                order = np.argsort(codes, kind='stable')
+                bounds = np.searchsorted(codes[order], np.arange(n_partitions + 1), side='left')
+                table = pa.Table.from_pandas(chunk.iloc[order], schema=schema, preserve_index=False)
+                for p in range(n_partitions):
+                    if bounds[p + 1] > bounds[p]:
+                        writers[p].write_table(table.slice(bounds[p], bounds[p + 1] - bounds[p]))
+        finally:
+            for writer in writers:
+                writer.close()
+
+    def read_partition(self, name: str, partition: int) -> pd.DataFrame:
+        # One partition written by write_partitions (None if there was no rows)
+        path = self.get_partition_path(name, partition)
+        if not os.path.exists(path):
+            return None
+        with pa.ipc.open_stream(path) as reader:
+            return reader.read_all().to_pandas()
+
+    def sort_partition(self, name: str, partition: int, by: str):
+        # Sort a partition in place (stable), e.g. the fact rows on the purchase
+        # timestamp like the fact table, so that the float sums add up in the
+        # same order as in memory
+        path = self.get_partition_path(name, partition)
+        if not os.path.exists(path):
+            return
+        with pa.ipc.open_stream(path) as reader:
+            table = reader.read_all()
+        table = table.take(pc.sort_indices(table, sort_keys=[(by, 'ascending')]))
+        with pa.ipc.new_stream(path, table.schema) as writer:
+            writer.write_table(table)
+
+    def count_values(self, chunks, col: str, counts: dict):
+        # Pass the chunks through, adding up the counts of the values of col
+        for chunk in chunks:
+            for value, count in chunk[col].value_counts().items():
+                counts[value] = counts.get(value, 0) + count
+            yield chunk
+
+    def join_customers(self, n_partitions: int):
+        # The orders with their customer, partition by partition of customer_id
+        for p in range(n_partitions):
+            orders_df = self.read_partition('orders', p)
+            if orders_df is None:
+                continue
+            customers_df = self.read_partition('customers', p)
+            if customers_df is None:
+                customers_df = pd.DataFrame({
+                    'customer_id': pd.Series(dtype=object),
+                    'customer_unique_id': pd.Series(dtype=object),
+                    'customer_zip_code_prefix': pd.Series(dtype=object)
+                })
+            yield orders_df.merge(customers_df, how='left', on='customer_id').drop(columns='customer_id')
+
+    def get_dimensions(self) -> dict:
+        # The dimensions that don't grow with the orders are read at once (the
+        # product categories & the geolocations), cleaned like get_clean_data
+        i = IngestionUtils()
+        products_df = (
+            i.read_source('products')[['product_id', 'product_category_name']]
+            .merge(
+                i.read_source('product_category_name_translations'),
+                how='left',
+                on='product_category_name'
+            )
+            [['product_id', 'product_category_name_english']]
+        )
+        geolocations_df = (
+            SpatialIndexUtils().get_zip_centroids(i.read_source('geolocations'))
+            [['geolocation_zip_code_prefix', 'geolocation_lat', 'geolocation_lng', 'geolocation_city', 'geolocation_state']]
+        )
+        geolocations_df = NormalizationUtils().normalize_cities({'geolocations': geolocations_df})['geolocations']
+        return {'products': products_df, 'geolocations': geolocations_df}
+
+    def join_facts(self, n_partitions: int, review_bounds: dict):
+        # The fact rows (like get_fact_data), partition by partition of order_id
+        cl = CleaningUtils()
+        dimensions = self.get_dimensions()
+        for p in range(n_partitions):
+            orders_df = self.read_partition('orders_customers', p)
+            if orders_df is None:
+                continue
+            items_df = self.read_partition('order_items', p)
+            if items_df is None:
+                items_df = pd.DataFrame({
+                    'order_id': pd.Series(dtype=object),
+                    'product_id': pd.Series(dtype=object),
+                    'price': pd.Series(dtype='float64')
+                })
+            reviews_df = self.read_partition('order_reviews', p)
+            if reviews_df is None:
+                reviews_df = pd.DataFrame({'order_id': pd.Series(dtype=object), 'review_score': pd.Series(dtype='float64')})
+            reviews_df = cl.clean_reviews(reviews_df, review_bounds)[['order_id', 'review_score']]
+
+            fact_df = (
+                orders_df
+                .merge(
+                    items_df.merge(dimensions['products'], how='left', on='product_id').drop(columns='product_id'),
+                    how='left',
+                    on='order_id'
+                )
+                .merge(reviews_df, how='left', on='order_id')
+                .merge(
+                    dimensions['geolocations'],
+                    how='left',
+                    left_on='customer_zip_code_prefix',
+                    right_on='geolocation_zip_code_prefix'
+                )
+                .drop(columns=['geolocation_zip_code_prefix'])
+            )
+            yield fact_df
+
+    def get_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.streaming_dir, 'manifest.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def build_partitions(self) -> dict:
+        # Stream the order sources by chunks of streaming_chunk_rows rows into
+        # the fact rows partitioned by customer_unique_id (the orders, items &
+        # reviews are joined partition by partition), and return the manifest
+        ## The partitions are reused until the sources change
+        version = [SnapshotUtils().get_source_version(), self.streaming_chunk_rows]
+        manifest = self.get_manifest()
+        if manifest.get('version') == repr(version):
+            return manifest
+
+        shutil.rmtree(self.streaming_dir, ignore_errors=True)
+        os.makedirs(self.streaming_dir)
+        n_partitions = self.get_partition_count()
+        chunk_rows = self.streaming_chunk_rows
+        i = IngestionUtils()
+
+        ## 1. The orders & the customers by customer_id, then joined into the
+        ##    orders with their customer by order_id
+        self.write_partitions(
+            i.read_source_chunks('customers', chunk_rows, ['customer_id', 'customer_unique_id', 'customer_zip_code_prefix']),
+            'customer_id', n_partitions, 'customers'
+        )
+        self.write_partitions(
+            i.read_source_chunks('orders', chunk_rows, ['order_id', 'customer_id', 'order_status', 'order_purchase_timestamp']),
+            'customer_id', n_partitions, 'orders'
+        )
+        self.write_partitions(self.join_customers(n_partitions), 'order_id', n_partitions, 'orders_customers')
+
+        ## 2. The items & the reviews by order_id, the review scores are counted
+        ##    on the way for the IQR bounds of impute_outlier (exact quantiles)
+        self.write_partitions(
+            i.read_source_chunks('order_items', chunk_rows, ['order_id', 'product_id', 'price']),
+            'order_id', n_partitions, 'order_items'
+        )
+        review_counts = {}
+        self.write_partitions(
+            self.count_values(i.read_source_chunks('order_reviews', chunk_rows, ['order_id', 'review_score']), 'review_score', review_counts),
+            'order_id', n_partitions, 'order_reviews'
+        )
+        review_bounds = CleaningUtils().get_outlier_bounds_from_counts(pd.Series(review_counts, dtype='float64'))
+
+        ## 3. The fact rows by customer_unique_id, all the rows of a customer
+        ##    are in one partition: the distinct counts add up over partitions
+        self.write_partitions(self.join_facts(n_partitions, review_bounds), 'customer_unique_id', n_partitions, 'facts')
+        for p in range(n_partitions):
+            self.sort_partition('facts', p, 'order_purchase_timestamp')
+        for _name in ['customers', 'orders', 'orders_customers', 'order_items', 'order_reviews']:
+            for p in range(n_partitions):
+                path = self.get_partition_path(_name, p)
+                if os.path.exists(path):
+                    os.remove(path)
+
+        manifest = {'version': repr(version), 'n_partitions': n_partitions, 'review_score': review_bounds}
+        with open(os.path.join(self.streaming_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def get_period_labels(self, timestamps: pd.Series, freq: str) -> pd.Series:
+        # Period end label of every timestamp (the 'ME' / 'QE' labels of resample)
+        return timestamps.dt.to_period(freq).dt.to_timestamp(how='end').dt.normalize()
+
+    def aggregate_partition(self, df: pd.DataFrame) -> dict:
+        # Partial aggregates of the filtered rows of a partition, they add up
+        # over the partitions since a customer (and its orders) is in one
+        ## The geolocation of a zip code prefix is unique (joined on it), so the
+        ## 'max' of get_metrics_by_locations is its first value (no Python loop
+        ## over the groups for the strings)
+        periods = {}
+        for _freq, _label in [('M', 'month'), ('Q', 'quarter')]:
+            periods[_label] = (
+                df.groupby(self.get_period_labels(df['order_purchase_timestamp'], _freq).rename(_label))
+                .agg({'order_id': 'nunique', 'customer_unique_id': 'nunique', 'price': 'sum'})
+            )
+        locations = (
+            df.assign(review_count=df['review_score'].notna())
+            .groupby('customer_zip_code_prefix')
+            .agg({
+                'order_id': 'nunique',
+                'customer_unique_id': 'nunique',
+                'price': 'sum',
+                'review_score': 'sum',
+                'review_count': 'sum',
+                'geolocation_lat': 'first',
+                'geolocation_lng': 'first',
+                'geolocation_city': 'first',
+                'geolocation_state': 'first'
+            })
+        )
+        return {**periods, 'locations': locations, 'rfm': RfmUtils().get_rfm_state(df)}
+
+    def get_period_metrics(self, partials: list, freq: str) -> pd.DataFrame:
+        # Sum of the partial period aggregates, with the empty periods (0)
+        metrics_df = pd.concat(partials).groupby(level=0).sum()
+        if len(metrics_df):
+            labels = pd.date_range(metrics_df.index.min(), metrics_df.index.max(), freq=freq)
+            metrics_df = metrics_df.reindex(labels, fill_value=0)
+        return metrics_df
+
+    def aggregate(self,
+                  start_date=None,
+                  end_date=None,
+                  order_status: list=None,
+                  product_categories: list=None,
+                  cities: list=None,
+                  states: list=None) -> dict:
+        # Monthly & quarterly metrics, metrics by location and RFM table of the
+        # filtered fact rows (same as get_metrics_by_month, get_metrics_by_quarter,
+        # get_metrics_by_locations & get_rfm_analysis), one partition at a time
+        ## Only the partial aggregates are kept, never the filtered rows
+        manifest = self.build_partitions()
+        f = FilterUtils()
+        partials = {'month': [], 'quarter': [], 'locations': [], 'rfm': []}
+        for p in range(manifest['n_partitions']):
+            df = self.read_partition('facts', p)
+            if df is None:
+                continue
+            df = f.apply_mask(df, f.get_filter_mask(df, start_date, end_date, order_status, product_categories, cities, states))
+            for _name, partial in self.aggregate_partition(df).items():
+                partials[_name].append(partial)
+            del df
+
+        monthly_metrics_df = (
+            self.get_period_metrics(partials['month'], 'ME')
+            .rename_axis('month')
+            .reset_index()
+            .rename(columns={
+                'customer_unique_id': 'customer_count',
+                'order_id': 'order_count',
+                'price': 'revenue_w_o_freight'
+            })
+        )
+        quarterly_metrics_df = (
+            self.get_period_metrics(partials['quarter'], 'QE')
+            .rename_axis('Quarter')
+            .reset_index()
+            .rename(columns={
+                'customer_unique_id': 'Customer',
+                'order_id': 'Order',
+                'price': 'Revenue'
+            })
+            .sort_values(by='Quarter', ascending=False)
+            .reset_index(drop=True)
+        )
+        quarterly_metrics_df['Quarter'] = quarterly_metrics_df['Quarter'].dt.to_period('Q')
+
+        metrics_by_locations_df = (
+            pd.concat(partials['locations'])
+            .groupby(level=0)
+            .agg({
+                'order_id': 'sum',
+                'customer_unique_id': 'sum',
+                'price': 'sum',
+                'review_score': 'sum',
+                'review_count': 'sum',
+                'geolocation_lat': 'first',
+                'geolocation_lng': 'first',
+                'geolocation_city': 'first',
+                'geolocation_state': 'first'
+            })
+        )
+        metrics_by_locations_df['review_score'] = (
+            metrics_by_locations_df['review_score'] / metrics_by_locations_df['review_count'].replace(0, np.nan)
+        )
+        metrics_by_locations_df = (
+            metrics_by_locations_df
+            .drop(columns='review_count')
+            .rename_axis('customer_zip_code_prefix')
+            .reset_index()
+            .rename(columns={
+                'customer_unique_id': 'customer_count',
+                'order_id': 'order_count',
+                'price': 'revenue_w_o_freight'
+            })
+            .dropna(subset=['geolocation_lat', 'geolocation_lng'])
+            .reset_index(drop=True)
+        )
+
+        ## The customers of the partitions are disjoint, sort them back
+        r = RfmUtils()
+        state_df = pd.concat(partials['rfm'], ignore_index=True)
+        state_df = state_df.iloc[np.argsort(r.get_codes(state_df['customer_id'], sort=True)[0], kind='stable')]
+        rfm_df = r.get_rfm_scores(state_df.reset_index(drop=True)).reset_index()
+
+        return {
+            'monthly_metrics_df': monthly_metrics_df,
+            'quarterly_metrics_df': quarterly_metrics_df,
+            'metrics_by_locations_df': metrics_by_locations_df,
+            'rfm_df': rfm_df
+        }
@@ -0,0 +1,393 @@
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from unidecode import unidecode
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+
+# Sizes of the Olist dataset (scale 1)
+OLIST_ORDERS = 99_441
+OLIST_PRODUCTS = 32_951
+OLIST_SELLERS = 3_095
+OLIST_ZIPS = 19_015
+OLIST_GEOLOCATIONS = 1_000_163
+
+# States: (first & last zip code prefix, share of the customers, share of the
+# sellers, latitude & longitude of the capital, capital)
+STATES = {
+    'SP': (1000, 19999, 41.9, 59.7, -23.55, -46.63, 'são paulo'),
+    'RJ': (20000, 28999, 12.9, 5.5, -22.91, -43.17, 'rio de janeiro'),
+    'ES': (29000, 29999, 2.0, 0.8, -20.32, -40.34, 'vitória'),
+    'MG': (30000, 39999, 11.7, 7.9, -19.92, -43.94, 'belo horizonte'),
+    'BA': (40000, 48999, 3.4, 0.6, -12.97, -38.50, 'salvador'),
+    'SE': (49000, 49999, 0.35, 0.1, -10.91, -37.07, 'aracaju'),
+    'PE': (50000, 56999, 1.7, 0.3, -8.05, -34.88, 'recife'),
+    'AL': (57000, 57999, 0.4, 0.05, -9.67, -35.74, 'maceió'),
+    'PB': (58000, 58999, 0.54, 0.2, -7.12, -34.86, 'joão pessoa'),
+    'RN': (59000, 59999, 0.49, 0.2, -5.79, -35.21, 'natal'),
+    'CE': (60000, 63999, 1.34, 0.4, -3.73, -38.52, 'fortaleza'),
+    'PI': (64000, 64999, 0.5, 0.05, -5.09, -42.80, 'teresina'),
+    'MA': (65000, 65999, 0.75, 0.05, -2.53, -44.30, 'são luís'),
+    'PA': (66000, 68899, 0.98, 0.05, -1.46, -48.50, 'belém'),
+    'AP': (68900, 68999, 0.07, 0.01, 0.03, -51.07, 'macapá'),
+    'AM': (69000, 69299, 0.15, 0.05, -3.12, -60.02, 'manaus'),
+    'RR': (69300, 69399, 0.05, 0.01, 2.82, -60.67, 'boa vista'),
+    'AC': (69900, 69999, 0.08, 0.05, -9.97, -67.81, 'rio branco'),
+    'DF': (70000, 72799, 2.15, 0.9, -15.79, -47.88, 'brasília'),
+    'GO': (72800, 76799, 2.03, 1.3, -16.68, -49.25, 'goiânia'),
+    'RO': (76800, 76999, 0.25, 0.1, -8.76, -63.90, 'porto velho'),
+    'TO': (77000, 77999, 0.28, 0.05, -10.18, -48.33, 'palmas'),
+    'MT': (78000, 78899, 0.91, 0.3, -15.60, -56.10, 'cuiabá'),
+    'MS': (79000, 79999, 0.72, 0.1, -20.44, -54.65, 'campo grande'),
+    'PR': (80000, 87999, 5.07, 11.3, -25.43, -49.27, 'curitiba'),
+    'SC': (88000, 89999, 3.66, 6.1, -27.60, -48.55, 'florianópolis'),
+    'RS': (90000, 99999, 5.5, 4.2, -30.03, -51.23, 'porto alegre')
+}
+
+# Words of the other city names
+CITY_WORDS = [
+    ['são', 'santa', 'nova', 'campo', 'porto', 'vila', 'bom', 'ribeirão', 'lagoa', 'serra', 'monte', 'barra'],
+    ['alegre', 'grande', 'verde', 'preto', 'josé', 'joão', 'paulista', 'do sul', 'das flores', 'da conceição', 'bonito', 'do norte']
+]
+
+# Share of the orders of every status of order_status_level
+ORDER_STATUS_SHARES = {
+    'delivered': 0.9702,
+    'shipped': 0.0111,
+    'canceled': 0.0063,
+    'unavailable': 0.0061,
+    'invoiced': 0.0032,
+    'processing': 0.0030,
+    'created': 0.00005,
+    'approved': 0.00002
+}
+
+# Number of items of an order (unavailable orders have none)
+ITEM_COUNT_SHARES = {1: 0.9005, 2: 0.0766, 3: 0.0131, 4: 0.0051, 5: 0.0025, 6: 0.0022}
+PAYMENT_TYPE_SHARES = {'credit_card': 0.7392, 'boleto': 0.1904, 'voucher': 0.0556, 'debit_card': 0.0148}
+REVIEW_SCORE_SHARES = {5: 0.5778, 4: 0.1929, 3: 0.0824, 2: 0.0318, 1: 0.1151}
+REVIEW_MESSAGES = [
+    'Produto entregue antes do prazo', 'Recomendo', 'Ótimo produto, chegou rápido',
+    'Não recebi o produto', 'Veio com defeito', 'Muito bom', 'Entrega atrasada',
+    'Produto de ótima qualidade', 'Gostei', 'Péssimo atendimento'
+]
+REVIEW_TITLES = ['Recomendo', 'Super recomendo', 'Bom', 'Ótimo', 'Não recomendo', 'Excelente']
+
+class SyntheticDataUtils(Constants):
+
+    # Orders generated at once (the memory usage doesn't grow with the scale)
+    block_orders = 250_000
+
+    def mix(self, values: np.ndarray) -> np.ndarray:
+        # splitmix64 finalizer: a uint64 hash of every value (wraps around)
+        values = values.astype('uint64')
+        with np.errstate(over='ignore'):
+            values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return values ^ (values >> np.uint64(31))
+
+    def get_salt(self, seed: int, name: str) -> np.uint64:
+        # Salt of the ids & the hashes of a kind of key, from the seed
+        return self.mix(np.array([seed * 1_000_003 + sum(ord(_char) * 31 ** k for k, _char in enumerate(name)) % 2 ** 61]))[0]
+
+    def get_uniforms(self, indices: np.ndarray, salt: np.uint64) -> np.ndarray:
+        # Uniform [0, 1) value of every index, the same in every block
+        with np.errstate(over='ignore'):
+            return (self.mix(indices.astype('uint64') ^ salt) >> np.uint64(11)).astype('float64') / 2.0 ** 53
+
+    def get_ids(self, indices: np.ndarray, salt: np.uint64) -> pa.Array:
+        # 32 hex digit ids (like the Olist md5 ids), hashes of the indices
+        with np.errstate(over='ignore'):
+            words = self.mix(np.stack([indices * 2, indices * 2 + 1], axis=1).astype('uint64') ^ salt)
+        digits = words.astype('>u8').tobytes().hex().encode('ascii')
+        return pa.array(np.frombuffer(digits, dtype='S32')).cast(pa.string())
+
+    def get_zipf_indices(self, uniforms: np.ndarray, n: int, power: float=2.0) -> np.ndarray:
+        # Skewed index in [0, n) of every uniform value (index 0 is the most
+        # frequent one, P(index < k) = (k / n) ** (1 / power))
+        return np.minimum((n * uniforms ** power).astype('int64'), n - 1)
+
+    def choose(self, rng: np.random.Generator, shares: dict, size: int) -> np.ndarray:
+        keys = np.array(list(shares.keys()))
+        p = np.array(list(shares.values()), dtype='float64')
+        return keys[rng.choice(len(keys), size=size, p=p / p.sum())]
+
+    def get_timestamps(self, seconds: np.ndarray) -> pa.Array:
+        # Timestamps (to the second) from seconds since the epoch, NaN is null
+        valid = ~np.isnan(seconds)
+        values = np.where(valid, seconds, 0).astype('int64').astype('datetime64[s]')
+        return pa.array(values, mask=~valid)
+
+    def get_zips(self, seed: int) -> pd.DataFrame:
+        # The zip code prefixes with their state, city, coordinates and their
+        # weights for the customers & the sellers (skewed towards the capitals)
+        rng = np.random.default_rng([seed, 0])
+        shares = np.array([_state[2] for _state in STATES.values()])
+        counts = np.maximum(20, np.round(OLIST_ZIPS * shares / shares.sum())).astype('int64')
+        zips = []
+        for (state_, (first, last, customer_share, seller_share, lat, lng, capital)), count in zip(STATES.items(), counts):
+            count = min(count, last - first + 1)
+            prefixes = np.sort(rng.choice(np.arange(first, last + 1), size=count, replace=False))
+            ## The capital has the first quarter of the zips (ranked at random)
+            ranks = rng.permutation(count)
+            n_cities = max(2, count // 6)
+            city_codes = np.where(ranks < count // 4, 0, 1 + rng.integers(0, n_cities - 1, count))
+            cities = np.array([capital] + [
+                f'{CITY_WORDS[0][k % len(CITY_WORDS[0])]} {CITY_WORDS[1][(k // len(CITY_WORDS[0])) % len(CITY_WORDS[1])]}'
+                + ('' if k < len(CITY_WORDS[0]) * len(CITY_WORDS[1]) else f' {k // (len(CITY_WORDS[0]) * len(CITY_WORDS[1])) + 1}')
+                for k in range(n_cities - 1)
+            ])
+            weights = (ranks + 1.0) ** -0.8
+            zips.append(pd.DataFrame({
+                'zip_code_prefix': prefixes,
+                'city': cities[city_codes],
+                'state': state_,
+                'lat': lat + rng.normal(0, 0.6, count) * (city_codes > 0) + rng.normal(0, 0.08, count),
+                'lng': lng + rng.normal(0, 0.6, count) * (city_codes > 0) + rng.normal(0, 0.08, count),
+                'customer_weight': customer_share * weights / weights.sum(),
+                'seller_weight': seller_share * weights / weights.sum()
+            }))
+        zips = pd.concat(zips, ignore_index=True)
+        zips['zip_code_prefix'] = zips['zip_code_prefix'].map('{:05d}'.format)
+        return zips
+
+    def pick_zips(self, zips: pd.DataFrame, uniforms: np.ndarray, weight: str) -> np.ndarray:
+        # Zip (row of zips) of every uniform value, by the weights
+        cumulative = np.cumsum(zips[weight].to_numpy())
+        return np.minimum(np.searchsorted(cumulative / cumulative[-1], uniforms, side='right'), len(zips) - 1)
+
+    def get_geolocations(self, zips: pd.DataFrame, seed: int) -> pa.Table:
+        # Many points per zip code prefix (about 50 like Olist, more for the
+        # frequent zips), some of their cities without the accents
+        rng = np.random.default_rng([seed, 1])
+        counts = 1 + rng.poisson(zips['customer_weight'].to_numpy() / zips['customer_weight'].mean() * (OLIST_GEOLOCATIONS / OLIST_ZIPS - 1))
+        rows = np.repeat(np.arange(len(zips)), counts)
+        cities = zips['city'].to_numpy()[rows]
+        plain = np.array([unidecode(_city) for _city in zips['city']])[rows]
+        return pa.table({
+            'geolocation_zip_code_prefix': zips['zip_code_prefix'].to_numpy()[rows],
+            'geolocation_lat': zips['lat'].to_numpy()[rows] + rng.normal(0, 0.02, len(rows)),
+            'geolocation_lng': zips['lng'].to_numpy()[rows] + rng.normal(0, 0.02, len(rows)),
+            'geolocation_city': np.where(rng.random(len(rows)) < 0.7, plain, cities),
+            'geolocation_state': zips['state'].to_numpy()[rows]
+        })
+
+    def get_products(self, n_products: int, n_sellers: int, categories: np.ndarray, seed: int) -> tuple:
+        # (products table, base price of every product, seller of every
+        # product), the categories are skewed like Olist
+        rng = np.random.default_rng([seed, 2])
+        indices = np.arange(n_products)
+        category_order = rng.permutation(len(categories))
+        category_codes = category_order[self.get_zipf_indices(rng.random(n_products), len(categories), 1.8)]
+        has_category = rng.random(n_products) >= 0.0185
+        has_dimensions = rng.random(n_products) >= 0.0001
+        length = np.clip(rng.lognormal(3.3, 0.45, n_products), 7, 105).round()
+        height = np.clip(rng.lognormal(2.6, 0.65, n_products), 2, 105).round()
+        width = np.clip(rng.lognormal(3.0, 0.4, n_products), 6, 118).round()
+        weight = np.clip(length * height * width * rng.lognormal(-1.2, 0.9, n_products), 50, 40425).round()
+        products = pa.table({
+            'product_id': self.get_ids(indices, self.get_salt(seed, 'product')),
+            'product_category_name': pa.array(categories[category_codes], mask=~has_category),
+            'product_name_lenght': pa.array(np.clip(rng.normal(48, 10, n_products), 5, 76).round().astype('int64'), mask=~has_category),
+            'product_description_lenght': pa.array(np.clip(rng.lognormal(6.4, 0.8, n_products), 4, 3992).round().astype('int64'), mask=~has_category),
+            'product_photos_qty': pa.array(np.clip(rng.geometric(0.45, n_products), 1, 20).astype('int64'), mask=~has_category),
+            'product_weight_g': pa.array(weight.astype('int64'), mask=~has_dimensions),
+            'product_length_cm': pa.array(length.astype('int64'), mask=~has_dimensions),
+            'product_height_cm': pa.array(height.astype('int64'), mask=~has_dimensions),
+            'product_width_cm': pa.array(width.astype('int64'), mask=~has_dimensions)
+        })
+        prices = np.clip(rng.lognormal(4.3, 0.95, n_products), 0.85, 6735).round(2)
+        sellers = self.get_zipf_indices(rng.random(n_products), n_sellers, 2.5)
+        return products, prices, sellers
+
+    def get_sellers(self, n_sellers: int, zips: pd.DataFrame, seed: int) -> pa.Table:
+        rng = np.random.default_rng([seed, 3])
+        rows = self.pick_zips(zips, rng.random(n_sellers), 'seller_weight')
+        return pa.table({
+            'seller_id': self.get_ids(np.arange(n_sellers), self.get_salt(seed, 'seller')),
+            'seller_zip_code_prefix': zips['zip_code_prefix'].to_numpy()[rows],
+            'seller_city': np.array([unidecode(_city) for _city in zips['city']])[rows],
+            'seller_state': zips['state'].to_numpy()[rows]
+        })
+
+    def get_order_block(self, first: int, last: int, zips: pd.DataFrame, prices: np.ndarray, sellers: np.ndarray, seed: int) -> dict:
+        # The orders first <= order < last with their customer, items,
+        # payments & reviews, from a generator seeded by the block
+        rng = np.random.default_rng([seed, 4, first])
+        indices = np.arange(first, last)
+        size = last - first
+        salts = {_name: self.get_salt(seed, _name) for _name in ['order', 'customer', 'unique', 'review', 'zip', 'product', 'seller']}
+
+        ## Customers: a customer_id per order, ~3% of the orders are placed by
+        ## a previous customer_unique_id (its zip is a hash of it)
+        returning = (rng.random(size) < 0.034) & (indices > 0)
+        unique_indices = np.where(returning, (rng.random(size) * np.maximum(indices, 1)).astype('int64'), indices)
+        zip_rows = self.pick_zips(zips, self.get_uniforms(unique_indices, salts['zip']), 'customer_weight')
+        cities = np.array([unidecode(_city) for _city in zips['city']])
+        customers = pa.table({
+            'customer_id': self.get_ids(indices, salts['customer']),
+            'customer_unique_id': self.get_ids(unique_indices, salts['unique']),
+            'customer_zip_code_prefix': zips['zip_code_prefix'].to_numpy()[zip_rows],
+            'customer_city': cities[zip_rows],
+            'customer_state': zips['state'].to_numpy()[zip_rows]
+        })
+
+        ## Orders: the volume grows over the period (linear density), then the
+        ## dates of every step depend on the status
+        start = pd.Timestamp('2016-09-04').timestamp()
+        end = pd.Timestamp('2018-09-01').timestamp()
+        purchase = start + (end - start) * np.sqrt(rng.random(size))
+        purchase = np.floor(purchase)
+        status = self.choose(rng, ORDER_STATUS_SHARES, size)
+        approved = np.where(np.isin(status, ['created']), np.nan, purchase + np.round(rng.lognormal(7.5, 1.6, size)))
+        approved[(status == 'canceled') & (rng.random(size) < 0.2)] = np.nan
+        carrier = approved + np.round(rng.lognormal(11.9, 0.8, size))
+        carrier[~np.isin(status, ['shipped', 'delivered'])] = np.nan
+        delivered = carrier + np.round(rng.lognormal(13.1, 0.6, size))
+        delivered[(status != 'delivered') | (rng.random(size) < 0.0001)] = np.nan
+        estimated = np.floor(purchase / 86400 + rng.integers(10, 45, size)) * 86400
+        orders = pa.table({
+            'order_id': self.get_ids(indices, salts['order']),
+            'customer_id': customers['customer_id'],
+            'order_status': status,
+            'order_purchase_timestamp': self.get_timestamps(purchase),
+            'order_approved_at': self.get_timestamps(approved),
+            'order_delivered_carrier_date': self.get_timestamps(carrier),
+            'order_delivered_customer_date': self.get_timestamps(delivered),
+            'order_estimated_delivery_date': self.get_timestamps(estimated)
+        })
+
+        ## Items: the popular products are skewed, each product has its seller
+        ## and a base price
+        n_items = self.choose(rng, ITEM_COUNT_SHARES, size).astype('int64')
+        n_items[status == 'unavailable'] = 0
+        n_items[(status == 'canceled') & (rng.random(size) < 0.25)] = 0
+        item_orders = np.repeat(np.arange(size), n_items)
+        item_numbers = np.arange(len(item_orders)) - np.repeat(np.cumsum(n_items) - n_items, n_items) + 1
+        products = self.get_zipf_indices(rng.random(len(item_orders)), len(prices), 2.0)
+        item_prices = np.round(prices[products] * rng.choice([1.0, 1.0, 1.0, 0.9, 1.1], len(item_orders)), 2)
+        freights = np.round(np.clip(3 + 1.8 * item_prices ** 0.5 * rng.lognormal(0, 0.35, len(item_orders)), 0, 410), 2)
+        order_items = pa.table({
+            'order_id': orders['order_id'].take(item_orders),
+            'order_item_id': item_numbers,
+            'product_id': self.get_ids(products, salts['product']),
+            'seller_id': self.get_ids(sellers[products], salts['seller']),
+            'shipping_limit_date': self.get_timestamps(purchase[item_orders] + 86400 * rng.integers(3, 10, len(item_orders))),
+            'price': item_prices,
+            'freight_value': freights
+        })
+
+        ## Payments: the total of the order, split over a few payments (e.g.
+        ## vouchers) for ~3% of the orders
+        totals = np.bincount(item_orders, weights=item_prices + freights, minlength=size)
+        totals = np.where(n_items > 0, totals, np.round(rng.lognormal(4.6, 0.9, size), 2))
+        n_payments = np.where(rng.random(size) < 0.03, rng.integers(2, 5, size), 1)
+        payment_orders = np.repeat(np.arange(size), n_payments)
+        sequentials = np.arange(len(payment_orders)) - np.repeat(np.cumsum(n_payments) - n_payments, n_payments) + 1
+        parts = rng.random(len(payment_orders)) + 0.1
+        parts = parts / np.bincount(payment_orders, weights=parts, minlength=size)[payment_orders]
+        payment_types = self.choose(rng, PAYMENT_TYPE_SHARES, len(payment_orders))
+        payment_types[sequentials > 1] = 'voucher'
+        order_payments = pa.table({
+            'order_id': orders['order_id'].take(payment_orders),
+            'payment_sequential': sequentials,
+            'payment_type': payment_types,
+            'payment_installments': np.where(payment_types == 'credit_card', rng.choice([1, 1, 1, 2, 3, 4, 5, 6, 8, 10], len(payment_orders)), 1),
+            'payment_value': np.round(totals[payment_orders] * parts, 2)
+        })
+
+        ## Reviews: ~1 per order, created the day after the delivery (or the
+        ## estimated delivery), the scores are lower for the late deliveries
+        n_reviews = rng.choice([0, 1, 2], size, p=[0.003, 0.992, 0.005])
+        review_orders = np.repeat(np.arange(size), n_reviews)
+        n = len(review_orders)
+        late = (np.nan_to_num(delivered, nan=np.inf) > estimated + 86400)[review_orders]
+        scores = self.choose(rng, REVIEW_SCORE_SHARES, n)
+        scores = np.where(late & (rng.random(n) < 0.5), rng.choice([1, 2], n), scores)
+        reviewed = np.where(np.isnan(delivered), estimated, delivered)[review_orders]
+        creation = (np.floor(reviewed / 86400) + 1) * 86400
+        has_message = rng.random(n) < 0.41
+        order_reviews = pa.table({
+            'review_id': self.get_ids(first * 2 + np.arange(n), salts['review']),
+            'order_id': orders['order_id'].take(review_orders),
+            'review_score': scores.astype('int64'),
+            'review_comment_title': pa.array(np.array(REVIEW_TITLES)[rng.integers(0, len(REVIEW_TITLES), n)], mask=rng.random(n) >= 0.12),
+            'review_comment_message': pa.array(np.array(REVIEW_MESSAGES)[rng.integers(0, len(REVIEW_MESSAGES), n)], mask=~has_message),
+            'review_creation_date': self.get_timestamps(creation),
+            'review_answer_timestamp': self.get_timestamps(creation + np.round(rng.lognormal(10.5, 1.2, n)))
+        })
+
+        ## The rows of a table are not in the order of the ids (like Olist)
+        return {
+            'customers': customers.take(rng.permutation(size)),
+            'orders': orders.take(rng.permutation(size)),
+            'order_items': order_items,
+            'order_payments': order_payments.take(rng.permutation(len(payment_orders))),
+            'order_reviews': order_reviews.take(rng.permutation(n))
+        }
+
+    def generate(self, output_dir: str, scale: float=1.0, seed: int=0) -> dict:
+        # Write the nine tables of Constants.source (same file names & columns)
+        # into output_dir, at scale times the size of Olist: the orders, their
+        # customers, items, payments & reviews, the products & the sellers grow
+        # with the scale, the zip code prefixes (geolocations) and the product
+        # categories (translations) don't. Deterministic by seed (and scale),
+        # written by blocks of block_orders orders. Returns the row counts.
+        os.makedirs(output_dir, exist_ok=True)
+        paths = {_source: os.path.join(output_dir, os.path.basename(_path)) for _source, _path in self.source.items()}
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+        ## The product categories are the ones of the shipped translations
+        translations_path = os.path.join(root, self.source['product_category_name_translations'])
+        if os.path.abspath(translations_path) != os.path.abspath(paths['product_category_name_translations']):
+            shutil.copy(translations_path, paths['product_category_name_translations'])
+        categories = pd.read_csv(translations_path)['product_category_name'].to_numpy()
+
+        n_orders = max(1, round(OLIST_ORDERS * scale))
+        n_products = max(1, round(OLIST_PRODUCTS * scale))
+        n_sellers = max(1, round(OLIST_SELLERS * scale))
+        counts = {'product_category_name_translations': len(categories)}
+
+        zips = self.get_zips(seed)
+        products, prices, sellers = self.get_products(n_products, n_sellers, categories, seed)
+        for source_, table in [
+            ('geolocations', self.get_geolocations(zips, seed)),
+            ('products', products),
+            ('sellers', self.get_sellers(n_sellers, zips, seed))
+        ]:
+            pa_csv.write_csv(table, paths[source_])
+            counts[source_] = table.num_rows
+
+        writers = {}
+        try:
+            for first in range(0, n_orders, self.block_orders):
+                block = self.get_order_block(first, min(first + self.block_orders, n_orders), zips, prices, sellers, seed)
+                for source_, table in block.items():
+                    if source_ not in writers:
+                        writers[source_] = pa_csv.CSVWriter(paths[source_], table.schema)
+                    writers[source_].write_table(table)
+                    counts[source_] = counts.get(source_, 0) + table.num_rows
+        finally:
+            for writer in writers.values():
+                writer.close()
+        return counts
+
+if __name__ == '__main__':
+    # python utils/synthetic.py [output dir] [scale] [seed]
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else 'data_synthetic'
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    print(SyntheticDataUtils().generate(output_dir, scale, seed))
@@ -0,0 +1,94 @@
+import weakref
+import numpy as np
+import pandas as pd
+
+import sys
+import os
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(__file__), '..'
+        )
+    )
+)
+
+from utils.constants import Constants
+from utils.sketch import SketchUtils
+
+class TimeIndexUtils(Constants):
+
+    # Sortedness of the read-only timestamp columns (e.g. of the cached fact
+    # table & filtered rows, see CacheUtils.freeze_value), so that they are
+    # scanned once: {key: (weakref of the array owning the data, sorted)}
+    sorted_columns = {}
+
+    def is_sorted(self, values: np.ndarray) -> bool:
+        # One vectorized pass, NaT compares as False so an unsorted or
+        # incomplete column falls back to the boolean masks
+        ## The data of a read-only array owning it (or of a view of one) can't
+        ## change, its result is kept until the array is dropped
+        base = values
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        if base.flags.writeable or not base.flags.owndata:
+            return bool(np.all(values[1:] >= values[:-1]))
+        key = (id(base), values.__array_interface__['data'][0], values.shape, values.strides)
+        ref, result = self.sorted_columns.get(key, (None, None))
+        if ref is None or ref() is not base:
+            result = bool(np.all(values[1:] >= values[:-1]))
+            self.sorted_columns[key] = (weakref.ref(base, lambda ref: self.sorted_columns.pop(key, None)), result)
+        return result
+
+    def get_date_slice(self, timestamps: pd.Series, start_date=None, end_date=None) -> slice:
+        # Binary search of the day bounds in a sorted timestamp column, the
+        # date range filter becomes a positional slice (None if unsorted)
+        values = timestamps.to_numpy(dtype='datetime64[ns]')
+        if not self.is_sorted(values):
+            return None
+        start, stop = 0, len(values)
+        if start_date:
+            start = np.searchsorted(values, pd.Timestamp(start_date).normalize().to_datetime64(), side='left')
+        if end_date:
+            ## The end date is included until midnight
+            end = (pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)).to_datetime64()
+            stop = np.searchsorted(values, end, side='left')
+        return slice(int(start), int(max(start, stop)))
+
+    def get_period_codes(self, timestamps: pd.Series, rule: str) -> tuple:
+        # Bin a sorted timestamp column by period (same bins & labels as
+        # resample: 'ME' month ends, 'QE' quarter ends), the bin edges are
+        # found by binary search instead of sorting the rows by the column
+        ## Returns (labels, codes), codes is None if the column is unsorted
+        values = timestamps.to_numpy(dtype='datetime64[ns]')
+        if len(values) == 0 or not self.is_sorted(values):
+            return None, None
+        start_rule = {'ME': 'MS', 'QE': 'QS'}[rule]
+        first = pd.Timestamp(values[0]).to_period(rule[0]).start_time
+        last = pd.Timestamp(values[-1]).to_period(rule[0]).start_time
+        edges = pd.date_range(first, last, freq=start_rule).append(
+            pd.DatetimeIndex([pd.date_range(last, periods=2, freq=start_rule)[-1]])
+        )
+        positions = np.searchsorted(values, edges.to_numpy(), side='left')
+        codes = np.repeat(np.arange(len(edges) - 1), np.diff(positions))
+        labels = edges[1:] - pd.Timedelta(days=1)
+        return labels, codes
+
+    def resample(self, df: pd.DataFrame, rule: str, on: str, agg: dict, approximate: bool=False) -> pd.DataFrame:
+        # df.resample(rule, on=on).agg(agg).reset_index() for a df sorted on
+        # the column, the empty periods are kept with 0 like resample does
+        ## (the 'nunique' are HyperLogLog estimates if approximate, see SketchUtils)
+        labels, codes = self.get_period_codes(df[on], rule)
+        if codes is None and approximate:
+            ## The sketches need the period codes, so sort an unsorted df first
+            df = df.sort_values(by=on, kind='stable')
+            labels, codes = self.get_period_codes(df[on], rule)
+        if codes is None:
+            return df.resample(rule=rule, on=on).agg(agg).reset_index()
+        result = (
+            SketchUtils()
+            .agg(df[list(agg.keys())], codes, agg, approximate)
+            .reindex(np.arange(len(labels)), fill_value=0)
+        )
+        result.index = labels.rename(on)
+        return result.reset_index()
@@ -1,5 +1,4 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 
 import sys
 import os
@@ -76,6 +75,8 @@ class DataUtils(Constants):
         numerical_columns = [_col for _col in available_columns if requirements[table_name][_col] in ['int64', 'float64']]
         if numerical_columns:
             print(f" > The outliers ({', '.join(numerical_columns)}): ")
+            ## matplotlib is only imported to draw the boxplots
+            import matplotlib.pyplot as plt
             fig, axes = plt.subplots(nrows=len(numerical_columns), ncols=1, figsize=(10, 15))
             try:
                 for i, col in enumerate(numerical_columns):